@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""
+Measure the throughput and memory usage of `tsip.capture.Capture`.
+
+A temporary capture file of roughly `SIZE` megabytes is created by
+concatenating the TSIP captures in ``tests/``. Peak memory usage
+(maximum resident set size) should not grow with the file size.
+
+Usage::
+
+  python benchmarks/bench_capture.py [<megabytes>]
+
+"""
+
+import os
+import os.path
+import resource
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from tsip.capture import Capture
+
+
+TESTS = os.path.join(ROOT, 'tests')
+CAPTURES = ['thunderbolt.tsip', 'copernicus2.tsip']
+SIZE = 50
+
+
+def create(path, megabytes):
+    data = b''
+    for capture in CAPTURES:
+        with open(os.path.join(TESTS, capture), 'rb') as f:
+            data += f.read()
+
+    with open(path, 'wb') as f:
+        for i in range(0, int(megabytes * 1e6 / len(data)) + 1):
+            f.write(data)
+
+
+def main():
+    megabytes = float(sys.argv[1]) if len(sys.argv) > 1 else SIZE
+
+    (fd, path) = tempfile.mkstemp(suffix='.tsip')
+    os.close(fd)
+
+    try:
+        create(path, megabytes)
+
+        with Capture(path) as capture:
+            for payload in capture.payloads():
+                pass
+            print('payloads: %8d packets %8.2f MB/s %10.0f packets/s' %
+                  ((capture.packets_read,) + capture.throughput()))
+
+            for packet in capture.packets():
+                pass
+            print('packets:  %8d packets %8.2f MB/s %10.0f packets/s' %
+                  ((capture.packets_read,) + capture.throughput()))
+
+        print('file size: %.1f MB, max RSS: %.1f MB' %
+              (os.path.getsize(path) / 1e6,
+               resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3))
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
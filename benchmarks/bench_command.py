@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+"""
+Compare framing command packets with ``frame(stuff(packet.pack()))``,
+as done by `tsip.GPS.write()` for `tsip.Packet` instances, with
+`tsip.Command.frame()`.
+
+Usage::
+
+  python benchmarks/bench_command.py [<number>]
+
+"""
+
+import os.path
+import sys
+import timeit
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from tsip import Command, Packet, frame, stuff
+
+
+NUMBER = 100000
+
+COMMANDS = [
+    ('0x8E-AB poll', (0x8e, 0xab, 0), ()),
+    ('0x8E-AC poll', (0x8e, 0xac, 0), ()),
+    ('0x8E-A0 DAC voltage', (0x8e, 0xa0, 0, None), (1.25,)),
+    ('0x8E-A5 masks', (0x8e, 0xa5, None, None), (0x0005, 0x0000)),
+]
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else NUMBER
+
+    for (name, fields, values) in COMMANDS:
+        values_ = iter(values)
+        packet = Packet([next(values_) if field is None else field for field in fields])
+        command = Command(fields)
+
+        t_packet = min(timeit.repeat(lambda: frame(stuff(packet.pack())), number=number, repeat=3))
+        t_command = min(timeit.repeat(lambda: command.frame(*values), number=number, repeat=3))
+
+        print('%-20s Packet %6.2f us  Command %6.2f us  %5.1fx' % (
+            name, t_packet / number * 1e6, t_command / number * 1e6, t_packet / t_command))
+
+
+if __name__ == '__main__':
+    main()
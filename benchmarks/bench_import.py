@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+"""
+Measure the time it takes to ``import tsip`` with ``python -X importtime``.
+
+The import is run in a fresh interpreter `number` times and the median
+cumulative time of ``tsip`` and of the modules it imports is printed,
+together with the time it takes to create all packet structures, which
+happens on first lookup of each packet.
+
+With ``-r`` the same is measured for another checkout of python-TSIP, e.g.
+one created with ``git worktree add /tmp/old <commit>``.
+
+Usage::
+
+  python benchmarks/bench_import.py [-n <number>] [-r <other checkout>]
+
+"""
+
+import argparse
+import os.path
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+NUMBER = 40
+
+LOAD_ALL = ('import time, tsip; t = time.perf_counter(); '
+            'list(tsip.PACKET_STRUCTURES.values()); '
+            'print((time.perf_counter() - t) * 1e6)')
+
+
+def importtime(root, number):
+    """
+    Return the median cumulative import time in microseconds of each
+    module imported by ``import tsip`` in `root`.
+
+    """
+
+    times = {}
+
+    for i in range(0, number):
+        output = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import tsip'],
+                                cwd=root, stderr=subprocess.PIPE, check=True).stderr
+
+        # Modules are listed after the modules they import, so the modules
+        # imported by `tsip` are those since the previous top-level module.
+        #
+        modules = []
+        for line in output.decode().splitlines()[1:]:
+            (self_, cumulative, name) = line.split('|')
+            modules.append((name.strip(), int(cumulative)))
+            if not name.startswith('  '):
+                if name.strip() == 'tsip':
+                    break
+                modules = []
+
+        for (name, cumulative) in modules:
+            times.setdefault(name, []).append(cumulative)
+
+    return dict([(name, statistics.median(values)) for (name, values) in times.items()])
+
+
+def load_all(root, number):
+    """Return the median time in microseconds to create all structures."""
+
+    return statistics.median([
+        float(subprocess.run([sys.executable, '-c', LOAD_ALL], cwd=root,
+                             stdout=subprocess.PIPE, check=True).stdout)
+        for i in range(0, number)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('-n', '--number', type=int, default=NUMBER,
+                        help='number of imports (default: %(default)s)')
+    parser.add_argument('-r', '--reference', help='other checkout to compare with')
+    args = parser.parse_args()
+
+    roots = [('this', ROOT)]
+    if args.reference:
+        roots.insert(0, ('reference', args.reference))
+
+    results = [(label, importtime(root, args.number), load_all(root, args.number))
+               for (label, root) in roots]
+
+    names = sorted(set([name for (label, times, load) in results for name in times]),
+                   key=lambda name: -max([times.get(name, 0) for (label, times, load) in results]))
+
+    print('%-24s' % ('median us') + ''.join(['%12s' % (label) for (label, times, load) in results]))
+    for name in names:
+        print('%-24s' % (name) + ''.join(['%12s' % ('%.0f' % times[name] if name in times else '-')
+                                          for (label, times, load) in results]))
+    print('%-24s' % ('all structures') + ''.join(['%12.0f' % (load) for (label, times, load) in results]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""
+Compare reading many emulated receivers with a single `Multiplexer`
+with reading them with one `tsip.GPS` thread per receiver.
+
+Each receiver is a `tsip.emulator.Emulator` connected through a socket
+pair and running in its own process, broadcasting 0x8F-AB and 0x8F-AC
+packets at `rate` packets per second each.
+
+Usage::
+
+  python benchmarks/bench_multiplex.py [<ports>] [<rate>] [<seconds>]
+
+"""
+
+import multiprocessing
+import os.path
+import sys
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import tsip
+from tsip.emulator import socketpair
+from tsip.multiplex import Multiplexer
+
+
+PORTS = 24
+RATE = 2000
+SECONDS = 3.0
+
+
+def start(ports, rate, seconds):
+    context = multiprocessing.get_context('fork')
+    processes = []
+    conns = []
+
+    for i in range(0, ports):
+        (emulator, conn) = socketpair(broadcasts={0x8fab: rate, 0x8fac: rate})
+        process = context.Process(target=emulator.serve, args=(seconds,))
+        process.daemon = True
+        process.start()
+        emulator.conn.close()       # the child's copy is used
+        processes.append(process)
+        conns.append(conn)
+
+    return (processes, conns)
+
+
+def stop(processes, conns):
+    for conn in conns:
+        conn.close()
+    for process in processes:
+        process.join()
+
+
+def run_multiplexer(conns):
+    count = 0
+    t0 = time.perf_counter()
+
+    with Multiplexer() as mux:
+        for (i, conn) in enumerate(conns):
+            mux.add(i, conn)
+        for (port_id, packet) in mux:
+            count += 1
+
+    return (count, time.perf_counter() - t0)
+
+
+def run_threads(conns):
+    counts = [0] * len(conns)
+
+    def read(i, conn):
+        for packet in tsip.GPS(conn, chunksize=tsip.READ_CHUNK_SIZE):
+            counts[i] += 1
+
+    threads = [threading.Thread(target=read, args=(i, conn)) for (i, conn) in enumerate(conns)]
+
+    t0 = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return (sum(counts), time.perf_counter() - t0)
+
+
+def main():
+    ports = int(sys.argv[1]) if len(sys.argv) > 1 else PORTS
+    rate = int(sys.argv[2]) if len(sys.argv) > 2 else RATE
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else SECONDS
+
+    print('%d ports, %d packets/s offered per port' % (ports, 2 * rate))
+
+    for (name, run) in [('multiplexer', run_multiplexer), ('threads', run_threads)]:
+        (processes, conns) = start(ports, rate, seconds)
+        (count, elapsed) = run(conns)
+        stop(processes, conns)
+        print('%-12s %10d packets %10.0f packets/s' % (name, count, count / elapsed))
+
+
+if __name__ == '__main__':
+    main()
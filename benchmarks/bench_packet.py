@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+"""
+Compare memory usage and decoding time of `tsip.Packet` and
+`tsip.LazyPacket`.
+
+The payloads of all packets in the TSIP captures in ``tests/`` are
+decoded with both classes. Memory per packet is measured with
+`tracemalloc` and includes the fields (or binary packet) referenced
+by each instance.
+
+Usage::
+
+  python benchmarks/bench_packet.py [<repeat>]
+
+"""
+
+import os.path
+import sys
+import timeit
+import tracemalloc
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from tsip import Packet, LazyPacket
+from tsip.capture import Capture
+
+
+TESTS = os.path.join(ROOT, 'tests')
+CAPTURES = ['thunderbolt.tsip', 'copernicus2.tsip']
+REPEAT = 10
+
+
+def load():
+    payloads = []
+    for capture in CAPTURES:
+        with Capture(os.path.join(TESTS, capture)) as c:
+            payloads += [bytes(payload) for payload in c.payloads()]
+    return payloads
+
+
+def memory(cls, payloads):
+    # Each payload is copied as it would be when read from a GPS, so
+    # payloads referenced by packets are counted.
+    #
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    packets = [cls.unpack(bytes(bytearray(payload))) for payload in payloads]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    # Don't count the list holding the packets.
+    #
+    return (after - before - sys.getsizeof(packets)) / len(packets)
+
+
+def timing(cls, payloads, repeat):
+    unpack = cls.unpack
+    tests = [('unpack', lambda: [unpack(p) for p in payloads]),
+             ('unpack+[0]', lambda: [unpack(p)[0] for p in payloads]),
+             ('unpack+[1]', lambda: [unpack(p)[1] for p in payloads]),
+             ('unpack+fields', lambda: [unpack(p).fields for p in payloads])]
+
+    results = []
+    for (name, func) in tests:
+        elapsed = min(timeit.repeat(func, number=1, repeat=repeat))
+        results.append((name, elapsed / len(payloads) * 1e6))
+    return results
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else REPEAT
+    payloads = load()
+
+    print('%d packets' % (len(payloads)))
+    for cls in [Packet, LazyPacket]:
+        print('%-12s %8.1f bytes/packet' % (cls.__name__, memory(cls, payloads)))
+        for (name, usec) in timing(cls, payloads, repeat):
+            print('  %-16s %8.2f us/packet' % (name, usec))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+"""
+Compare decoding a capture file sequentially with `Capture.packets()`
+and in parallel using an increasing number of processes, both with
+`parallel_packets()` (which returns all packets to the calling process)
+and with `parallel_map()` (which only returns the number of packets
+decoded by each process).
+
+The TSIP captures in ``tests/`` are concatenated `REPEAT` times into a
+temporary capture file.
+
+Usage::
+
+  python benchmarks/bench_parallel.py [<repeat>] [<max processes>]
+
+"""
+
+import os
+import os.path
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from tsip import Packet
+from tsip.capture import Capture, parallel_map, parallel_packets
+
+
+TESTS = os.path.join(ROOT, 'tests')
+CAPTURES = ['thunderbolt.tsip', 'copernicus2.tsip']
+REPEAT = 500
+CHUNK_SIZE = 1024 * 1024
+
+
+def create(repeat):
+    data = b''
+    for capture in CAPTURES:
+        with open(os.path.join(TESTS, capture), 'rb') as f:
+            data += f.read()
+
+    (fd, path) = tempfile.mkstemp(suffix='.tsip')
+    with os.fdopen(fd, 'wb') as f:
+        for i in range(0, repeat):
+            f.write(data)
+    return path
+
+
+def sequential(path):
+    t0 = time.perf_counter()
+    with Capture(path) as capture:
+        count = sum(1 for packet in capture)
+    return (count, time.perf_counter() - t0)
+
+
+def parallel(path, processes):
+    t0 = time.perf_counter()
+    count = sum(1 for packet in parallel_packets(path, processes, chunk_size=CHUNK_SIZE))
+    return (count, time.perf_counter() - t0)
+
+
+def unpack(payloads):
+    return sum(1 for payload in payloads if Packet.unpack(payload))
+
+
+def parallel_unpack(path, processes):
+    t0 = time.perf_counter()
+    count = sum(parallel_map(path, unpack, processes, chunk_size=CHUNK_SIZE))
+    return (count, time.perf_counter() - t0)
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else REPEAT
+    max_processes = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+
+    path = create(repeat)
+    try:
+        print('%d bytes, %d CPUs' % (os.path.getsize(path), os.cpu_count()))
+
+        (count, elapsed) = sequential(path)
+        print('%-14s %10d packets %8.2f s %10.0f packets/s' % ('sequential', count, elapsed, count / elapsed))
+        base = elapsed
+
+        for (name, run) in [('packets', parallel), ('map', parallel_unpack)]:
+            processes = 1
+            while processes <= max_processes:
+                (count, elapsed) = run(path, processes)
+                print('%-14s %10d packets %8.2f s %10.0f packets/s %6.2fx' % (
+                    '%s/%d' % (name, processes), count, elapsed, count / elapsed, base / elapsed))
+                processes *= 2
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
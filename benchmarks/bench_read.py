@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""
+Compare the throughput of `tsip.gps.read()` reading one byte at
+a time with reading in chunks.
+
+The TSIP captures in ``tests/`` are concatenated `REPEAT` times into
+an in-memory stream which is then read with both modes.
+
+Usage::
+
+  python benchmarks/bench_read.py [<repeat>] [<chunksize>]
+
+"""
+
+import io
+import os.path
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import tsip
+
+
+TESTS = os.path.join(ROOT, 'tests')
+CAPTURES = ['thunderbolt.tsip', 'copernicus2.tsip']
+REPEAT = 20
+
+
+def load(repeat):
+    data = b''
+    for capture in CAPTURES:
+        with open(os.path.join(TESTS, capture), 'rb') as f:
+            data += f.read()
+    return data * repeat
+
+
+def run(data, chunksize):
+    conn = io.BytesIO(data)
+    gps = tsip.gps(conn, chunksize=chunksize)
+
+    count = 0
+    t0 = time.perf_counter()
+    for packet in gps:
+        count += 1
+    elapsed = time.perf_counter() - t0
+
+    return (count, elapsed)
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else REPEAT
+    chunksize = int(sys.argv[2]) if len(sys.argv) > 2 else tsip.READ_CHUNK_SIZE
+
+    data = load(repeat)
+    mbytes = len(data) / 1e6
+
+    print('%d bytes' % (len(data)))
+    results = {}
+    for (name, size) in [('bytewise', None), ('chunked(%d)' % chunksize, chunksize)]:
+        (count, elapsed) = run(data, size)
+        results[name] = elapsed
+        print('%-16s %8d packets %8.3f s %10.0f packets/s %8.2f MB/s' %
+              (name, count, elapsed, count / elapsed, mbytes / elapsed))
+
+    (slow, fast) = results.values()
+    print('speed-up: %.1fx' % (slow / fast))
+
+
+if __name__ == '__main__':
+    main()
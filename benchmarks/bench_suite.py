@@ -0,0 +1,315 @@
+#!/usr/bin/env python
+"""
+Benchmark suite for the low-level and high-level APIs.
+
+For every key of `tsip.PACKET_STRUCTURES` a representative payload is
+generated for each of its structures, once filled with pseudo-random
+bytes and once filled with DLE (0x10) bytes to stress byte stuffing.
+For each payload the latency of `tsip.stuff()`, `tsip.frame()`,
+`tsip.unframe()`, `tsip.unstuff()`, `tsip.unframe_unstuff()`,
+`tsip.Packet.unpack()` and `tsip.Packet.pack()` is measured. All framed
+payloads are also joined
+into a stream which is read with `tsip.gps.read()` and `tsip.GPS.read()`
+to measure throughput.
+
+Results are printed and, with ``-o``, written to a JSON file. Two such
+files can be compared with ``-c``.
+
+Usage::
+
+  python benchmarks/bench_suite.py [-o results.json] [-r <repeat>]
+  python benchmarks/bench_suite.py -c old.json new.json
+
+"""
+
+import argparse
+import datetime
+import io
+import json
+import os.path
+import platform
+import random
+import struct
+import subprocess
+import sys
+import timeit
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import tsip
+
+
+SEED = 0x8fac
+REPEAT = 3
+MIN_TIME = 0.005        # minimum seconds per latency measurement
+STREAM_REPEAT = 200     # copies of all payloads in the stream
+OPERATIONS = ['stuff', 'frame', 'unframe', 'unstuff', 'unframe_unstuff', 'unpack', 'pack']
+
+
+# Payloads of structures which cannot be derived from a format string.
+# Each function returns the payload (without code/subcode) for `body(n)`
+# returning `n` filler bytes.
+#
+VARIABLE_SAMPLES = {
+    0x1c81: lambda body: body(8) + b'\x0a' + b'Copernicus',
+    0x1c83: lambda body: body(11) + b'\x0a' + b'Thunderbolt',
+    0x47: lambda body: bytes([tsip.MAX_CHANNELS]) + body(5 * tsip.MAX_CHANNELS),
+    0x58: lambda body: b'\x00\x02\x00\x42' + body(struct.calcsize('>BBfffffffffffffffHH')),
+    0x5f: lambda body: body(64),
+    0x6d: lambda body: body(17 + tsip.MAX_CHANNELS),
+    0xbb00: lambda body: body(struct.calcsize(tsip.Struct0xbb.format) - 2),
+    0x8ea0: lambda body: b'\x00' + body(4),
+    0x8ea8: lambda body: b'\x01' + body(12),
+    0x8fa8: lambda body: b'\x01' + body(12),
+}
+
+
+def header(key):
+    if key > 0xff:
+        return struct.pack('>H', key)
+    else:
+        return struct.pack('>B', key)
+
+
+def payloads_for_key(key, body):
+    """
+    Return one payload for each structure of the packet `key`.
+
+    :param key: Packet code or code/subcode.
+    :param body: Function returning `n` filler bytes.
+    :return: List of binary strings.
+
+    """
+
+    head = header(key)
+    payloads = []
+
+    for struct_ in tsip.PACKET_STRUCTURES[key]:
+        if isinstance(struct_, struct.Struct):
+            payloads.append(head + body(struct_.size - len(head)))
+        elif key in VARIABLE_SAMPLES:
+            payloads.append(head + VARIABLE_SAMPLES[key](body))
+
+    return payloads
+
+
+def generate():
+    """
+    Generate the payloads of all benchmarked packets.
+
+    :return: List of ``(name, payload)`` tuples. Names are the packet key
+        in hex, the payload length and ``random`` or ``dle``.
+
+    """
+
+    rng = random.Random(SEED)
+    fillers = [('random', lambda n: bytes(rng.getrandbits(8) for i in range(0, n))),
+               ('dle', lambda n: tsip.bDLE * n)]
+
+    samples = []
+    for key in sorted(tsip.PACKET_STRUCTURES):
+        for (filler, body) in fillers:
+            for payload in payloads_for_key(key, body):
+                name = '0x%x/%d/%s' % (key, len(payload), filler)
+                samples.append((name, payload))
+
+    return samples
+
+
+def measure(func, repeat):
+    """Return the best time of `func` in nanoseconds per call."""
+
+    timer = timeit.Timer(func)
+
+    number = 1
+    while timer.timeit(number) < MIN_TIME:
+        number *= 4
+
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e9
+
+
+def latency(samples, repeat):
+    """
+    Measure the latency of each operation for each payload.
+
+    :return: Dictionary mapping names of samples to dictionaries mapping
+        operations to nanoseconds per call. Operations which fail for a
+        payload (e.g. packing packets without implemented structure) are
+        ``None``.
+
+    """
+
+    results = {}
+
+    for (name, payload) in samples:
+        stuffed = tsip.stuff(payload)
+        framed = tsip.frame(stuffed)
+        packet = tsip.Packet.unpack(payload)
+
+        operations = {
+            'stuff': lambda: tsip.stuff(payload),
+            'frame': lambda: tsip.frame(stuffed),
+            'unframe': lambda: tsip.unframe(framed),
+            'unstuff': lambda: tsip.unstuff(stuffed),
+            'unframe_unstuff': lambda: tsip.unframe_unstuff(framed),
+            'unpack': lambda: tsip.Packet.unpack(payload),
+            'pack': lambda: packet.pack(),
+        }
+
+        results[name] = {}
+        for operation in OPERATIONS:
+            try:
+                operations[operation]()
+            except (tsip.PackError, NotImplementedError, struct.error, ValueError):
+                results[name][operation] = None
+            else:
+                results[name][operation] = measure(operations[operation], repeat)
+
+    return results
+
+
+def throughput(samples, repeat):
+    """
+    Measure the throughput of reading a stream of all payloads.
+
+    :return: Dictionary mapping stream names to dictionaries holding
+        ``bytes``, ``packets``, ``mb_per_s`` and ``packets_per_s``.
+
+    """
+
+    streams = {
+        'all': [payload for (name, payload) in samples],
+        'random': [payload for (name, payload) in samples if name.endswith('/random')],
+        'dle': [payload for (name, payload) in samples if name.endswith('/dle')],
+    }
+
+    readers = {
+        'gps': lambda conn: tsip.gps(conn),
+        'gps_chunked': lambda conn: tsip.gps(conn, chunksize=tsip.READ_CHUNK_SIZE),
+        'GPS': lambda conn: tsip.GPS(conn),
+        'GPS_chunked': lambda conn: tsip.GPS(conn, chunksize=tsip.READ_CHUNK_SIZE),
+    }
+
+    results = {}
+
+    for (stream, payloads) in sorted(streams.items()):
+        data = b''.join([tsip.frame(tsip.stuff(payload)) for payload in payloads]) * STREAM_REPEAT
+        count = len(payloads) * STREAM_REPEAT
+
+        for (reader, factory) in sorted(readers.items()):
+
+            def run():
+                gps = factory(io.BytesIO(data))
+                while gps.read() is not None:
+                    pass
+
+            # Reading one byte at a time is slow; don't repeat it as often.
+            #
+            elapsed = min(timeit.repeat(run, number=1, repeat=1 if not reader.endswith('_chunked') else repeat))
+
+            results['%s/%s' % (reader, stream)] = {
+                'bytes': len(data),
+                'packets': count,
+                'mb_per_s': len(data) / elapsed / 1e6,
+                'packets_per_s': count / elapsed,
+            }
+
+    return results
+
+
+def metadata():
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT,
+                                         stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        'tsip': tsip.VERSION,
+        'commit': commit,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'date': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+
+
+def summary(latencies):
+    """Return the median latency of each operation over all payloads."""
+
+    result = {}
+    for operation in OPERATIONS:
+        values = sorted([ops[operation] for ops in latencies.values() if ops[operation] is not None])
+        result[operation] = values[len(values) // 2] if values else None
+    return result
+
+
+def report(results):
+    print('tsip %(tsip)s, %(implementation)s %(python)s, %(platform)s' % results['meta'])
+    print('')
+    print('%-16s %12s' % ('operation', 'median ns'))
+    for (operation, ns) in results['summary'].items():
+        print('%-16s %12.0f' % (operation, ns))
+    print('')
+    print('%-20s %10s %12s' % ('stream', 'MB/s', 'packets/s'))
+    for (name, stream) in sorted(results['throughput'].items()):
+        print('%-20s %10.2f %12.0f' % (name, stream['mb_per_s'], stream['packets_per_s']))
+
+
+def compare(old, new):
+    """Print the ratio new/old of the latencies and throughputs."""
+
+    print('%-36s %12s %12s %8s' % ('', 'old', 'new', 'new/old'))
+
+    for (operation, ns) in sorted(new['summary'].items()):
+        ns_old = old['summary'].get(operation)
+        if ns and ns_old:
+            print('%-36s %12.0f %12.0f %8.2f' % ('median ' + operation + ' ns', ns_old, ns, ns / ns_old))
+
+    for (name, ops) in sorted(new['latency'].items()):
+        for (operation, ns) in sorted(ops.items()):
+            ns_old = old['latency'].get(name, {}).get(operation)
+            if ns and ns_old:
+                print('%-36s %12.0f %12.0f %8.2f' % (name + ' ' + operation, ns_old, ns, ns / ns_old))
+
+    for (name, stream) in sorted(new['throughput'].items()):
+        if name in old['throughput']:
+            mbs_old = old['throughput'][name]['mb_per_s']
+            mbs = stream['mb_per_s']
+            print('%-36s %12.2f %12.2f %8.2f' % (name + ' MB/s', mbs_old, mbs, mbs / mbs_old))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('-o', '--output', help='write results to this JSON file')
+    parser.add_argument('-r', '--repeat', type=int, default=REPEAT,
+                        help='number of repetitions per measurement (default: %(default)s)')
+    parser.add_argument('-c', '--compare', nargs=2, metavar=('OLD', 'NEW'),
+                        help='compare two JSON result files')
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            old = json.load(f)
+        with open(args.compare[1]) as f:
+            new = json.load(f)
+        compare(old, new)
+        return
+
+    samples = generate()
+
+    results = {'meta': metadata()}
+    results['latency'] = latency(samples, args.repeat)
+    results['summary'] = summary(results['latency'])
+    results['throughput'] = throughput(samples, args.repeat)
+
+    report(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -38,6 +38,11 @@ setup(
     package_dir={'tsip':
                  'tsip'},
     include_package_data=True,
+    entry_points={
+        'console_scripts': [
+            'read-tsip = tsip.cli:main',
+        ],
+    },
     install_requires=requirements,
     license=LICENSE,
     zip_safe=False,
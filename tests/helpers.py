@@ -0,0 +1,57 @@
+"""
+Helpers shared by the tests.
+
+"""
+
+import os.path
+
+from tsip import *
+
+
+def capture_path(name):
+    """
+    Return the path of the capture file `name` in the tests directory,
+    whether the tests are run from the top-level directory or from the
+    tests directory itself.
+
+    """
+
+    if os.path.exists(name):
+        return name
+    else:
+        return os.path.join('tests', name)
+
+
+def packets_8fa5(count=5):
+    """Return `count` 0x8F-A5 packets with different fields."""
+    return [Packet(0x8f, 0xa5, i, i) for i in range(0, count)]
+
+
+def stream(packets):
+    """Return `packets` framed and byte-stuffed, as sent by a GPS."""
+    return b''.join([frame(stuff(packet.pack())) for packet in packets])
+
+
+PACKETS = packets_8fa5()
+DATA = stream(PACKETS)
+
+# The same followed by a packet of another code.
+#
+MIXED_PACKETS = PACKETS + [Packet(0x46, 0, 0)]
+MIXED_DATA = stream(MIXED_PACKETS)
+
+
+class Clock(object):
+    """
+    Clock advancing by `step` seconds every time it is read. With a step
+    of 0 it only changes when ``now`` is set.
+
+    """
+
+    def __init__(self, step=1.0):
+        self.now = 0.0
+        self.step = step
+
+    def __call__(self):
+        self.now += self.step
+        return self.now
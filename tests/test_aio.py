@@ -0,0 +1,126 @@
+"""
+Tests for tsip.aio.
+
+"""
+
+import asyncio
+import os
+import pty
+import socket
+import tty
+
+from tsip import *
+from tsip.aio import *
+
+
+PACKETS = [Packet(0x8f, 0xab, 1, 2, -1, 3, 4, 5, 6, 7, 8, 2015),
+           Packet(0x8f, 0xa5, 16, 16),
+           Packet(0x41, -10.0, -20, 30.0)]
+DATA = b''.join([frame(stuff(packet.pack())) for packet in PACKETS])
+
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, 5))
+
+
+class TestSocket(object):
+
+    def setup(self):
+        (self.sock1, self.sock2) = socket.socketpair()
+
+    def teardown(self):
+        self.sock1.close()
+        self.sock2.close()
+
+    def test_read(self):
+        async def main():
+            gps = await open_connection(sock=self.sock2)
+            self.sock1.sendall(DATA[:5])
+            self.sock1.sendall(DATA[5:])
+            packets = [await gps.read() for packet in PACKETS]
+            gps.close()
+            return packets
+
+        assert run(main()) == PACKETS
+
+    def test_iter(self):
+        async def main():
+            gps = await open_connection(sock=self.sock2)
+            self.sock1.sendall(DATA * 2)
+            self.sock1.shutdown(socket.SHUT_WR)
+            packets = [packet async for packet in gps]
+            gps.close()
+            return packets
+
+        assert run(main()) == PACKETS * 2
+
+    def test_subscribe(self):
+        async def main():
+            gps = await open_connection(sock=self.sock2, subscribe=[0x8fab, 0x41])
+            self.sock1.sendall(DATA)
+            self.sock1.shutdown(socket.SHUT_WR)
+            packets = [packet async for packet in gps]
+            gps.close()
+            return (packets, gps.packets_skipped)
+
+        assert run(main()) == ([PACKETS[0], PACKETS[2]], 1)
+
+    def test_packet_class(self):
+        async def main():
+            gps = await open_connection(sock=self.sock2, packet_class=LazyPacket, chunksize=3)
+            self.sock1.sendall(DATA)
+            packet = await gps.read()
+            gps.close()
+            return packet
+
+        packet = run(main())
+        assert isinstance(packet, LazyPacket)
+        assert packet == PACKETS[0]
+
+    def test_write(self):
+        async def main():
+            gps = await open_connection(sock=self.sock2)
+            for packet in PACKETS:
+                await gps.write(packet)
+            gps.close()
+            await gps.wait_closed()
+
+        run(main())
+        data = b''
+        while len(data) < len(DATA):
+            data += self.sock1.recv(4096)
+        assert data == DATA
+
+
+class TestPty(object):
+
+    def setup(self):
+        (self.master, self.slave) = pty.openpty()
+        tty.setraw(self.slave)
+        self.fileobj = os.fdopen(self.slave, 'r+b', buffering=0)
+
+    def teardown(self):
+        self.fileobj.close()
+        os.close(self.master)
+
+    def test_read_write(self):
+        async def main():
+            gps = await open_file(self.fileobj)
+            os.write(self.master, DATA)
+            packets = [await gps.read() for packet in PACKETS]
+            await gps.write(PACKETS[0])
+            gps.close()
+            return packets
+
+        assert run(main()) == PACKETS
+        assert os.read(self.master, 4096) == DATA[:len(frame(stuff(PACKETS[0].pack())))]
+
+    def test_subscribe(self):
+        async def main():
+            gps = await open_file(self.fileobj, subscribe=[0x41])
+            os.write(self.master, DATA)
+            packet = await gps.read()
+            gps.close()
+            return packet
+
+        assert run(main()) == PACKETS[2]
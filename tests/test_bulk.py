@@ -0,0 +1,125 @@
+"""
+Tests for tsip.bulk.
+
+"""
+
+from nose.plugins.skip import SkipTest
+
+from tsip import *
+from tsip.capture import Capture, parallel_map
+
+from helpers import capture_path
+
+try:
+    import numpy
+    from tsip.bulk import *
+except ImportError:
+    numpy = None
+
+
+def collect(payloads):
+    decoder = BulkDecoder()
+    decoder.extend(payloads)
+    return decoder
+
+
+class BulkTest(object):
+
+    def setup(self):
+        if numpy is None:
+            raise SkipTest('NumPy not installed')
+
+
+class TestDtype(BulkTest):
+
+    def test_dtype_for_format(self):
+        for (key, value) in PACKET_STRUCTURES.items():
+            for struct_ in value:
+                if isinstance(struct_, Struct):
+                    dtype = dtype_for_format(struct_.format)
+                    assert dtype.itemsize == struct_.size
+                    assert len(dtype.names) == len(parse_format(struct_.format))
+
+    def test_names(self):
+        dtype = dtype_for_format('>BBH', names=['code', 'subcode', 'value'])
+        assert dtype.names == ('code', 'subcode', 'value')
+
+
+class TestDecodeCapture(BulkTest):
+    tsipfile = 'thunderbolt.tsip'
+
+    def test_decode_capture(self):
+        arrays = decode_capture(capture_path(self.tsipfile))
+
+        packets = {}
+        with Capture(capture_path(self.tsipfile)) as capture:
+            for payload in capture.payloads():
+                key = get_key_for_rawpacket(payload)
+                packets.setdefault(key, []).append(Packet.unpack(payload))
+
+        assert sorted(arrays.keys()) == sorted(packets.keys())
+
+        for (key, array) in arrays.items():
+            assert len(array) == len(packets[key])
+
+            if 'length' in array.dtype.names:
+                continue
+
+            for (record, packet) in zip(array, packets[key]):
+                for (i, value) in enumerate(record.tolist()[:len(packet)]):
+                    if numpy.ndim(value) == 0:
+                        assert numpy.isclose(value, packet[i])
+
+
+    def test_decode_capture_parallel(self):
+        expected = decode_capture(capture_path(self.tsipfile))
+
+        decoder = BulkDecoder()
+        for chunk in parallel_map(capture_path(self.tsipfile), collect, 2, chunk_size=1000):
+            decoder.update(chunk)
+        arrays = decoder.arrays()
+
+        assert sorted(arrays.keys()) == sorted(expected.keys())
+        for (key, array) in arrays.items():
+            assert array.tobytes() == expected[key].tobytes()
+
+        arrays = decode_capture(capture_path(self.tsipfile), processes=2)
+        assert sorted(arrays.keys()) == sorted(expected.keys())
+
+
+class TestDecodeCaptureCopernicus(TestDecodeCapture):
+    tsipfile = 'copernicus2.tsip'
+
+
+class TestDecodeArrays(BulkTest):
+
+    def test_fixed(self):
+        packets = [Packet(0x8f, 0xa5, i, 2 * i) for i in range(0, 5)]
+        arrays = decode_arrays([packet.pack() for packet in packets])
+        assert list(arrays[0x8fa5]['f2']) == list(range(0, 5))
+        assert list(arrays[0x8fa5]['f3']) == list(range(0, 10, 2))
+
+    def test_several_structures(self):
+        arrays = decode_arrays([b'\x46\x01\x02', b'\x46', b'\x46\x03\x04'])
+        assert list(arrays[(0x46, 3)]['f1']) == [1, 3]
+        assert list(arrays[(0x46, 1)]['f0']) == [0x46]
+
+    def test_0x47(self):
+        arrays = decode_arrays([b'G\x01\x02A\xa0\x00\x00',
+                                b'G\x02\x03A\xf0\x00\x00\x04B \x00\x00'])
+        array = arrays[0x47]
+        assert list(array['f1']) == [1, 2]
+        assert list(array['f2']['prn'][1][:3]) == [3, 4, 0]
+        assert list(array['f2']['level'][1][:2]) == [30.0, 40.0]
+
+    def test_0x6d(self):
+        packet = Packet(0x6d, 0x34, 10.0, 20.0, 30.0, 40.0, -1, -2, -3)
+        array = decode_arrays([packet.pack()])[0x6d]
+        assert array['f2'][0] == 10.0
+        assert list(array['f6'][0][:4]) == [-1, -2, -3, 0]
+
+    def test_raw(self):
+        array = decode_arrays([b'\x99\x01\x02', b'\x99\x01'])[0x9901]
+        assert list(array['length']) == [3, 2]
+        assert list(array['data'][0]) == [0x99, 1, 2]
+        assert list(array['data'][1]) == [0x99, 1, 0]
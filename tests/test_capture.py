@@ -0,0 +1,146 @@
+"""
+Tests for tsip.capture.
+
+"""
+
+import os
+import os.path
+import tempfile
+
+from tsip import *
+from tsip.capture import *
+
+from helpers import capture_path
+
+
+class TestCapture(object):
+    tsipfile = 'thunderbolt.tsip'
+
+    def setup(self):
+        self.path = capture_path(self.tsipfile)
+        self.capture = Capture(self.path)
+
+    def teardown(self):
+        self.capture.close()
+
+    def test_packets(self):
+        with open(self.path, 'rb') as conn:
+            expected = list(GPS(conn))
+
+        assert list(self.capture) == expected
+        assert self.capture.packets_read == len(expected)
+        assert self.capture.bytes_read == os.path.getsize(self.path)
+
+    def test_payloads(self):
+        with open(self.path, 'rb') as conn:
+            expected = [unstuff(unframe(packet)) for packet in gps(conn)]
+
+        assert [bytes(payload) for payload in self.capture.payloads()] == expected
+
+    def test_subscribe(self):
+        with open(self.path, 'rb') as conn:
+            packets = list(GPS(conn))
+        expected = [packet for packet in packets if packet[0] in (0x46, 0x8f)]
+
+        with Capture(self.path, subscribe=[0x46, 0x8f]) as capture:
+            assert list(capture) == expected
+            assert capture.packets_read == len(expected)
+            assert capture.packets_skipped == len(packets) - len(expected)
+
+    def test_throughput(self):
+        for packet in self.capture:
+            pass
+
+        (mbytes, packets) = self.capture.throughput()
+        assert mbytes > 0.0
+        assert packets > 0.0
+
+
+class TestParallel(object):
+
+    def setup(self):
+        data = b''
+        for name in ['thunderbolt.tsip', 'copernicus2.tsip']:
+            with open(capture_path(name), 'rb') as f:
+                data += f.read()
+        data += frame(stuff(Packet(0x8f, 0xa5, 0x1010, 0x1003).pack())) * 3
+
+        (fd, self.path) = tempfile.mkstemp(suffix='.tsip')
+        os.write(fd, data[100:] + data)
+        os.close(fd)
+
+        with Capture(self.path) as capture:
+            self.expected = list(capture)
+
+    def teardown(self):
+        os.remove(self.path)
+
+    def test_parallel(self):
+        for chunk_size in [997, 4096, 1000000]:
+            packets = list(parallel_packets(self.path, processes=2, chunk_size=chunk_size))
+            assert packets == self.expected
+
+    def test_subscribe(self):
+        packets = list(parallel_packets(self.path, processes=2, chunk_size=4096,
+                                        subscribe=[0x8fa5]))
+        assert packets == [packet for packet in self.expected if packet[0:2] == [0x8f, 0xa5]]
+
+
+def test_find_sync():
+    data = frame(stuff(Packet(0x8f, 0xa5, 0x1003, 0x1010).pack())) * 2
+    (start, stop, pos) = find_frame(data)
+
+    assert find_sync(data, 0) == 0
+    assert find_sync(data, 1) == stop
+    assert find_sync(data, stop) == stop
+    assert find_sync(data, stop + 1) == len(data)
+
+    # Starting anywhere after the first packet's DLE yields the second packet.
+    for i in range(1, len(data)):
+        assert find_frame(data, find_sync(data, i))[1] in (len(data), None)
+
+
+class TestCaptureCopernicus(TestCapture):
+    tsipfile = 'copernicus2.tsip'
+
+
+class TestCaptureData(object):
+
+    def setup(self):
+        (fd, self.path) = tempfile.mkstemp(suffix='.tsip')
+        os.close(fd)
+
+    def teardown(self):
+        os.remove(self.path)
+
+    def capture(self, data):
+        with open(self.path, 'wb') as f:
+            f.write(data)
+        return Capture(self.path)
+
+    def test_empty(self):
+        with self.capture(b'') as capture:
+            assert list(capture) == []
+            assert capture.throughput() == (0.0, 0.0)
+
+    def test_stuffed(self):
+        packet = Packet(0x8f, 0xa5, 16, 16)
+        data = frame(stuff(packet.pack()))
+        with self.capture(data[4:] + data + b'\x00' + data[:-1]) as capture:
+            payloads = list(capture.payloads())
+            assert payloads == [packet.pack()]
+            assert isinstance(payloads[0], bytes)
+
+    def test_zero_copy(self):
+        packet = Packet(0x8f, 0xa5, 1, 2)
+        with self.capture(frame(stuff(packet.pack())) * 2) as capture:
+            payloads = list(capture.payloads())
+            assert isinstance(payloads[0], memoryview)
+            assert list(map(Packet.unpack, payloads)) == [packet, packet]
+            del payloads
+
+    def test_unknown(self):
+        with self.capture(frame(b'\x99\x01\x02')) as capture:
+            packets = list(capture)
+            assert packets == [Packet(0xff, b'\x99\x01\x02')]
+            assert isinstance(packets[0][1], bytes)
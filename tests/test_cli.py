@@ -0,0 +1,115 @@
+"""
+Tests for tsip.cli.
+
+"""
+
+import io
+import json
+import sys
+
+from tsip import *
+from tsip.cli import *
+
+from helpers import MIXED_PACKETS as PACKETS, MIXED_DATA as DATA, Clock, capture_path
+
+
+UNKNOWN = frame(b'\x8f\xa5\x01')          # too short for 0x8F-A5
+
+
+class Silent(object):
+    """Returns no data every other read, like a serial port timing out."""
+
+    def __init__(self, data):
+        self.chunks = []
+        for i in range(0, len(data), 10):
+            self.chunks.extend([data[i:i + 10], b''])
+
+    def read(self, size):
+        return self.chunks.pop(0)
+
+
+class TestRun(object):
+
+    def setup(self):
+        self.out = io.StringIO()
+        self.err = io.StringIO()
+
+    def run(self, data, **kwargs):
+        return run(io.BytesIO(data), self.out, self.err, **kwargs)
+
+    def lines(self):
+        return self.out.getvalue().splitlines()
+
+    def test_human(self):
+        assert self.run(DATA) == len(PACKETS)
+        assert self.lines()[0] == '0x8fa5 0 0'
+        assert self.lines()[-1] == '0x46 0 0'
+        assert self.err.getvalue() == ''
+
+    def test_json(self):
+        self.run(DATA + UNKNOWN, format='json')
+        records = [json.loads(line) for line in self.lines()]
+        assert records[0] == {'code': '0x8fa5', 'fields': [0x8f, 0xa5, 0, 0]}
+        assert records[-1] == {'code': '0xff', 'fields': [0xff, '8fa501']}
+
+    def test_json_nan(self):
+        packet = Packet(0x8e, 0xa0, 0, float('nan'))
+        self.run(frame(stuff(packet.pack())), format='json')
+
+        def invalid(constant):
+            raise ValueError(constant)
+
+        record = json.loads(self.lines()[0], parse_constant=invalid)
+        assert record == {'code': '0x8ea0', 'fields': [0x8e, 0xa0, 0, None]}
+        assert format_json(Packet(0x4a, float('inf'), 0.0, 0.0, 0.0, 0.0)).endswith('[74, null, 0.0, 0.0, 0.0, 0.0]}')
+
+    def test_hex(self):
+        self.run(DATA, format='hex')
+        assert self.lines()[0] == '108fa5000000001003'
+
+    def test_subscribe_and_count(self):
+        assert self.run(DATA, subscribe=[0x8fa5], count=3) == 3
+        assert self.lines() == ['0x8fa5 0 0', '0x8fa5 1 1', '0x8fa5 2 2']
+
+    def test_summary(self):
+        self.run(b'\x01\x02' + DATA, summary=True, clock=Clock())
+        lines = self.err.getvalue().splitlines()
+        assert lines[0].startswith('elapsed')
+        assert lines[2].split() == ['packets', 'in', str(len(PACKETS))]
+        assert lines[4].split() == ['bytes', 'discarded', '2']
+        assert lines[-1].split()[:2] == ['0x8fa5', '5']
+
+    def test_stats_interval(self):
+        run(Silent(DATA), self.out, self.err, follow=True, count=len(PACKETS),
+            stats_interval=2.0, clock=Clock())
+        lines = self.err.getvalue().splitlines()
+        assert len(lines) >= 2
+        assert all(['packets/s' in line for line in lines])
+        assert len(self.lines()) == len(PACKETS)
+
+
+class TestMain(object):
+
+    def setup(self):
+        self.stdout = sys.stdout
+        sys.stdout = io.StringIO()
+
+    def teardown(self):
+        sys.stdout = self.stdout
+
+    def test_capture(self):
+        assert main([capture_path('thunderbolt.tsip'), '-s', '8fab', '-n', '2']) == 0
+        lines = sys.stdout.getvalue().splitlines()
+        assert len(lines) == 2
+        assert lines[0].startswith('0x8fab ')
+
+    def test_parser(self):
+        args = make_parser().parse_args(['/dev/ttyS0', '115200', '-f', 'json', '-s', '8fab', '-s', '46'])
+        assert args.baudrate == 115200
+        assert args.subscribe == [0x8fab, 0x46]
+
+
+def test_get_key():
+    assert get_key([0x8f, 0xab, 1]) == 0x8fab
+    assert get_key([0x46, 0, 0]) == 0x46
+    assert get_key([0xff, b'\x8f']) == 0xff
@@ -0,0 +1,173 @@
+"""
+Tests for tsip.correlate.
+
+"""
+
+import concurrent.futures
+
+from nose.tools import raises
+
+from tsip import *
+from tsip.correlate import *
+from tsip.emulator import socketpair
+from tsip.reader import BackgroundReader
+
+from helpers import Clock
+
+
+class Loopback(object):
+    """Records written packets, returns packets passed to `reply()`."""
+
+    def __init__(self):
+        self.written = []
+        self.packets = []
+
+    def write(self, packet, *values):
+        self.written.append(frame_packet(packet, *values))
+
+    def reply(self, *packets):
+        self.packets.extend(packets)
+
+    def read(self):
+        if self.packets:
+            return self.packets.pop(0)
+        return None
+
+
+class TestCorrelator(object):
+
+    def setup(self):
+        self.gps = Loopback()
+        self.clock = Clock(step=0.0)
+        self.correlator = Correlator(self.gps, timeout=1.0, clock=self.clock)
+
+    def test_request(self):
+        future = self.correlator.request(Packet(0x8e, 0xa5, 0, 0))
+        assert self.gps.written == [frame_packet(Packet(0x8e, 0xa5, 0, 0))]
+        assert len(self.correlator) == 1
+
+        self.gps.reply(Packet(0x8f, 0xab, 1, 2, 3, 4, 5, 6, 7, 8, 9, 2015),
+                       Packet(0x8f, 0xa5, 1, 2))
+        assert self.correlator.read()[0:2] == [0x8f, 0xab]
+        assert not future.done()
+        assert self.correlator.read() is None
+        assert future.result(0) == Packet(0x8f, 0xa5, 1, 2)
+        assert len(self.correlator) == 0
+        assert self.correlator.requests_completed == 1
+
+    def test_pipelined(self):
+        futures = [self.correlator.request(Packet(0x8e, 0xa5, 0, 0)),
+                   self.correlator.request(Packet(0x1c, 0x01)),
+                   self.correlator.request(Packet(0x8e, 0xa5, 0, 0))]
+
+        self.gps.reply(Packet(0x8f, 0xa5, 1, 1), Packet(0x1c, 0x81, 0, 1, 2, 3, 4, 5, 6, b'x'),
+                       Packet(0x8f, 0xa5, 2, 2))
+        assert self.correlator.read() is None
+        assert futures[0].result(0) == Packet(0x8f, 0xa5, 1, 1)
+        assert futures[1].result(0)[0:2] == [0x1c, 0x81]
+        assert futures[2].result(0) == Packet(0x8f, 0xa5, 2, 2)
+
+    def test_several_reports(self):
+        future = self.correlator.request(Packet(0x26))
+        self.gps.reply(Packet(0x4b, 0, 0, 0), Packet(0x46, 0, 0))
+        self.correlator.read()
+        assert future.result(0) == [Packet(0x46, 0, 0), Packet(0x4b, 0, 0, 0)]
+
+    def test_command(self):
+        future = self.correlator.request(Command(0x8e, 0xa5, None, None), 3, 4)
+        assert self.gps.written == [frame_packet(Packet(0x8e, 0xa5, 3, 4))]
+        self.gps.reply(Packet(0x8f, 0xa5, 3, 4))
+        self.correlator.read()
+        assert future.result(0) == Packet(0x8f, 0xa5, 3, 4)
+
+    @raises(concurrent.futures.TimeoutError)
+    def test_timeout(self):
+        future = self.correlator.request(Packet(0x8e, 0xa5, 0, 0))
+        self.clock.now = 0.5
+        self.correlator.read()
+        assert not future.done()
+
+        self.clock.now = 1.0
+        self.correlator.read()
+        assert self.correlator.requests_expired == 1
+        future.result(0)
+
+    def test_timeout_per_request(self):
+        future1 = self.correlator.request(Packet(0x8e, 0xa5, 0, 0), timeout=None)
+        future2 = self.correlator.request(Packet(0x1c, 0x01), timeout=0.1)
+        self.clock.now = 10.0
+        assert self.correlator.expire() == 1
+        assert not future1.done()
+        assert isinstance(future2.exception(0), concurrent.futures.TimeoutError)
+
+    def test_custom_reports(self):
+        future = self.correlator.request(Packet(0x8e, 0xa5, 0, 0), reports=[0x8fab])
+        self.gps.reply(Packet(0x8f, 0xa5, 1, 1), Packet(0x8f, 0xab, 1, 2, 3, 4, 5, 6, 7, 8, 9, 2015))
+        assert self.correlator.read() == Packet(0x8f, 0xa5, 1, 1)
+        assert self.correlator.read() is None
+        assert future.result(0)[0:2] == [0x8f, 0xab]
+
+    def test_cancel(self):
+        future = self.correlator.request(Packet(0x8e, 0xa5, 0, 0))
+        future.cancel()
+        assert self.correlator.expire() == 0
+        assert len(self.correlator) == 0
+
+    def cancel_late(self, future):
+        # Cancel `future` as if another thread did so right after the
+        # correlator checked whether it was cancelled.
+        future.cancel()
+        future.cancelled = lambda: False
+
+    def test_cancel_race_dispatch(self):
+        future = self.correlator.request(Packet(0x8e, 0xa5, 0, 0))
+        self.cancel_late(future)
+        self.gps.reply(Packet(0x8f, 0xa5, 1, 2))
+        assert self.correlator.read() is None
+        assert future.done()
+        assert len(self.correlator) == 0
+
+    def test_cancel_race_expire(self):
+        future = self.correlator.request(Packet(0x8e, 0xa5, 0, 0))
+        self.clock.now = 1.0
+        self.cancel_late(future)
+        assert self.correlator.expire() == 0
+        assert self.correlator.requests_expired == 0
+        assert len(self.correlator) == 0
+
+    def test_close(self):
+        future = self.correlator.request(Packet(0x8e, 0xa5, 0, 0))
+        self.correlator.close()
+        assert future.cancelled()
+
+    @raises(ValueError)
+    def test_unknown_command(self):
+        self.correlator.request(Packet(0x8e, 0x26))
+
+
+def test_emulated():
+    (emulator, conn) = socketpair(broadcasts={0x8fab: 50})
+    conn.settimeout(0.05)
+    correlator = Correlator(GPS(conn, chunksize=READ_CHUNK_SIZE), timeout=5)
+
+    try:
+        emulator.start()
+        with BackgroundReader(correlator) as reader:
+            futures = [correlator.request(Packet(0x8e, 0xac, 0)),
+                       correlator.request(Command(0x8e, 0xa0, 0, None), 1.5),
+                       correlator.request(Packet(0x1c, 0x01)),
+                       correlator.request(Packet(0x26))]
+
+            assert futures[0].result(5)[0:2] == [0x8f, 0xac]
+            assert futures[1].result(5)[3] == 1.5
+            assert futures[2].result(5)[0:2] == [0x1c, 0x81]
+            assert [packet[0] for packet in futures[3].result(5)] == [0x46, 0x4b]
+
+            # Broadcasts still reach the reader.
+            assert reader.read(timeout=5)[0:2] == [0x8f, 0xab]
+
+            future = correlator.request(Packet(0x8e, 0xa5, 0, 0), reports=[0x8f99], timeout=0.1)
+            assert isinstance(future.exception(5), concurrent.futures.TimeoutError)
+    finally:
+        emulator.close()
+        conn.close()
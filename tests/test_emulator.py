@@ -0,0 +1,156 @@
+"""
+Tests for tsip.emulator.
+
+"""
+
+import socket
+
+from tsip import *
+from tsip.emulator import *
+
+
+# Sunday, 18-Oct-2015 12:34:56 UTC
+NOW = 1445171696.0
+
+
+def command(packet):
+    return frame(stuff(packet.pack()))
+
+
+class TestHandle(object):
+
+    def setup(self):
+        (self.sock1, self.sock2) = socket.socketpair()
+        self.emulator = Emulator(self.sock1, clock=lambda: NOW)
+
+    def teardown(self):
+        self.sock1.close()
+        self.sock2.close()
+
+    def test_command_reports(self):
+        for (key, report_keys) in COMMAND_REPORTS.items():
+            for report_key in report_keys:
+                assert key in PACKET_STRUCTURES
+                assert report_key in PACKET_STRUCTURES
+
+    def test_default_reports(self):
+        for (key, packet) in default_reports().items():
+            assert get_key_for_fields(Packet.unpack(packet.pack()).fields) == key
+
+    def test_request(self):
+        responses = self.emulator.handle(Packet(0x1c, 0x01).pack())
+        assert len(responses) == 1
+        assert responses[0][0:2] == [0x1c, 0x81]
+
+    def test_request_several_reports(self):
+        responses = self.emulator.handle(Packet(0x26).pack())
+        assert [packet[0] for packet in responses] == [0x46, 0x4b]
+
+    def test_unknown_command(self):
+        assert self.emulator.handle(Packet(0x8e, 0x26).pack()) == []
+        assert self.emulator.commands_received == 1
+
+    def test_set(self):
+        responses = self.emulator.handle(Packet(0x35, 1, 2, 3, 4).pack())
+        assert responses == [Packet(0x55, 1, 2, 3, 4)]
+        assert self.emulator.report(0x55) == Packet(0x55, 1, 2, 3, 4)
+
+    def test_set_subcode(self):
+        responses = self.emulator.handle(Packet(0x8e, 0xa5, 1, 2).pack())
+        assert responses == [Packet(0x8f, 0xa5, 1, 2)]
+
+    def test_set_dac(self):
+        self.emulator.handle(Packet(0x8e, 0xa0, 1, 12345).pack())
+        assert self.emulator.report(0x8fa0)[2] == 12345
+        (report,) = self.emulator.handle(Packet(0x8e, 0xa0, 0, 1.5).pack())
+        assert report[3] == 1.5
+
+    def test_time(self):
+        report = self.emulator.report(0x8fab)
+        assert report[2:4] == [45314, 1867]
+        assert report[6:12] == [56, 34, 12, 18, 10, 2015]
+
+        (report,) = self.emulator.handle(Packet(0x21).pack())
+        assert report[1:3] == [45314.0, 1867]
+
+    def test_feed(self):
+        self.emulator.feed(command(Packet(0x1c, 0x01))[:3])
+        self.emulator.feed(command(Packet(0x1c, 0x01))[3:] + command(Packet(0x8e, 0xa5, 1, 2)))
+        self.sock1.shutdown(socket.SHUT_WR)
+
+        packets = list(GPS(self.sock2, chunksize=READ_CHUNK_SIZE))
+        assert [packet[0:2] for packet in packets] == [[0x1c, 0x81], [0x8f, 0xa5]]
+        assert self.emulator.packets_sent == 2
+
+
+class TestBroadcasts(object):
+
+    def setup(self):
+        (self.sock1, self.sock2) = socket.socketpair()
+        self.emulator = Emulator(self.sock1, broadcasts={0x8fab: 1, 0x8fac: 10})
+
+    def teardown(self):
+        self.sock1.close()
+        self.sock2.close()
+
+    def test_due(self):
+        packets = self.emulator.due(100.0)
+        assert sorted([packet[1] for packet in packets]) == [0xab, 0xac]
+        assert self.emulator.due(100.05) == []
+        assert [packet[1] for packet in self.emulator.due(100.1)] == [0xac]
+
+    def test_due_behind(self):
+        self.emulator.due(100.0)
+        packets = self.emulator.due(101.0)
+        assert len([packet for packet in packets if packet[1] == 0xac]) == 10
+        assert len([packet for packet in packets if packet[1] == 0xab]) == 1
+
+    def test_timeout(self):
+        self.emulator.due(100.0)
+        assert abs(self.emulator.timeout(100.05) - 0.05) < 1e-9
+
+
+class TestSocketpair(object):
+
+    def setup(self):
+        (self.emulator, self.conn) = socketpair(broadcasts={0x8fab: 100})
+        self.conn.settimeout(5)
+        self.emulator.start()
+
+    def teardown(self):
+        self.emulator.close()
+        self.conn.close()
+
+    def test_broadcasts(self):
+        gps = GPS(self.conn, chunksize=READ_CHUNK_SIZE)
+        for i in range(0, 10):
+            assert gps.read()[0:2] == [0x8f, 0xab]
+
+    def test_request(self):
+        gps = GPS(self.conn, chunksize=READ_CHUNK_SIZE)
+        gps.write(Packet(0x1c, 0x03))
+        for packet in gps:
+            if packet[0:2] == [0x1c, 0x83]:
+                break
+        assert packet[-1] == 'Emulated TSIP Receiver'
+
+    def test_eof(self):
+        self.conn.shutdown(socket.SHUT_WR)
+        self.emulator._thread.join(5)
+        assert not self.emulator._thread.is_alive()
+
+
+class TestPty(object):
+
+    def setup(self):
+        (self.emulator, self.name) = open_pty(broadcasts={})
+        self.emulator.start()
+
+    def teardown(self):
+        self.emulator.close()
+
+    def test_request(self):
+        with open(self.name, 'r+b', buffering=0) as conn:
+            gps = GPS(conn, chunksize=READ_CHUNK_SIZE)
+            gps.write(Packet(0x1f))
+            assert gps.read()[0] == 0x45
@@ -0,0 +1,134 @@
+"""
+Tests for tsip.export.
+
+"""
+
+import os
+import os.path
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import numpy
+
+from tsip import *
+from tsip.bulk import decode_capture
+from tsip.capture import Capture
+from tsip.export import *
+
+from helpers import capture_path
+
+
+class TestExport(object):
+    tsipfile = 'thunderbolt.tsip'
+    key = 0x8fac
+
+    def setup(self):
+        self.path = capture_path(self.tsipfile)
+        self.directory = tempfile.mkdtemp()
+
+    def teardown(self):
+        shutil.rmtree(self.directory)
+
+    def check(self, columns, subscribe=None):
+        arrays = decode_capture(self.path, subscribe)
+        assert len(columns) == len(arrays)
+
+        for (key, fields) in columns.items():
+            # Keys are named after the structures, not after the
+            # packets in the file.
+            if key not in arrays:
+                key = key[0]
+
+            array = arrays[key]
+            assert sorted(fields) == sorted(array.dtype.names)
+
+            for (name, column) in fields.items():
+                assert column.dtype.isnative
+                assert len(column) == len(array)
+                if name == 'data':
+                    assert numpy.array_equal(array[name], column[:, :array[name].shape[1]])
+                else:
+                    assert numpy.array_equal(array[name], column)
+
+    def test_export(self):
+        with open(self.path, 'rb') as f:
+            count = sum(1 for packet in GPS(f))
+
+        assert export_capture(self.path, self.directory, batch_size=7) == count
+        self.check(load_columns(self.directory))
+
+    def test_subscribe(self):
+        export_capture(self.path, self.directory, subscribe=[self.key])
+        columns = load_columns(self.directory, mmap_mode=None)
+        assert list(columns) == [self.key]
+        self.check(columns, [self.key])
+
+    def test_batches(self):
+        with Exporter(self.directory, batch_size=10) as exporter:
+            with Capture(self.path) as capture:
+                for payload in capture.payloads():
+                    exporter.add(payload)
+                    if exporter.packets_written == 100:
+                        # Columns can be loaded while still exporting.
+                        rows = sum(len(list(fields.values())[0]) for fields in load_columns(self.directory).values())
+                        assert rows == 100
+
+        self.check(load_columns(self.directory))
+
+    def test_main(self):
+        subprocess.check_call([sys.executable, '-m', 'tsip.export', '-b', '50',
+                               self.path, self.directory])
+        self.check(load_columns(self.directory))
+
+
+class TestExportCopernicus(TestExport):
+    tsipfile = 'copernicus2.tsip'
+    key = 0x41
+
+
+def test_malformed():
+    directory = tempfile.mkdtemp()
+
+    try:
+        payload = Packet(0x8f, 0xab, 100, 2000, 18, 3, 1, 2, 3, 4, 5, 2020).pack()
+        assert export_payloads([payload, payload[:-1], payload, b'\x99\x01'], directory) == 4
+        columns = load_columns(directory)
+
+        assert sorted(columns, key=str) == sorted([0x8fab, (0x8fab, None), 0x9901], key=str)
+        assert sorted(columns[0x8fab]) == ['f%d' % (i) for i in sorted(range(0, 12), key=str)]
+        assert [len(column) for column in columns[0x8fab].values()] == [2] * 12
+        assert columns[0x8fab]['f2'].tolist() == [100, 100]
+        assert sorted(columns[(0x8fab, None)]) == ['data', 'length']
+        assert columns[(0x8fab, None)]['length'].tolist() == [len(payload) - 1]
+        assert os.path.isdir(os.path.join(directory, '0x8fab-malformed'))
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_column_writer():
+    (fd, path) = tempfile.mkstemp(suffix='.npy')
+    os.close(fd)
+
+    try:
+        writer = ColumnWriter(path, '<f4', (3,))
+        assert numpy.load(path).shape == (0, 3)
+        writer.append(numpy.ones((2, 3)))
+        writer.append(numpy.zeros((1, 3)))
+        writer.close()
+
+        array = numpy.load(path)
+        assert array.dtype == numpy.dtype('<f4')
+        assert array.tolist() == [[1, 1, 1], [1, 1, 1], [0, 0, 0]]
+    finally:
+        os.remove(path)
+
+
+def test_column_set_name():
+    for key in [0x41, 0x8fac, (0x46, 3), (0x8fac, None), None]:
+        if isinstance(key, tuple):
+            name = column_set_name(key[0], key[1], malformed=key[1] is None)
+        else:
+            name = column_set_name(key)
+        assert parse_column_set_name(name) == key
@@ -34,6 +34,15 @@ class PacketTest(object):
                self.pkt5 == \
                self.pkt6
 
+    def test_lazy(self):
+        rawpacket = self.pkt1.pack()
+        lazy = LazyPacket.unpack(rawpacket)
+        assert lazy.pack() == rawpacket
+        assert [lazy[i] for i in range(0, len(self.pkt2))] == self.pkt2.fields
+        assert lazy == self.pkt2
+        assert repr(lazy) == repr(self.pkt2)
+        assert list(lazy) == list(self.pkt2)
+
 
 @raises(PackError)
 def test_pack_valueerror():
@@ -47,6 +56,125 @@ def test_unpack_unknown_packet():
     assert packet[1] == '\x1e\x01\x02'
 
 
+def test_lazy_setitem():
+    lazy = LazyPacket.unpack(memoryview(Packet(0x8f, 0xa5, 1, 2).pack()))
+    assert lazy[-1] == 2
+    lazy[3] = 3
+    assert lazy == Packet(0x8f, 0xa5, 1, 3)
+    assert lazy.pack() == Packet(0x8f, 0xa5, 1, 3).pack()
+
+
+def test_sequence_argument():
+    packet = Packet(0x8e, 0xab, 0)
+    copy = Packet(packet)
+    assert copy == packet
+    assert copy.fields is not packet.fields
+    assert Packet(range(0x8e, 0x91)).fields == [0x8e, 0x8f, 0x90]
+    assert Packet([]).fields == []
+    assert Packet(()).fields == []
+
+
+def test_slots():
+    assert not hasattr(Packet(0x1f), '__dict__')
+    assert not hasattr(LazyPacket(b'\x1f'), '__dict__')
+
+
+def test_unpack_raw_packet():
+    packet = Packet.unpack(b'\x5f\x11\x00\x01')
+    assert packet.fields == [0x5f, 0x11, 0x00, 0x01]
+
+
+def test_packetdecoder():
+    data = frame(stuff(Packet(0x8f, 0xab, 1, 2, -1, 3, 4, 5, 6, 7, 8, 2015).pack()))
+    decoder = PacketDecoder()
+    assert decoder.feed(data[:3]) == []
+    packets = decoder.feed(data[3:] + data)
+    assert len(packets) == 2
+    assert packets[0] == packets[1] == Packet(0x8f, 0xab, 1, 2, -1, 3, 4, 5, 6, 7, 8, 2015)
+
+
+def test_gps_iter():
+    data = frame(stuff(Packet(0x8f, 0xa5, 16, 16).pack()))
+    for chunksize in [None, 4]:
+        gps = GPS(stringio.BytesIO(data * 3), chunksize=chunksize)
+        assert list(gps) == [Packet(0x8f, 0xa5, 16, 16)] * 3
+
+
+def test_gps_subscribe():
+    data = frame(stuff(Packet(0x8f, 0xa5, 16, 16).pack())) + frame(Packet(0x46, 0, 0).pack())
+    gps = GPS(stringio.BytesIO(data * 3), chunksize=4, subscribe=[0x46])
+    assert list(gps) == [Packet(0x46, 0, 0)] * 3
+    assert gps.packets_skipped == 3
+
+
+class TestCommand(object):
+    commands = [
+        ([0x8e, 0xab, 0], []),
+        ([0x1c, 0x01], []),
+        ([0x8e, 0xa0, 0, None], [1.25]),
+        ([0x8e, 0xa0, 1, None], [16]),
+        ([0x8e, 0xa5, None, None], [0x10, 0x1010]),
+        ([0x8e, 0xa5, 0x10, None], [0x10]),
+        ([0x8e, 0xa5, None, 0x1010], [0]),
+        ([0x8e, 0xa8, 1, None, None, 3.0], [1.0, 2.0]),
+    ]
+
+    def test_frame(self):
+        for (fields, values) in self.commands:
+            command = Command(fields)
+            values_ = iter(values)
+            packet = Packet([next(values_) if field is None else field for field in fields])
+
+            assert command.frame(*values) == frame(stuff(packet.pack()))
+            assert command.packet(*values) == packet
+
+    def test_constant(self):
+        command = Command(0x8e, 0xab, 0)
+        assert command.data == b'\x10\x8e\xab\x00\x10\x03'
+        assert command.frame() is command.data
+
+    def test_variant(self):
+        command = Command(0x8e, 0xa8, 1, None, 2.0, 3.0)
+        assert command._segments is not None
+        assert command.frame(1.0) == frame(stuff(Packet(0x8e, 0xa8, 1, 1.0, 2.0, 3.0).pack()))
+
+    def test_unknown_structure(self):
+        # Strings have no `struct` format.
+        command = Command(0x1c, 0x83, None, 17, 11, 2015, 15, 987, 'hardwareid')
+        assert command._segments is None
+        assert command.frame(1234567890) == \
+            frame(stuff(Packet(0x1c, 0x83, 1234567890, 17, 11, 2015, 15, 987, 'hardwareid').pack()))
+
+    @raises(TypeError)
+    def test_missing_value(self):
+        Command(0x8e, 0xa0, 0, None).frame()
+
+    @raises(PackError)
+    def test_invalid_value(self):
+        Command(0x8e, 0xa5, None, None).frame(-1, 0)
+
+    @raises(ValueError)
+    def test_code_parameter(self):
+        Command(0x8e, None)
+
+    @raises(ValueError)
+    def test_code_only_code_parameter(self):
+        Command(None, 1.0, 144.1, 10.0)
+
+    def test_code_only_parameter(self):
+        # 0x23 has no subcode, so its second field may be a parameter.
+        command = Command(0x23, None, 144.1, 10.0)
+        assert command.frame(1.0) == frame(stuff(Packet(0x23, 1.0, 144.1, 10.0).pack()))
+
+    def test_write(self):
+        conn = stringio.BytesIO()
+        gps = GPS(conn)
+        gps.write(Command(0x8e, 0xa0, 0, None), 1.25)
+        gps.write(Packet(0x8e, 0xab, 0))
+        assert conn.getvalue() == frame(stuff(Packet(0x8e, 0xa0, 0, 1.25).pack())) + \
+            frame(stuff(Packet(0x8e, 0xab, 0).pack()))
+
+
 #def test_gps():
 #    conn = stringio.StringIO()
 #    conn.write('\x10\x1c\x81\x00\x03\x02\x01\x0b\x11\x07\xdf\x0bproductname\x10\03')
@@ -179,13 +307,13 @@ class Test0x46(PacketTest):
     (fields, rawpacket) = ([0x46, 0, 1], 'F\x00\x01')
 
 
-#class Test0x47_1(PacketTest):
-#    (fields, rawpacket) = ([0x47, 1, 2, 20.0], 'G\x01\x02A\xa0\x00\x00')
+class Test0x47_1(PacketTest):
+    (fields, rawpacket) = ([0x47, 1, 2, 20.0], 'G\x01\x02A\xa0\x00\x00')
 
 
-#class Test0x47_2(PacketTest):
-#    (fields, rawpacket) = ([0x47, 3, 2, 20.0, 3, 30.0, 4, 40.0],
-#                           'G\x03\x02A\xa0\x00\x00\x03A\xf0\x00\x00\x04B \x00\x00')
+class Test0x47_2(PacketTest):
+    (fields, rawpacket) = ([0x47, 3, 2, 20.0, 3, 30.0, 4, 40.0],
+                           'G\x03\x02A\xa0\x00\x00\x03A\xf0\x00\x00\x04B \x00\x00')
 
 
 class Test0x49(PacketTest):
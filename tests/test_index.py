@@ -0,0 +1,135 @@
+"""
+Tests for tsip.index.
+
+"""
+
+import os
+import os.path
+import shutil
+import tempfile
+
+from tsip import *
+from tsip.capture import Capture
+from tsip.index import *
+
+from helpers import capture_path
+
+
+def read_capture(name):
+    with open(capture_path(name), 'rb') as f:
+        return f.read()
+
+
+# Records are compared by their representation as the time of packets
+# received before the first time is known is NaN.
+#
+class TestCaptureIndex(object):
+    tsipfile = 'thunderbolt.tsip'
+
+    def setup(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tempdir, self.tsipfile)
+        self.data = read_capture(self.tsipfile)
+        with open(self.path, 'wb') as f:
+            f.write(self.data)
+
+        with Capture(self.path) as capture:
+            self.packets = list(capture)
+
+    def teardown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_index(self):
+        index = CaptureIndex(self.path)
+        assert os.path.exists(self.path + INDEX_SUFFIX)
+        assert len(index) == len(self.packets)
+        assert list(index.packets()) == self.packets
+        assert index.indexed == len(self.data)
+
+    def test_reopen(self):
+        index = CaptureIndex(self.path)
+        index2 = CaptureIndex(self.path)
+        assert len(index2) == len(index)
+        assert repr(index2.records()) == repr(index.records())
+        assert index2.update() == 0
+
+    def test_keys(self):
+        index = CaptureIndex(self.path)
+        assert list(index.packets([0x8fac])) == [p for p in self.packets if p[0:2] == [0x8f, 0xac]]
+        assert list(index.packets([0x8f])) == [p for p in self.packets if p[0] == 0x8f]
+        assert list(index.packets([0x41])) == [p for p in self.packets if p[0] == 0x41]
+
+    def test_incremental(self):
+        with open(self.path, 'wb') as f:
+            f.write(self.data[:len(self.data) // 2])
+
+        index = CaptureIndex(self.path)
+        count = len(index)
+        assert 0 < count < len(self.packets)
+
+        with open(self.path, 'ab') as f:
+            f.write(self.data[len(self.data) // 2:])
+
+        assert index.update() == len(self.packets) - count
+        assert list(index.packets()) == self.packets
+        assert repr(CaptureIndex(self.path).records()) == repr(index.records())
+
+    def test_rebuild(self):
+        index = CaptureIndex(self.path)
+
+        with open(self.path, 'wb') as f:
+            f.write(self.data[:100])
+        assert len(CaptureIndex(self.path)) < len(index)
+
+        with open(self.path + INDEX_SUFFIX, 'wb') as f:
+            f.write(b'garbage')
+        assert len(CaptureIndex(self.path)) == len(list(Capture(self.path)))
+
+    def test_truncated_index(self):
+        index = CaptureIndex(self.path)
+
+        with open(self.path + INDEX_SUFFIX, 'r+b') as f:
+            f.truncate(INDEX_HEADER.size + INDEX_RECORD.size)
+        assert repr(CaptureIndex(self.path).records()) == repr(index.records())
+
+    def test_time(self):
+        index = CaptureIndex(self.path)
+        start = gps_seconds(1849, 520352)
+        end = start + 10
+
+        expected = []
+        t = None
+        for packet in self.packets:
+            if packet[0:2] == [0x8f, 0xab]:
+                t = gps_seconds(packet[3], packet[2])
+            if t is not None and start <= t < end:
+                expected.append(packet)
+
+        assert len(expected) == 20
+        assert list(index.packets(start=start, end=end)) == expected
+        assert list(index.packets([0x8fac], start, end)) == \
+            [p for p in expected if p[0:2] == [0x8f, 0xac]]
+
+
+class TestCaptureIndexCopernicus(TestCaptureIndex):
+    tsipfile = 'copernicus2.tsip'
+
+    def test_time(self):
+        index = CaptureIndex(self.path)
+        times = [gps_seconds(p[2], p[1]) for p in self.packets if p[0] == 0x41]
+        start = times[3]
+
+        assert [gps_seconds(p[2], p[1]) for p in index.packets([0x41], start)] == times[3:]
+        assert list(index.packets([0x41], end=start)) == \
+            [p for p in self.packets if p[0] == 0x41][:3]
+
+    def test_unsorted(self):
+        index = CaptureIndex(self.path)
+        index._sorted = False
+        start = index.times[-100]
+        assert index.select(start=start) == [i for (i, t) in enumerate(index.times) if t >= start]
+
+
+def test_gps_seconds():
+    assert gps_seconds(0, 0) == 0
+    assert gps_seconds(1, 1.5) == 604801.5
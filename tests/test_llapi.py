@@ -7,13 +7,17 @@ MJ, 19-Nov-2015
 
 TSIPFILE = 'thunderbolt.tsip'
 
+import io
 import os.path
+import socket
 
 from nose.tools import *
 
 from tsip.config import *
 from tsip.llapi import *
 
+from helpers import capture_path
+
 
 class TestIsFramed(object):
 
@@ -29,6 +33,8 @@ class TestFrame(object):
 
     def test_unframe(self):
         assert unframe(bDLE + b'payload' + bDLE + bETX) == b'payload'
+        assert unframe(bDLE + bDLE + bDLE + b'payload' + bDLE + bDLE + bDLE + bETX) == \
+               bDLE + bDLE + b'payload' + bDLE + bDLE
 
     @raises(ValueError)
     def test_frame_valueerror(self):
@@ -62,6 +68,96 @@ class TestStuff(object):
         unstuff(bDLE + b'payload' + bDLE + bETX)
 
 
+class TestUnframeUnstuff(object):
+
+    def test_plain(self):
+        assert unframe_unstuff(frame(b'\x8f\xab\x01')) == b'\x8f\xab\x01'
+
+    def test_stuffed(self):
+        for payload in [bDLE + b'\x8f', b'\x8f' + bDLE, b'\x8f' + bDLE * 4 + bETX + bDLE]:
+            assert unframe_unstuff(frame(stuff(payload))) == payload
+
+    def test_offsets(self):
+        data = bytearray(b'xx' + frame(stuff(b'\x8f' + bDLE)) + frame(b'\x41'))
+        assert unframe_unstuff(data, 2, 8) == b'\x8f' + bDLE
+        assert type(unframe_unstuff(data, 2, 8)) is bytes
+        assert type(unframe_unstuff(data, 8)) is bytes
+        assert unframe_unstuff(data, 8) == b'\x41'
+
+    def test_same_as_unstuff_unframe(self):
+        for payload in [b'', b'\x46\x00\x00', bETX + bDLE + bETX, bDLE * 3]:
+            packet = frame(stuff(payload))
+            assert unframe_unstuff(packet) == unstuff(unframe(packet))
+
+    def test_invalid(self):
+        for packet in [b'', bDLE + bETX, b'\x8f' + bDLE + bETX, bDLE + b'\x8f' + bDLE,
+                       bDLE + b'\x8f' + bDLE + bETX + b'\x00']:
+            assert_raises(ValueError, unframe_unstuff, packet)
+
+
+class TestFrameDecoder(object):
+
+    def setup(self):
+        self.packets = [frame(stuff(b'\x8f\xab' + bDLE + b'\x01')),
+                        frame(stuff(b'\x8f\xac' + bDLE + bETX + bDLE)),
+                        frame(b'\x41\x02\x03')]
+        self.data = b''.join(self.packets)
+
+    def test_feed(self):
+        decoder = FrameDecoder()
+        assert decoder.feed(self.data) == self.packets
+        assert decoder.feed(b'') == []
+
+    def test_split_anywhere(self):
+        for i in range(0, len(self.data) + 1):
+            decoder = FrameDecoder()
+            packets = decoder.feed(self.data[:i]) + decoder.feed(self.data[i:])
+            assert packets == self.packets
+
+    def test_bytewise(self):
+        decoder = FrameDecoder()
+        packets = []
+        for i in range(0, len(self.data)):
+            packets += decoder.feed(self.data[i:i + 1])
+        assert packets == self.packets
+
+    def test_reset(self):
+        decoder = FrameDecoder()
+        decoder.feed(self.data[:5])
+        decoder.reset()
+        assert decoder.feed(self.data[5:]) == self.packets[1:]
+
+    def test_subscribe(self):
+        decoder = FrameDecoder(subscribe=[0x8fac, 0x41])
+        assert decoder.feed(self.data) == self.packets[1:]
+        assert decoder.packets_skipped == 1
+
+    def test_subscribe_code(self):
+        for i in range(0, len(self.data) + 1):
+            decoder = FrameDecoder(subscribe=[0x8f])
+            packets = decoder.feed(self.data[:i]) + decoder.feed(self.data[i:])
+            assert packets == self.packets[:2]
+            assert decoder.packets_skipped == 1
+
+
+class TestSubscription(object):
+
+    def test_match(self):
+        subscription = Subscription([0x41, 0x8fab])
+        assert subscription.match(frame(b'\x41\x01'))
+        assert subscription.match(frame(b'\x8f\xab\x01'))
+        assert not subscription.match(frame(b'\x8f\xac\x01'))
+        assert not subscription.match(frame(b'\x42\x01'))
+
+    def test_match_offset(self):
+        subscription = Subscription([0x8fab])
+        assert subscription.match(b'\x00\x00' + frame(b'\x8f\xab'), 2)
+
+    def test_match_stuffed_subcode(self):
+        subscription = Subscription([0x8f10])
+        assert subscription.match(frame(stuff(b'\x8f\x10\x01')))
+
+
 class TestGPS(object):
 
     def setup(self):
@@ -102,3 +198,106 @@ class TestGPS(object):
 #            # with DLE. It does not with the TSIP capture used here.
 #            assert not data.startswith(bDLE)
 #            assert not data.endswith(bDLE + bETX)
+
+
+class TestGPSChunked(TestGPS):
+
+    def setup(self):
+        super(TestGPSChunked, self).setup()
+        self.gps_ = gps(self.conn, chunksize=64)
+
+    def test_subscribe(self):
+        self.conn.seek(0)
+        expected = [packet for packet in gps(self.conn) if packet[1:3] == b'\x8f\xab']
+        assert expected
+
+        self.conn.seek(0)
+        gps_ = gps(self.conn, chunksize=64, subscribe=[0x8fab])
+        assert list(gps_) == expected
+        assert gps_.packets_skipped > 0
+
+    def test_same_as_bytewise(self):
+        self.conn.seek(0)
+        expected = list(gps(self.conn))
+
+        for chunksize in [1, 2, 3, 7, READ_CHUNK_SIZE]:
+            self.conn.seek(0)
+            assert list(gps(self.conn, chunksize=chunksize)) == expected
+
+
+class TimeoutStream(object):
+    """Return b'' (a timeout) wherever `data` contains None."""
+
+    def __init__(self, *data):
+        self.data = bytearray()
+        self.timeouts = set()
+        for chunk in data:
+            if chunk is None:
+                self.timeouts.add(len(self.data))
+            else:
+                self.data += chunk
+        self.pos = 0
+
+    def read(self, size):
+        if self.pos in self.timeouts:
+            self.timeouts.remove(self.pos)
+            return b''
+        chunk = bytes(self.data[self.pos:self.pos + size])
+        self.pos += len(chunk)
+        return chunk
+
+
+class TestGPSBytewise(object):
+
+    def test_stuffed(self):
+        packets = [frame(stuff(b'\x8f' + bDLE + bETX + bDLE)), frame(stuff(b'\x8f\xab' + bDLE * 3 + bETX))]
+        data = b'\x01' + bDLE + bETX + b''.join(packets) + bDLE + b'\x8f'
+        assert list(gps(io.BytesIO(data))) == packets
+
+    def test_timeout(self):
+        packet = frame(stuff(b'\x8f\xab' + bDLE + bETX))
+        gps_ = gps(TimeoutStream(packet[:4], None, packet[4:], packet[:-1], None, packet[-1:]))
+        assert gps_.read() is None
+        assert gps_.read() == packet
+        assert gps_.read() is None
+        assert gps_.read() == packet
+        assert gps_.read() is None
+
+    def test_same_as_chunked(self):
+        for name in [TSIPFILE, 'copernicus2.tsip']:
+            with open(capture_path(name), 'rb') as f:
+                data = f.read()
+            assert list(gps(io.BytesIO(data))) == list(gps(io.BytesIO(data), chunksize=READ_CHUNK_SIZE))
+
+
+class TestGPSChunkedStream(object):
+
+    def test_stuffed(self):
+        packet = frame(stuff(b'\x8f' + bDLE + b'\x01' + bDLE + bETX + bDLE))
+        conn = io.BytesIO(packet * 3)
+        assert list(gps(conn, chunksize=2)) == [packet] * 3
+
+    def test_partial(self):
+        packet = frame(b'\x8f\xab\x01\x02')
+        conn = io.BytesIO(packet[3:] + packet + b'\xff' + packet)
+        assert list(gps(conn, chunksize=5)) == [packet, packet]
+
+    def test_truncated(self):
+        packet = frame(b'\x8f\xab\x01\x02')
+        conn = io.BytesIO(packet[:4] + packet)
+        assert list(gps(conn, chunksize=5)) == [packet]
+
+    def test_socket(self):
+        packet = frame(stuff(b'\x8f\xac' + bDLE * 3))
+        (sock1, sock2) = socket.socketpair()
+        try:
+            sock1.sendall(packet + packet[:4])
+            sock2.settimeout(0.1)
+            gps_ = gps(sock2, chunksize=READ_CHUNK_SIZE)
+            assert gps_.read() == packet
+            assert gps_.read() is None         # timeout
+            sock1.sendall(packet[4:])
+            assert gps_.read() == packet
+        finally:
+            sock1.close()
+            sock2.close()
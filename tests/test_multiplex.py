@@ -0,0 +1,93 @@
+"""
+Tests for tsip.multiplex.
+
+"""
+
+import socket
+
+from nose.tools import raises
+
+from tsip import *
+from tsip.emulator import open_pty, socketpair
+from tsip.multiplex import *
+
+from helpers import PACKETS, DATA
+
+
+class TestMultiplexer(object):
+
+    def setup(self):
+        self.socks = [socket.socketpair() for i in range(0, 3)]
+        self.mux = Multiplexer()
+        for (i, (sock1, sock2)) in enumerate(self.socks):
+            self.mux.add(i, sock2)
+
+    def teardown(self):
+        self.mux.close()
+        for (sock1, sock2) in self.socks:
+            sock1.close()
+            sock2.close()
+
+    def test_read(self):
+        for (sock1, sock2) in self.socks:
+            sock1.sendall(DATA)
+            sock1.shutdown(socket.SHUT_WR)
+
+        packets = list(self.mux)
+        assert len(packets) == 3 * len(PACKETS)
+        for i in range(0, 3):
+            assert [packet for (port_id, packet) in packets if port_id == i] == PACKETS
+        assert len(self.mux) == 0
+
+    def test_split(self):
+        (sock1, sock2) = self.socks[1]
+        sock1.sendall(DATA[:3])
+        assert self.mux.read(timeout=0.05) is None
+        sock1.sendall(DATA[3:])
+        assert self.mux.read(timeout=1) == (1, PACKETS[0])
+        assert self.mux.ports[1].packets_read == len(PACKETS)
+        assert self.mux.ports[1].bytes_read == len(DATA)
+
+    def test_timeout(self):
+        assert self.mux.poll(0) == []
+        assert self.mux.read(timeout=0.01) is None
+
+    def test_subscribe(self):
+        mux = Multiplexer(subscribe=[0x41])
+        (sock1, sock2) = self.socks[0]
+        mux.add('a', sock2)
+        sock1.sendall(DATA + frame(Packet(0x41, 1.0, 2, 3.0).pack()))
+        assert mux.read(timeout=1) == ('a', Packet(0x41, 1.0, 2, 3.0))
+        assert mux.ports['a'].decoder.packets_skipped == len(PACKETS)
+        mux.close()
+
+    def test_write(self):
+        self.mux.write(2, PACKETS[0])
+        assert self.socks[2][0].recv(100) == frame(stuff(PACKETS[0].pack()))
+
+    @raises(KeyError)
+    def test_add_twice(self):
+        self.mux.add(0, self.socks[0][1])
+
+
+def test_emulated():
+    ports = [socketpair(broadcasts={}) for i in range(0, 2)] + [open_pty(broadcasts={})]
+    conns = [conn for (emulator, conn) in ports[:2]] + [open(ports[2][1], 'r+b', buffering=0)]
+
+    try:
+        for (emulator, conn) in ports:
+            emulator.start()
+
+        with Multiplexer() as mux:
+            for (i, conn) in enumerate(conns):
+                mux.add(i, conn)
+                mux.write(i, Packet(0x1c, 0x01))
+
+            packets = sorted([mux.read(timeout=5) for conn in conns])
+            assert [port_id for (port_id, packet) in packets] == [0, 1, 2]
+            assert [packet[0:2] for (port_id, packet) in packets] == [[0x1c, 0x81]] * 3
+    finally:
+        for conn in conns:
+            conn.close()
+        for (emulator, conn) in ports:
+            emulator.close()
@@ -0,0 +1,96 @@
+"""
+Tests for tsip.profiling.
+
+"""
+
+import io
+import os
+import subprocess
+import sys
+
+from tsip import *
+from tsip import profiling
+from tsip.profiling import *
+
+from helpers import MIXED_PACKETS as PACKETS, MIXED_DATA as DATA
+
+
+class TestProfiling(object):
+
+    def setup(self):
+        self.profiler = profiling.enable()
+        self.profiler.reset()
+
+    def teardown(self):
+        profiling.disable()
+
+    def test_gps(self):
+        assert list(GPS(io.BytesIO(DATA), chunksize=7)) == PACKETS
+
+        histograms = self.profiler.histograms
+        assert histograms[(STAGE_READ, None)].count == -(-len(DATA) // 7) + 1
+        assert histograms[(STAGE_SCAN, None)].count == -(-len(DATA) // 7)
+        assert histograms[(STAGE_UNSTUFF, 0x8fa5)].count == 5
+        assert histograms[(STAGE_UNPACK, 0x8fa5)].count == 5
+        assert histograms[(STAGE_UNPACK, 0x46)].count == 1
+
+    def test_decoder(self):
+        assert PacketDecoder().feed(DATA) == PACKETS
+        assert self.profiler.stage(STAGE_SCAN).count == 1
+        assert self.profiler.stage(STAGE_UNPACK).count == len(PACKETS)
+
+    def test_report(self):
+        list(GPS(io.BytesIO(DATA)))
+        lines = profiling.report().splitlines()
+        assert lines[0].split() == ['stage', 'code', 'count', 'p50', 'us', 'p99', 'us', 'max', 'us']
+        assert [line.split()[:2] for line in lines[1:]] == [
+            ['read', 'all'], ['scan', 'all'],
+            ['unstuff', 'all'], ['unstuff', '0x46'], ['unstuff', '0x8fa5'],
+            ['unpack', 'all'], ['unpack', '0x46'], ['unpack', '0x8fa5']]
+        assert len(profiling.report(per_code=False).splitlines()) == 5
+
+    def test_disable(self):
+        profiling.disable()
+        list(GPS(io.BytesIO(DATA)))
+        assert profiling.profiler is None
+        assert self.profiler.histograms == {}
+        assert profiling.report() == 'profiling is disabled'
+
+
+class TestHistogram(object):
+
+    def test_buckets(self):
+        for value in list(range(0, 1000)) + [2 ** 20 - 1, 2 ** 20, 10 ** 9]:
+            bucket = Histogram.bucket(value)
+            assert Histogram.upper(bucket) >= value
+            assert Histogram.upper(bucket) <= value * 1.125 + 1
+            assert bucket == 0 or Histogram.upper(bucket - 1) < value
+
+    def test_percentile(self):
+        histogram = Histogram()
+        assert histogram.percentile(50) == 0
+
+        for value in range(1, 1001):
+            histogram.add(value)
+
+        assert histogram.count == 1000
+        assert histogram.max == 1000
+        assert 500 <= histogram.percentile(50) <= 500 * 1.125
+        assert 990 <= histogram.percentile(99) <= 1000
+        assert histogram.percentile(100) == 1000
+
+    def test_update(self):
+        (h1, h2) = (Histogram(), Histogram())
+        h1.add(10)
+        h2.add(20)
+        h2.add(30)
+        h1.update(h2)
+        assert (h1.count, h1.total, h1.max) == (3, 60, 30)
+
+
+def test_environment():
+    env = dict(os.environ, TSIP_PROFILE='1')
+    script = 'import io, tsip; list(tsip.GPS(io.BytesIO(%r)))' % (DATA,)
+    output = subprocess.check_output([sys.executable, '-c', script], env=env,
+                                     stderr=subprocess.STDOUT)
+    assert b'unpack     0x8fa5' in output
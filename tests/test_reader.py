@@ -0,0 +1,104 @@
+"""
+Tests for tsip.reader.
+
+"""
+
+import io
+
+from nose.tools import raises
+
+from tsip import *
+from tsip.emulator import socketpair
+from tsip.reader import *
+
+from helpers import packets_8fa5, stream
+
+
+PACKETS = packets_8fa5(10)
+DATA = stream(PACKETS)
+
+
+class Failing(object):
+    def __init__(self, packets):
+        self.packets = list(packets)
+
+    def read(self):
+        if self.packets:
+            return self.packets.pop(0)
+        raise IOError('port closed')
+
+
+def read_all(overflow, maxlen):
+    reader = BackgroundReader(GPS(io.BytesIO(DATA), chunksize=7), maxlen=maxlen,
+                              overflow=overflow, stop_at_eof=True)
+    reader.start()
+    reader._thread.join()
+    return (reader, list(reader))
+
+
+def test_read():
+    with BackgroundReader(GPS(io.BytesIO(DATA), chunksize=7), stop_at_eof=True) as reader:
+        assert list(reader) == PACKETS
+        assert reader.packets_read == len(PACKETS)
+        assert reader.packets_dropped == 0
+
+
+def test_raw():
+    with BackgroundReader(gps(io.BytesIO(DATA), chunksize=7), stop_at_eof=True) as reader:
+        assert [Packet.unpack(unstuff(unframe(packet))) for packet in reader] == PACKETS
+
+
+def test_drop_oldest():
+    (reader, packets) = read_all(DROP_OLDEST, 4)
+    assert packets == PACKETS[-4:]
+    assert reader.packets_dropped == 6
+    assert reader.high_water_mark == 4
+
+
+def test_drop_newest():
+    (reader, packets) = read_all(DROP_NEWEST, 4)
+    assert packets == PACKETS[:4]
+    assert reader.packets_dropped == 6
+
+
+def test_block():
+    reader = BackgroundReader(GPS(io.BytesIO(DATA), chunksize=7), maxlen=2,
+                              overflow=BLOCK, stop_at_eof=True)
+    with reader:
+        assert list(reader) == PACKETS
+        assert reader.packets_dropped == 0
+        assert reader.high_water_mark <= 2
+
+
+def test_stop_blocked():
+    reader = BackgroundReader(GPS(io.BytesIO(DATA), chunksize=7), maxlen=2,
+                              overflow=BLOCK, stop_at_eof=True)
+    reader.start()
+    reader.stop()
+    assert reader.packets_read - reader.packets_dropped == len(reader)
+
+
+def test_timeout():
+    (emulator, conn) = socketpair(broadcasts={})
+    conn.settimeout(0.05)
+    try:
+        with BackgroundReader(GPS(conn, chunksize=READ_CHUNK_SIZE)) as reader:
+            assert reader.read(timeout=0.1) is None
+            emulator.feed(frame(stuff(Packet(0x1f).pack())))
+            assert reader.read(timeout=5)[0] == 0x45
+    finally:
+        emulator.close()
+        conn.close()
+
+
+@raises(IOError)
+def test_error():
+    with BackgroundReader(Failing(PACKETS[:2])) as reader:
+        assert reader.read() == PACKETS[0]
+        assert reader.read() == PACKETS[1]
+        reader.read()
+
+
+@raises(ValueError)
+def test_invalid_policy():
+    BackgroundReader(GPS(io.BytesIO(DATA)), overflow='drop_all')
@@ -0,0 +1,115 @@
+"""
+Tests for tsip.records.
+
+"""
+
+import io
+import pickle
+
+from nose.tools import raises
+
+from tsip import *
+from tsip.records import *
+
+
+PACKET_8FAB = Packet(0x8f, 0xab, 100, 2000, 18, 3, 1, 2, 3, 4, 5, 2020)
+
+
+class TestRecord(object):
+
+    def test_unpack(self):
+        record = Record.unpack(PACKET_8FAB.pack())
+        assert type(record) is RECORD_CLASSES[0x8fab]
+        assert isinstance(record, Packet)
+        assert record == PACKET_8FAB
+        assert (record.time_of_week, record.week_number, record.utc_offset) == (100, 2000, 18)
+        assert record[2] == 100
+        assert list(record) == PACKET_8FAB.fields
+
+    def test_memoryview(self):
+        record = Record.unpack(memoryview(PACKET_8FAB.pack()))
+        assert record.year == 2020
+
+    def test_set(self):
+        record = Record.unpack(PACKET_8FAB.pack())
+        record.utc_offset = 17
+        assert record[4] == 17
+        assert Packet.unpack(record.pack())[4] == 17
+
+    def test_slots(self):
+        record = Record.unpack(PACKET_8FAB.pack())
+        assert not hasattr(record, '__dict__')
+        try:
+            record.foo = 1
+        except AttributeError:
+            pass
+        else:
+            assert False
+
+    def test_variable(self):
+        record = Record.unpack(Packet(0x47, 2, 1, 1.0, 2, 2.0).pack())
+        assert record.count == 2
+        assert record[3:] == [1.0, 2, 2.0]
+
+    def test_missing_field(self):
+        # The one-byte 0x46 has none of the fields named after the code.
+        record = Record.unpack(b'\x46')
+        assert record.field_names == ('code', 'status', 'error_code')
+        assert record.code == 0x46
+        assert not hasattr(record, 'status')
+        assert record.asdict() == {'code': 0x46}
+        assert record == Packet.unpack(b'\x46')
+
+    def test_unknown(self):
+        record = Record.unpack(b'\x99abc')
+        assert type(record) is Record
+        assert record == Packet(0xff, b'\x99abc')
+
+    def test_asdict(self):
+        record = Record.unpack(Packet(0x8f, 0xa5, 1, 2).pack())
+        assert record.asdict() == {'code': 0x8f, 'subcode': 0xa5, 'mask_0': 1, 'mask_1': 2}
+
+    def test_pickle(self):
+        record = Record.unpack(PACKET_8FAB.pack())
+        assert pickle.loads(pickle.dumps(record)) == record
+
+    def test_gps(self):
+        data = frame(stuff(PACKET_8FAB.pack()))
+        (record,) = list(GPS(io.BytesIO(data), packet_class=Record))
+        assert record.seconds == 1
+
+
+def test_field_names():
+    for (key, structs) in PACKET_STRUCTURES.items():
+        assert RECORD_CLASSES[key].field_names == FIELD_NAMES[key]
+
+
+class TestRegisterRecord(object):
+
+    def setup(self):
+        self.saved = [(index, dict(index)) for index in
+                      (PACKET_STRUCTURES, UNPACK_INDEX, PACK_INDEX, VARIABLE_STRUCTURES)]
+
+    def teardown(self):
+        for (index, saved) in self.saved:
+            index.clear()
+            index.update(saved)
+        for cache in INDEX_CACHES:
+            cache.clear()
+        FIELD_NAMES.pop(0x8f99, None)
+        RECORD_CLASSES.pop(0x8f99, None)
+
+    def test_default_names(self):
+        register_packet(0x8f99, '>BBH')
+        record = Record.unpack(b'\x8f\x99\x00\x01')
+        assert record.field_names == ('code', 'subcode')
+        assert record.subcode == 0x99
+
+    def test_register(self):
+        register_packet(0x8f99, '>BBH')
+        register_record(0x8f99, ['code', 'subcode', 'value'])
+        assert Record.unpack(b'\x8f\x99\x00\x01').value == 1
+
+    @raises(ValueError)
+    def test_invalid_name(self):
+        register_record(0x8f99, ['code', 'subcode', 'pack'])
@@ -0,0 +1,177 @@
+"""
+Tests for tsip.schema and tsip.structs.register_packet().
+
+"""
+
+import struct
+
+from nose.tools import raises
+
+from tsip import *
+from tsip.schema import *
+
+
+class TestSchema(object):
+
+    def roundtrip(self, schema, fields, rawpacket):
+        assert schema.unpack(rawpacket) == fields
+        assert schema.unpack(memoryview(rawpacket)) == fields
+        assert schema.pack(*fields) == rawpacket
+
+    def test_fixed(self):
+        schema = Schema('>BB', 'Hf')
+        assert schema.fixed_format == '>BBHf'
+        self.roundtrip(schema, [0x8f, 0x99, 1, 1.0], b'\x8f\x99\x00\x01?\x80\x00\x00')
+
+    def test_repeat_count(self):
+        schema = Schema('>BB', Repeat('Bf', count=1))
+        assert schema.fixed_format is None
+        self.roundtrip(schema, [0x47, 0], b'G\x00')
+        self.roundtrip(schema, [0x47, 2, 1, 1.0, 2, 2.0], b'G\x02\x01?\x80\x00\x00\x02@\x00\x00\x00')
+
+    def test_repeat_remainder(self):
+        schema = Schema('>B', Repeat('h'))
+        self.roundtrip(schema, [1], b'\x01')
+        self.roundtrip(schema, [1, -1, 2], b'\x01\xff\xff\x00\x02')
+
+    def test_string(self):
+        schema = Schema('>BB', String(), 'H')
+        self.roundtrip(schema, [1, 2, 'abc', 3], b'\x01\x02\x03abc\x00\x03')
+        assert Schema('>B', String('H')).pack(1, b'ab') == b'\x01\x00\x02ab'
+
+    def test_variant_peek(self):
+        schema = Schema('>BB', Variant(2, {None: '', 0: 'Bf', 1: 'BI'}))
+        self.roundtrip(schema, [0x8e, 0xa0], b'\x8e\xa0')
+        self.roundtrip(schema, [0x8e, 0xa0, 0, 1.0], b'\x8e\xa0\x00?\x80\x00\x00')
+        self.roundtrip(schema, [0x8e, 0xa0, 1, 1000], b'\x8e\xa0\x01\x00\x00\x03\xe8')
+
+    def test_variant_field(self):
+        schema = Schema('>BBB', Variant(1, {1: 'h', 2: ['x', Repeat('B', count=2)]}))
+        self.roundtrip(schema, [0x58, 1, 9, -2], b'\x58\x01\x09\xff\xfe')
+        self.roundtrip(schema, [0x58, 2, 2, 7, 8], b'\x58\x02\x02\x00\x07\x08')
+
+    def test_nested(self):
+        schema = Schema('>B', Repeat('H', count=0), 'B', String())
+        self.roundtrip(schema, [2, 1, 2, 9, 'x'], b'\x02\x00\x01\x00\x02\x09\x01x')
+
+    def test_little_endian(self):
+        self.roundtrip(Schema('<BH', Repeat('H')), [1, 2, 3], b'\x01\x02\x00\x03\x00')
+
+    def test_mismatch(self):
+        schema = Schema('>BB', Variant(2, {0: 'Bf', 1: 'BI'}))
+        for rawpacket in [b'\x8e', b'\x8e\xa0', b'\x8e\xa0\x02', b'\x8e\xa0\x00\x00', b'\x8e\xa0\x00\x00\x00\x00\x00\x00']:
+            try:
+                schema.unpack(rawpacket)
+            except struct.error:
+                pass
+            else:
+                assert False, rawpacket
+
+        for fields in [(0x8e, 0xa0), (0x8e, 0xa0, 2, 1.0), (0x8e, 0xa0, 0, 1.0, 2.0), (0x8e, 0xa0, 1, 'x')]:
+            try:
+                schema.pack(*fields)
+            except struct.error:
+                pass
+            else:
+                assert False, fields
+
+    def test_format_for_fields(self):
+        schema = Schema('>BB', Repeat('Bf', count=1))
+        assert schema.format_for_fields([0x47, 2, 1, None, 2, None]) == '>BBBfBf'
+        assert Schema('>BB', Variant(2, {0: 'Bf'})).format_for_fields([1, 2, 0, None]) == '>BBBf'
+
+    @raises(ValueError)
+    def test_format_for_fields_string(self):
+        Schema('>BB', String()).format_for_fields([1, 2, 'x'])
+
+    @raises(ValueError)
+    def test_format_for_fields_parameter(self):
+        Schema('>BB', Variant(2, {0: 'Bf'})).format_for_fields([1, 2, None, None])
+
+    @raises(ValueError)
+    def test_invalid_remainder(self):
+        Schema('>B', Repeat('B'), 'B')
+
+    @raises(ValueError)
+    def test_invalid_count(self):
+        Schema('>B', Repeat('B', count=1))
+
+    @raises(ValueError)
+    def test_invalid_variant(self):
+        Schema('>BB', Variant(2, {0: 'Bf', 1: 'Hf'}))
+
+    def test_subclass(self):
+        assert isinstance(PACKET_STRUCTURES[0x47][0], Schema)
+        assert Struct0x47().unpack(b'G\x00') == [0x47, 0]
+
+
+def test_count_fields():
+    assert count_fields('BB2Hx3s') == 5
+
+
+def test_format_tokens():
+    assert format_tokens('>BB2Hx3s') == [('', 'B'), ('', 'B'), ('2', 'H'), ('', 'x'), ('3', 's')]
+    assert format_tokens('< 10s ?') == [('10', 's'), ('', '?')]
+
+
+def test_field_offset():
+    assert field_offset('>', 'BB2Hx3sd', 3) == (4, 'H')
+    assert field_offset('>', 'BB2Hx3sd', 4) == (7, '3s')
+    assert field_offset('>', 'BB2Hx3sd', 5) == (10, 'd')
+
+
+def test_0x6d():
+    # The number of satellites is given by the length of the packet.
+    rawpacket = b'm\x94' + bytes(16) + bytes(range(1, 10))
+    assert Packet.unpack(rawpacket)[6:] == list(range(1, 10))
+
+
+class TestRegisterPacket(object):
+
+    def setup(self):
+        self.saved = [(index, dict(index)) for index in
+                      (PACKET_STRUCTURES, UNPACK_INDEX, PACK_INDEX, VARIABLE_STRUCTURES)]
+
+    def teardown(self):
+        for (index, saved) in self.saved:
+            index.clear()
+            index.update(saved)
+        for cache in INDEX_CACHES:
+            cache.clear()
+
+    def test_fixed(self):
+        register_packet(0x8f99, '>BBHf')
+        assert isinstance(PACKET_STRUCTURES[0x8f99][0], Struct)
+        assert Packet.unpack(b'\x8f\x99\x00\x01?\x80\x00\x00') == Packet(0x8f, 0x99, 1, 1.0)
+        assert Packet(0x8f, 0x99, 1, 1.0).pack() == b'\x8f\x99\x00\x01?\x80\x00\x00'
+
+    def test_default_byte_order(self):
+        register_packet(0x8f99, 'BBH')
+        assert Packet(0x8f, 0x99, 1).pack() == b'\x8f\x99\x00\x01'
+
+    def test_schema(self):
+        register_packet(0x8f9a, Schema('>BBB', Repeat('Bf', count=2)))
+        packet = Packet(0x8f, 0x9a, 1, 5, 2.0)
+        assert Packet.unpack(packet.pack()) == packet
+        assert list(PacketDecoder().feed(frame(stuff(packet.pack())))) == [packet]
+        assert Command(0x8f, 0x9a, 1, 5, None).frame(2.0) == frame(stuff(packet.pack()))
+
+    def test_replace(self):
+        register_packet(0x8fab, '>BBI')
+        assert Packet.unpack(b'\x8f\xab\x00\x00\x00\x01') == Packet(0x8f, 0xab, 1)
+        assert get_structs_for_rawpacket(b'\x8f\xab' + bytes(15)) == []
+
+    def test_lazy(self):
+        rawpacket = b'\x8f\xab\x00\x00\x00\x01'
+        register_packet(0x8fab, '>BBI')
+        assert LazyPacket.unpack(rawpacket)[2] == 1
+        register_packet(0x8fab, '>BBHH')
+        assert LazyPacket.unpack(rawpacket)[3] == 1
+
+    @raises(ValueError)
+    def test_no_subcodes(self):
+        register_packet(0x4699, '>BBB')
+
+    @raises(ValueError)
+    def test_subcodes(self):
+        register_packet(0x8f, '>BB')
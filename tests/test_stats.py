@@ -0,0 +1,113 @@
+"""
+Tests for tsip.stats.
+
+"""
+
+import io
+
+from tsip import *
+from tsip.stats import *
+
+from helpers import PACKETS, DATA, Clock
+
+
+UNKNOWN = frame(b'\x8f\xa5\x01')          # too short for 0x8F-A5
+OTHER = frame(Packet(0x46, 0, 0).pack())
+GARBAGE = b'\x01\x02\x03'
+
+
+class TestStatistics(object):
+
+    def setup(self):
+        self.stats = Statistics(clock=Clock())
+
+    def read(self, data, chunksize=None, **kwargs):
+        gps = GPS(io.BytesIO(data), chunksize=chunksize, stats=self.stats, **kwargs)
+        return list(gps)
+
+    def test_counts(self):
+        packets = self.read(GARBAGE + DATA + OTHER, chunksize=7)
+        assert len(packets) == len(PACKETS) + 1
+
+        snapshot = self.stats.snapshot()
+        assert snapshot['bytes_in'] == len(GARBAGE + DATA + OTHER)
+        assert snapshot['packets_in'] == len(PACKETS) + 1
+        assert snapshot['bytes_discarded'] == len(GARBAGE)
+        assert snapshot['resyncs'] == 1
+        assert snapshot['decode_failures'] == 0
+
+        codes = snapshot['codes']
+        assert sorted(codes) == [0x46, 0x8fa5]
+        assert codes[0x8fa5]['count'] == len(PACKETS)
+        assert codes[0x8fa5]['bytes'] == len(DATA)
+        assert codes[0x46]['count'] == 1
+        assert codes[0x46]['mean_interval'] is None
+
+    def test_intervals(self):
+        self.read(DATA)
+        codes = self.stats.snapshot()['codes'][0x8fa5]
+        assert codes['min_interval'] == codes['max_interval'] == codes['mean_interval'] == 1.0
+        assert codes['rate'] > 0
+        assert codes['byte_rate'] > 0
+
+    def test_decode_failures(self):
+        packets = self.read(UNKNOWN + DATA)
+        assert packets[0][0] == 0xff
+        assert self.stats.decode_failures == 1
+        assert self.stats.packets_in == len(PACKETS) + 1
+
+    def test_skipped(self):
+        packets = self.read(DATA + GARBAGE + OTHER + DATA, chunksize=5, subscribe=[0x46])
+        assert packets == [Packet(0x46, 0, 0)]
+        assert self.stats.packets_skipped == 2 * len(PACKETS)
+        assert self.stats.packets_in == 1
+        assert self.stats.bytes_discarded == len(GARBAGE)
+
+    def test_garbage_only(self):
+        assert self.read(GARBAGE * 10, chunksize=4) == []
+        assert self.stats.bytes_discarded == len(GARBAGE) * 10
+
+    def test_resyncs(self):
+        truncated = frame(stuff(PACKETS[0].pack()))[:-2]
+        data = GARBAGE + DATA + GARBAGE + truncated + GARBAGE + OTHER + GARBAGE * 2 + DATA + GARBAGE
+
+        counters = []
+        for chunksize in [1, 2, 3, 7, len(data)]:
+            stats = Statistics(clock=Clock())
+            decoder = FrameDecoder(stats=stats)
+            for i in range(0, len(data), chunksize):
+                decoder.feed(data[i:i + chunksize])
+            counters.append((stats.packets_in, stats.bytes_discarded, stats.resyncs))
+
+        assert counters == [(2 * len(PACKETS) + 1, len(GARBAGE) * 6 + len(truncated), 4)] * len(counters)
+
+    def test_write(self):
+        conn = io.BytesIO()
+        gps = GPS(conn, stats=self.stats)
+        gps.write(PACKETS[0])
+        gps.write(Command(0x8e, 0xab, 0))
+        assert self.stats.packets_out == 2
+        assert self.stats.bytes_out == len(conn.getvalue())
+
+    def test_reset(self):
+        self.read(DATA)
+        self.stats.reset()
+        snapshot = self.stats.snapshot()
+        assert snapshot['packets_in'] == snapshot['bytes_in'] == 0
+        assert snapshot['codes'] == {}
+
+    def test_decoder(self):
+        decoder = PacketDecoder(stats=self.stats)
+        assert decoder.feed(GARBAGE + DATA[:5]) == []
+        assert len(decoder.feed(DATA[5:] + UNKNOWN)) == len(PACKETS) + 1
+        assert self.stats.bytes_discarded == len(GARBAGE)
+        assert self.stats.decode_failures == 1
+
+    def test_attach(self):
+        gps = GPS(io.BytesIO(DATA))
+        assert gps.stats is None
+        gps.read()
+        gps.stats = self.stats
+        assert gps.decoder.stats is self.stats
+        assert len(list(gps)) == len(PACKETS) - 1
+        assert self.stats.packets_in == len(PACKETS) - 1
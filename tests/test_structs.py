@@ -1,3 +1,5 @@
+import subprocess
+import sys
 from struct import Struct
 
 from nose.tools import raises
@@ -25,6 +27,64 @@ def test_packetid_subcode():
             except AttributeError:
                 pass
 
+def test_index():
+    for (key, value) in PACKET_STRUCTURES.items():
+        for struct_ in value:
+            if isinstance(struct_, Struct):
+                assert UNPACK_INDEX[(key, struct_.size)] is struct_
+                assert PACK_INDEX[(key, len(struct_.unpack(bytes(struct_.size))))] is struct_
+            else:
+                assert struct_ in VARIABLE_STRUCTURES[key]
+
+
+def test_lazy():
+    # Structures are only created when a packet is first looked up, and
+    # neither `re` nor `socket` are imported.
+    script = """if True:
+        import sys, tsip
+        assert not [v for v in dict.values(tsip.PACKET_STRUCTURES) if isinstance(v, list)]
+        assert not tsip.UNPACK_INDEX and not tsip.VARIABLE_STRUCTURES
+        assert 're' not in sys.modules and 'socket' not in sys.modules
+        assert tsip.Packet.unpack(b'\\x8f\\xa5\\x00\\x01\\x00\\x02') == tsip.Packet(0x8f, 0xa5, 1, 2)
+        assert [k for (k, v) in dict.items(tsip.PACKET_STRUCTURES) if isinstance(v, list)] == [0x8fa5]
+    """
+    subprocess.check_call([sys.executable, '-c', script])
+
+
+def test_load_structures():
+    PACKET_STRUCTURES[0x8fab]
+    assert load_structures(0x8fab) is False
+    assert load_structures(0x99) is False
+
+
+def test_get_key_for_rawpacket():
+    assert get_key_for_rawpacket(b'\x46\x01\x02') == 0x46
+    assert get_key_for_rawpacket(b'\x8f\xab\x01') == 0x8fab
+    assert get_key_for_rawpacket(b'\xbb\x00') == 0xbb00
+    assert get_key_for_rawpacket(b'\x8f') is None
+
+
+def test_get_structs_for_rawpacket_length():
+    assert get_structs_for_rawpacket(b'\x46\x01\x02') == [PACKET_STRUCTURES[0x46][0]]
+    assert get_structs_for_rawpacket(b'\x46') == [PACKET_STRUCTURES[0x46][1]]
+    assert get_structs_for_rawpacket(b'\x46\x01') == []
+    assert get_structs_for_rawpacket(b'\x8e\xa4\x00') == [PACKET_STRUCTURES[0x8ea4][0]]
+    assert get_structs_for_rawpacket(b'\x8e\xa0\x00') == PACKET_STRUCTURES[0x8ea0]
+
+
+def test_get_structs_for_fields_count():
+    assert get_structs_for_fields([0x46, 1, 2]) == [PACKET_STRUCTURES[0x46][0]]
+    assert get_structs_for_fields([0x46]) == [PACKET_STRUCTURES[0x46][1]]
+    assert get_structs_for_fields([0x46, 1]) == []
+    assert get_structs_for_fields([0xbb, 0]) == PACKET_STRUCTURES[0xbb00]
+    assert get_structs_for_fields([0xbb, 0, 1, 2]) == PACKET_STRUCTURES[0xbb00][1:]
+
+
+@raises(IndexError)
+def test_get_structs_for_fields_indexerror():
+    get_structs_for_fields([0x8e])
+
+
 # def test_get_structs_for_rawpacket():
 #    for i in range(0, 256):
 #        rawpacket = chr(i)
@@ -0,0 +1,135 @@
+"""
+Tests for tsip.telemetry.
+
+"""
+
+import math
+
+from nose.plugins.skip import SkipTest
+from nose.tools import raises
+
+from tsip import *
+from tsip.capture import Capture
+from tsip.index import gps_seconds
+
+from helpers import capture_path
+
+try:
+    import numpy
+    from tsip.telemetry import *
+except ImportError:
+    numpy = None
+
+
+def packet_8fab(tow, week=2000):
+    return Packet(0x8f, 0xab, tow, week, 18, 3, 0, 0, 0, 1, 1, 2018).pack()
+
+
+def packet_8fac(temperature, alarms=0):
+    return Packet(0x8f, 0xac, 0, 0, 0, 0, alarms, 0, 0, 0, 0, 0,
+                  1.5, 2.5, 100, 0.75, temperature, 0.1, 0.2, 30.0, 0.5, 0).pack()
+
+
+def seconds(store):
+    """Add `packet_8fab()` and `packet_8fac()` for every second."""
+
+    for tow in range(0, 10):
+        store.add(packet_8fab(tow))
+        store.add(packet_8fac(20.0 + tow, alarms=tow % 2))
+
+
+class TelemetryTest(object):
+
+    def setup(self):
+        if numpy is None:
+            raise SkipTest('NumPy not installed')
+
+
+class TestTelemetryStore(TelemetryTest):
+
+    def test_add(self):
+        store = TelemetryStore(capacity=100)
+        assert store.add(packet_8fab(1)) is True
+        assert store.add(packet_8fac(20.0)) is True
+        assert store.add(b'\x46\x00\x00') is False
+        assert len(store) == 2
+        assert store.time == gps_seconds(2000, 1)
+        assert store.column('week_number').tolist() == [2000]
+        assert store.column('temperature').tolist() == [20.0]
+        assert store.column('dac_voltage').dtype.isnative
+
+    def test_no_time(self):
+        store = TelemetryStore(capacity=100)
+        assert store.add(packet_8fac(20.0)) is False
+        assert store.add(packet_8fab(1)[:-1]) is False
+        assert len(store) == 0
+        assert store.dropped == 2
+        assert math.isnan(store.time)
+
+    def test_time_0x41(self):
+        store = TelemetryStore(capacity=100, keys=[0x8fac])
+        store.add(Packet(0x41, 10.0, 2000, 18.0).pack())
+        assert store.add(packet_8fac(20.0)) is True
+        assert store.times(0x8fac).tolist() == [gps_seconds(2000, 10.0)]
+
+    def test_wrap(self):
+        store = TelemetryStore(capacity=4)
+        seconds(store)
+        assert store.count(0x8fab) == store.count(0x8fac) == 4
+        assert store.column('time_of_week').tolist() == [6, 7, 8, 9]
+        assert store.column('temperature').tolist() == [26.0, 27.0, 28.0, 29.0]
+        assert store.times(0x8fac).tolist() == [gps_seconds(2000, tow) for tow in range(6, 10)]
+
+    def test_window(self):
+        for capacity in [4, 7, 10, 100]:
+            store = TelemetryStore(capacity=capacity)
+            seconds(store)
+            assert store.column('temperature', 3).tolist() == [27.0, 28.0, 29.0]
+            assert store.times(0x8fab, 2).tolist() == [gps_seconds(2000, 8), gps_seconds(2000, 9)]
+            assert store.column('temperature', 0).tolist() == []
+
+    def test_summary(self):
+        for capacity in [4, 7, 10, 100]:
+            store = TelemetryStore(capacity=capacity)
+            seconds(store)
+            assert store.summary('temperature', 3) == (27.0, 29.0, 28.0)
+            assert store.summary('critical_alarms', 2) == (0, 1, 0.5)
+
+    def test_summary_empty(self):
+        store = TelemetryStore(capacity=10)
+        assert all([math.isnan(value) for value in store.summary('dac_voltage')])
+
+    def test_clear(self):
+        store = TelemetryStore(capacity=4)
+        seconds(store)
+        store.clear()
+        assert len(store) == 0
+        assert math.isnan(store.time)
+
+    def test_feed(self):
+        store = TelemetryStore()
+        data = frame(stuff(packet_8fab(16))) + frame(b'\x46\x00\x00') + frame(stuff(packet_8fac(20.0)))
+        assert store.feed(data[:10]) == 0
+        assert store.feed(data[10:]) == 2
+        assert store.column('time_of_week').tolist() == [16]
+
+    def test_capture(self):
+        store = TelemetryStore()
+        with Capture(capture_path('thunderbolt.tsip')) as capture:
+            store.extend(capture.payloads())
+            packets = [packet for packet in capture.packets() if packet[:2] == [0x8f, 0xac]]
+
+        assert store.count(0x8fac) == len(packets) - store.dropped
+        assert numpy.allclose(store.column('dac_voltage'), [packet[15] for packet in packets][store.dropped:])
+
+    @raises(ValueError)
+    def test_ambiguous(self):
+        TelemetryStore().column('subcode')
+
+    @raises(ValueError)
+    def test_variable(self):
+        TelemetryStore(keys=[0x47])
+
+    @raises(ValueError)
+    def test_capacity(self):
+        TelemetryStore(capacity=0)
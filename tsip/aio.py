@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+Asyncio API.
+
+`AsyncGPS` offers the same functionality as `tsip.GPS` on top of asyncio
+streams so a single event loop can talk to many GPS receivers at once.
+
+Example::
+
+  >>> gps = await tsip.aio.open_connection('192.168.1.10', 4001)
+  >>> await gps.write(Packet(0x8e, 0xab, 0))
+  >>> async for packet in gps:
+  ...     print(packet)
+
+"""
+
+import asyncio
+import collections
+import os
+
+from tsip.config import *
+from tsip.llapi import *
+from tsip.hlapi import *
+
+
+class AsyncGPS(object):
+    """
+    Read and write TSIP packets from and to asyncio streams.
+
+    Received data is decoded by a `PacketDecoder` instance.
+
+    :param reader: Stream to read TSIP data from.
+    :type reader: ``asyncio.StreamReader``
+    :param writer: Stream to write TSIP data to. May be ``None``
+        for read-only connections.
+    :type writer: ``asyncio.StreamWriter``
+    :param chunksize: Maximum number of bytes read from `reader` at once.
+    :param packet_class: `Packet`, `LazyPacket` or `tsip.records.Record`.
+    :param subscribe: Read only these packets, see `FrameDecoder`.
+
+    """
+
+    def __init__(self, reader, writer=None, chunksize=READ_CHUNK_SIZE, packet_class=Packet,
+                 subscribe=None):
+        self.reader = reader
+        self.writer = writer
+        self.chunksize = chunksize
+        self.decoder = PacketDecoder(packet_class, subscribe)
+        self._packets = collections.deque()
+        self._transports = []
+
+    def __aiter__(self):
+        return self
+
+    @property
+    def packets_skipped(self):
+        """Number of packets dropped because they were not subscribed."""
+        return self.decoder.packets_skipped
+
+    async def __anext__(self):
+        packet = await self.read()
+
+        if packet is None:
+            raise StopAsyncIteration()
+        else:
+            return packet
+
+    async def read(self):
+        """
+        Read the next packet.
+
+        :returns: `Packet` instance or ``None`` on end-of-file.
+
+        """
+
+        packets = self._packets
+
+        while not packets:
+            chunk = await self.reader.read(self.chunksize)
+            if not chunk:   # end-of-file
+                return None
+            packets.extend(self.decoder.feed(chunk))
+
+        return packets.popleft()
+
+    async def write(self, packet, *values):
+        """
+        Send a packet and wait until it has been handed to the transport.
+
+        :param packet: Packet to send.
+        :type packet: `Packet` or `Command` instance.
+        :param values: Values of the parameters of a `Command`.
+
+        """
+
+        self.writer.write(frame_packet(packet, *values))
+        await self.writer.drain()
+
+    def close(self):
+        """Close the underlying transport(s)."""
+
+        if self.writer is not None:
+            self.writer.close()
+
+        for transport in self._transports:
+            transport.close()
+
+    async def wait_closed(self):
+        if self.writer is not None:
+            await self.writer.wait_closed()
+
+
+async def open_connection(host=None, port=None, chunksize=READ_CHUNK_SIZE, packet_class=Packet,
+                          subscribe=None, **kwargs):
+    """
+    Connect to a TCP socket, e.g. a serial-to-network converter.
+
+    All other arguments are passed to ``asyncio.open_connection()`` so
+    ``sock=`` may be used to wrap an already connected socket.
+
+    :param chunksize: See `AsyncGPS`.
+    :param packet_class: See `AsyncGPS`.
+    :param subscribe: See `AsyncGPS`.
+    :returns: `AsyncGPS` instance.
+
+    """
+
+    (reader, writer) = await asyncio.open_connection(host, port, **kwargs)
+    return AsyncGPS(reader, writer, chunksize, packet_class, subscribe)
+
+
+async def open_file(fileobj, chunksize=READ_CHUNK_SIZE, packet_class=Packet, subscribe=None):
+    """
+    Wrap a character device such as a serial port or pty.
+
+    The device (e.g. a configured ``serial.Serial`` instance) must provide
+    ``fileno()``. It is switched to non-blocking mode. The caller remains
+    responsible for closing `fileobj` after closing the returned
+    `AsyncGPS` instance.
+
+    :param chunksize: See `AsyncGPS`.
+    :param packet_class: See `AsyncGPS`.
+    :param subscribe: See `AsyncGPS`.
+    :returns: `AsyncGPS` instance.
+
+    """
+
+    loop = asyncio.get_running_loop()
+
+    # The read and write transports each take ownership of (and close)
+    # their file descriptor so both get their own duplicate.
+    #
+    rfile = os.fdopen(os.dup(fileobj.fileno()), 'rb', buffering=0)
+    wfile = os.fdopen(os.dup(fileobj.fileno()), 'wb', buffering=0)
+
+    reader = asyncio.StreamReader()
+    (rtransport, _) = await loop.connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader), rfile)
+
+    # `StreamReaderProtocol` provides the flow control and close
+    # notification `StreamWriter` relies on. Its reader is unused.
+    #
+    (wtransport, protocol) = await loop.connect_write_pipe(
+        lambda: asyncio.StreamReaderProtocol(asyncio.StreamReader()), wfile)
+    writer = asyncio.StreamWriter(wtransport, protocol, None, loop)
+
+    gps = AsyncGPS(reader, writer, chunksize, packet_class, subscribe)
+    gps._transports.append(rtransport)
+    return gps
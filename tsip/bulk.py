@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+Bulk decoding into NumPy arrays.
+
+Instead of instantiating a `Packet` for every packet, the payloads of all
+packets of the same type are joined and decoded into a NumPy structured
+array in one go. This requires NumPy_ to be installed.
+
+Example::
+
+  >>> arrays = decode_capture('thunderbolt.tsip')
+  >>> arrays[0x8fac]['f15']        # DAC voltage of all 0x8F-AC packets
+
+Field names are ``f0``, ``f1``, ... in the order of the fields of
+`Packet` instances, i.e. ``f0`` is the packet code.
+
+.. _NumPy: https://numpy.org/
+
+"""
+
+import struct
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from tsip.config import *
+from tsip.structs import *
+
+
+# NumPy equivalents of `struct` format characters.
+#
+NUMPY_TYPES = {
+    'b': 'i1', 'B': 'u1', '?': '?',
+    'h': 'i2', 'H': 'u2',
+    'i': 'i4', 'I': 'u4', 'l': 'i4', 'L': 'u4',
+    'q': 'i8', 'Q': 'u8',
+    'e': 'f2', 'f': 'f4', 'd': 'f8',
+    's': 'S', 'p': 'S', 'c': 'S',
+}
+
+
+def _require_numpy():
+    if numpy is None:
+        raise ImportError('tsip.bulk requires NumPy')
+
+
+def dtype_for_format(fmt, names=None):
+    """
+    Return the NumPy structured dtype equivalent to a `struct` format.
+
+    :param fmt: Format string, e.g. ``'>BBIHh'``.
+    :param names: Field names. Defaults to ``f0``, ``f1``, ...
+    :return: ``numpy.dtype`` with the same item size as `fmt`.
+
+    """
+
+    _require_numpy()
+
+    fields = parse_format(fmt)
+    if names is None:
+        names = ['f%d' % (i) for i in range(0, len(fields))]
+
+    formats = []
+    offsets = []
+    for (offset, fmt_) in fields:
+        (order, count, code) = (fmt_[0], fmt_[1:-1], fmt_[-1])
+        if order == '!':
+            order = '>'
+        formats.append(order + NUMPY_TYPES[code] + count)
+        offsets.append(offset)
+
+    return numpy.dtype({'names': names,
+                        'formats': formats,
+                        'offsets': offsets,
+                        'itemsize': struct.calcsize(fmt)})
+
+
+def dtype_for_variable(key, size):
+    """
+    Return the dtype of variable-length packets padded to `size` bytes.
+
+    * 0x47: ``f0``, ``f1`` (count) and ``f2``, an array of `MAX_CHANNELS`
+      ``(prn, level)`` records.
+    * 0x6D: ``f0`` to ``f5`` and ``f6``, an array of `MAX_CHANNELS` PRNs.
+    * 0x58: ``f0`` to ``f4`` (length of data) and ``data``, an array of
+      bytes.
+    * Everything else: ``length`` and ``data``, the raw payload.
+
+    Payloads are padded with zeros. The counts/lengths in the packets
+    tell how many elements are valid.
+
+    :param key: Packet code or code/subcode.
+    :param size: Size of the padded payloads.
+    :return: ``(dtype, size)`` where `size` is the item size of `dtype`.
+        Longer payloads are truncated to it.
+
+    """
+
+    _require_numpy()
+
+    if key == 0x47:
+        sats = numpy.dtype([('prn', 'u1'), ('level', '>f4')])
+        dtype = numpy.dtype([('f0', 'u1'), ('f1', 'u1'), ('f2', sats, (MAX_CHANNELS,))])
+    elif key == 0x6d:
+        header = dtype_for_format('>BBffff')
+        dtype = numpy.dtype(header.descr + [('f6', 'i1', (MAX_CHANNELS,))])
+    elif key == 0x58:
+        header = dtype_for_format('>BBBBB')
+        dtype = numpy.dtype(header.descr + [('data', 'u1', (max(size - 5, 0),))])
+    else:
+        return (numpy.dtype([('length', '>u2'), ('data', 'u1', (size,))]), size)
+
+    return (dtype, dtype.itemsize)
+
+
+class BulkDecoder(object):
+    """
+    Collect payloads and decode them into NumPy structured arrays.
+
+    Payloads of fixed-size packets are accumulated in one buffer per type,
+    so no per-packet objects are retained. Payloads of variable-length
+    packets are kept until `arrays()` pads them to a common size.
+
+    """
+
+    def __init__(self):
+        _require_numpy()
+        self._fixed = {}        # (key, length) -> bytearray
+        self._variable = {}     # key -> list of payloads
+
+    def add(self, payload):
+        """
+        Add the payload of a packet.
+
+        :param payload: TSIP packet without framing and byte stuffing.
+        :type payload: Binary string or ``memoryview``.
+
+        """
+
+        key = get_key_for_rawpacket(payload)
+        length = len(payload)
+
+        if (key, length) in UNPACK_INDEX:
+            try:
+                self._fixed[(key, length)] += payload
+            except KeyError:
+                self._fixed[(key, length)] = bytearray(payload)
+        elif load_structures(key):
+            self.add(payload)
+        else:
+            self._variable.setdefault(key, []).append(bytes(payload))
+
+    def extend(self, payloads):
+        for payload in payloads:
+            self.add(payload)
+
+    def update(self, other):
+        """
+        Add all payloads collected by another `BulkDecoder` instance.
+
+        :param other: `BulkDecoder` instance, e.g. one which decoded a later
+            part of the same capture file in another process.
+
+        """
+
+        for (key, buf) in other._fixed.items():
+            try:
+                self._fixed[key] += buf
+            except KeyError:
+                self._fixed[key] = bytearray(buf)
+
+        for (key, payloads) in other._variable.items():
+            self._variable.setdefault(key, []).extend(payloads)
+
+    def arrays(self):
+        """
+        Decode all payloads added so far.
+
+        :return: Dictionary mapping packet codes/subcodes (as used as keys
+            of `PACKET_STRUCTURES`) to structured arrays, one record per
+            packet, in the order the packets were added. Codes for which
+            payloads of several fixed-size structures were added (e.g.
+            0x46) are instead mapped as ``(key, length)`` tuples, one array
+            per structure. Unknown packets are keyed by their first two
+            bytes.
+        :rtype: Dictionary.
+
+        """
+
+        result = {}
+
+        keys = [key for (key, length) in self._fixed]
+        for ((key, length), buf) in self._fixed.items():
+            array = _fixed_array(key, length, buf)
+
+            if keys.count(key) > 1 or key in self._variable:
+                result[(key, length)] = array
+            else:
+                result[key] = array
+
+        for (key, payloads) in self._variable.items():
+            result[key] = _variable_array(key, payloads, max(map(len, payloads)))
+
+        return result
+
+    def clear(self):
+        """Discard all payloads added so far."""
+
+        self._fixed.clear()
+        self._variable.clear()
+
+
+def _fixed_array(key, length, buf):
+    dtype = dtype_for_format(UNPACK_INDEX[(key, length)].format)
+    return numpy.frombuffer(bytes(buf), dtype=dtype)
+
+
+def _variable_array(key, payloads, size):
+    (dtype, size) = dtype_for_variable(key, size)
+    padded = b''.join([payload[:size].ljust(size, b'\0') for payload in payloads])
+
+    if 'length' in dtype.names:
+        array = numpy.zeros(len(payloads), dtype=dtype)
+        array['length'] = [len(payload) for payload in payloads]
+        array['data'] = numpy.frombuffer(padded, dtype='u1').reshape(len(payloads), size)
+    else:
+        array = numpy.frombuffer(padded, dtype=numpy.dtype((numpy.void, size))).view(dtype).ravel()
+
+    return array
+
+
+def decode_arrays(payloads):
+    """
+    Decode payloads into one NumPy structured array per packet type.
+
+    :param payloads: TSIP packets without framing and byte stuffing.
+    :type payloads: Iterable of binary strings or ``memoryview`` instances.
+    :return: See `BulkDecoder.arrays()`.
+
+    """
+
+    decoder = BulkDecoder()
+    decoder.extend(payloads)
+    return decoder.arrays()
+
+
+def _collect(payloads):
+    decoder = BulkDecoder()
+    decoder.extend(payloads)
+    return decoder
+
+
+def decode_capture(path, subscribe=None, processes=1):
+    """
+    Decode a capture file into one NumPy structured array per packet type.
+
+    :param path: Name of the capture file.
+    :param subscribe: Decode only these packets, see `tsip.Subscription`.
+    :param processes: Number of processes reading the capture file in
+        parallel (see `tsip.capture.parallel_map()`). ``None`` uses all
+        CPUs.
+    :return: See `BulkDecoder.arrays()`.
+
+    """
+
+    from tsip.capture import Capture, parallel_map
+
+    decoder = BulkDecoder()
+
+    if processes == 1:
+        with Capture(path, subscribe) as capture:
+            decoder.extend(capture.payloads())
+    else:
+        for chunk in parallel_map(path, _collect, processes, subscribe=subscribe):
+            decoder.update(chunk)
+
+    return decoder.arrays()
@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+"""
+Capture file API.
+
+Reads files containing raw TSIP data as received from a GPS, e.g.
+recorded with ``tests/readserial.py``. The file is memory-mapped and
+searched for packets in place, so memory usage does not depend on the
+size of the file.
+
+Example::
+
+  >>> with Capture('thunderbolt.tsip') as capture:
+  ...     for packet in capture:
+  ...         print(packet)
+  ...     print('%.1f MB/s, %.0f packets/s' % capture.throughput())
+
+"""
+
+import collections
+import concurrent.futures
+import mmap
+import os
+import time
+
+from tsip.config import *
+from tsip.llapi import *
+from tsip.hlapi import *
+
+
+RELEASE_SIZE = 16 * 1024 * 1024
+"""Pages of the mapping are released after every `RELEASE_SIZE` bytes scanned."""
+
+PARALLEL_CHUNK_SIZE = 16 * 1024 * 1024
+"""Default number of bytes decoded per task by `parallel_packets()`."""
+
+
+def find_sync(buf, pos=0):
+    """
+    Return the first packet boundary at or after `pos`.
+
+    A packet boundary is the offset following an ETX which is preceded
+    by an odd number of DLEs. Such an ETX always terminates a (possibly
+    partial) packet, no matter whether reading started at the beginning
+    of `buf` or somewhere else, so parsing `buf` from a packet boundary
+    yields the same packets as parsing it from the beginning.
+
+    :param buf: Data received from a GPS.
+    :type buf: ``bytes``, ``bytearray``, ``mmap.mmap`` or similar.
+    :param pos: Offset at which to start searching.
+    :return: Offset of the packet boundary, 0 if `pos` is 0, or
+        ``len(buf)`` if there is none.
+
+    """
+
+    if pos <= 0:
+        return 0
+
+    find = buf.find
+    i = pos - 1
+
+    while True:
+        i = find(bETX, i)
+        if i < 0:
+            return len(buf)
+
+        j = i
+        while j > 0 and buf[j - 1] == DLE:
+            j -= 1
+
+        if (i - j) % 2 == 1:
+            return i + 1
+
+        i += 1
+
+
+class Capture(object):
+    """
+    Memory-mapped TSIP capture file.
+
+    :param path: Name of the capture file.
+    :param subscribe: Return only these packets, see `Subscription`.
+    :type subscribe: Iterable of packet codes or code/subcodes.
+
+    Progress of the current (or last) iteration is tracked in the
+    following attributes:
+
+    * ``bytes_read`` -- number of bytes scanned so far.
+    * ``packets_read`` -- number of packets returned so far.
+    * ``packets_skipped`` -- number of packets which were not subscribed.
+    * ``elapsed`` -- seconds spent iterating so far.
+
+    """
+
+    def __init__(self, path, subscribe=None):
+        self.path = path
+
+        if subscribe is None:
+            self.subscription = None
+        else:
+            self.subscription = Subscription(subscribe)
+        self._file = open(path, 'rb')
+
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped.
+            self._mmap = b''
+        else:
+            if hasattr(self._mmap, 'madvise'):
+                self._mmap.madvise(mmap.MADV_SEQUENTIAL)
+
+        self.bytes_read = 0
+        self.packets_read = 0
+        self.packets_skipped = 0
+        self.elapsed = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __iter__(self):
+        return self.packets()
+
+    def close(self):
+        """Unmap and close the capture file."""
+
+        if isinstance(self._mmap, mmap.mmap):
+            try:
+                self._mmap.close()
+            except BufferError:
+                # Views returned by `payloads()` are still referenced.
+                # The file is unmapped once they are garbage collected.
+                pass
+            self._mmap = b''
+
+        self._file.close()
+
+    def payloads(self, begin=0, end=None):
+        """
+        Iterate over the payloads of all packets in the capture file.
+
+        Framing is removed. Byte stuffing is reversed only for packets
+        which contain stuffed DLEs. All other payloads are returned as
+        views into the memory-mapped file without copying them.
+
+        :param begin: Offset at which to start reading. The result is only
+            the same as when reading the whole file if `begin` is a packet
+            boundary as returned by `find_sync()`.
+        :param end: Offset at which to stop reading. Defaults to the size
+            of the capture file.
+        :returns: Generator of ``memoryview`` (or ``bytes`` where byte
+            stuffing was reversed) instances. Views should not be used
+            after the capture file was closed.
+
+        """
+
+        buf = self._mmap
+        view = memoryview(buf)
+        find = buf.find
+        match = self.subscription.match if self.subscription is not None else None
+        pos = begin
+        if end is None:
+            end = len(buf)
+
+        # Pages which have been scanned are dropped from the process'
+        # resident memory from time to time (they will simply be read
+        # from the file again if still accessed through a view).
+        #
+        if hasattr(buf, 'madvise') and hasattr(mmap, 'MADV_DONTNEED'):
+            release = buf.madvise
+        else:
+            release = None
+        released = begin - begin % mmap.PAGESIZE
+
+        self.bytes_read = 0
+        self.packets_read = 0
+        self.packets_skipped = 0
+        self.elapsed = 0.0
+        t0 = time.perf_counter()
+
+        try:
+            while True:
+                (start, stop, pos) = find_frame(buf, pos, end=end)
+
+                if stop is None:
+                    break
+
+                if release is not None and pos - released >= RELEASE_SIZE:
+                    offset = start - start % mmap.PAGESIZE
+                    release(mmap.MADV_DONTNEED, released, offset - released)
+                    released = offset
+
+                self.bytes_read = pos - begin
+
+                if match is not None and not match(buf, start):
+                    self.packets_skipped += 1
+                    continue
+
+                # Any DLE between the leading DLE and the trailing
+                # DLE/ETX is (the first byte of) a stuffed DLE.
+                #
+                if find(bDLE, start + 1, stop - 2) < 0:
+                    payload = view[start + 1:stop - 2]
+                else:
+                    payload = unstuff(bytes(view[start + 1:stop - 2]))
+
+                self.packets_read += 1
+                yield payload
+
+            self.bytes_read = end - begin
+
+        finally:
+            self.elapsed = time.perf_counter() - t0
+            view.release()
+
+    def packets(self, packet_class=Packet):
+        """
+        Iterate over all packets in the capture file.
+
+        :param packet_class: `Packet`, `LazyPacket` or `tsip.records.Record`.
+        :returns: Generator of `packet_class` instances.
+
+        """
+
+        unpack = packet_class.unpack
+        for payload in self.payloads():
+            yield unpack(payload)
+
+    def throughput(self):
+        """
+        Return the processing rate of the capture file so far.
+
+        :returns: Tuple ``(MB/s, packets/s)``.
+
+        """
+
+        if not self.elapsed:
+            return (0.0, 0.0)
+        else:
+            return (self.bytes_read / self.elapsed / 1e6, self.packets_read / self.elapsed)
+
+
+def _map_range(args):
+    (path, begin, end, func, subscribe) = args
+
+    with Capture(path, subscribe) as capture:
+        begin = find_sync(capture._mmap, begin)
+        end = find_sync(capture._mmap, end)
+        return func(capture.payloads(begin, end))
+
+
+def parallel_map(path, func, processes=None, chunk_size=PARALLEL_CHUNK_SIZE, subscribe=None):
+    """
+    Process a capture file on a pool of processes.
+
+    The file is split into chunks of `chunk_size` bytes. The start and end
+    of each chunk are moved to the next packet boundary (see `find_sync()`)
+    so every packet belongs to exactly one chunk. `func` is called in a
+    separate process for each chunk and passed the payloads of the packets
+    in the chunk (see `Capture.payloads()`).
+
+    Example::
+
+      >>> def count(payloads):
+      ...     return sum(1 for payload in payloads)
+      >>> sum(parallel_map('thunderbolt.tsip', count))
+      211
+
+    :param path: Name of the capture file.
+    :param func: Function taking an iterable of payloads. It must be
+        picklable, i.e. defined at module level, and so must its result.
+    :param processes: Number of processes. Defaults to the number of CPUs.
+    :param chunk_size: Number of bytes per chunk.
+    :param subscribe: Pass only these packets to `func`, see `Subscription`.
+    :returns: Generator of the results of `func`, in the order of the
+        chunks in the file.
+
+    """
+
+    size = os.path.getsize(path)
+    chunks = [(path, begin, min(begin + chunk_size, size), func, subscribe)
+              for begin in range(0, size, chunk_size)]
+
+    with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+
+        # Keep only a few chunks per process in flight so results don't
+        # pile up in memory if the caller is slower than the pool.
+        #
+        window = 2 * (processes or os.cpu_count() or 1)
+        pending = collections.deque()
+
+        for chunk in chunks:
+            pending.append(executor.submit(_map_range, chunk))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+
+def _unpack_fields(payloads):
+    return [Packet.unpack(payload).fields for payload in payloads]
+
+
+def parallel_packets(path, processes=None, chunk_size=PARALLEL_CHUNK_SIZE, subscribe=None):
+    """
+    Decode a capture file on a pool of processes.
+
+    The packets are returned in the same order, and are the same, as
+    those returned by `Capture.packets()`. Packets are decoded by
+    `parallel_map()` but still have to be transferred to (and created
+    in) the calling process, which limits the speed-up. Where possible
+    process the packets with `parallel_map()` instead.
+
+    :param path: Name of the capture file.
+    :param processes: Number of processes. Defaults to the number of CPUs.
+    :param chunk_size: Number of bytes per chunk.
+    :param subscribe: Decode only these packets, see `Subscription`.
+    :returns: Generator of `Packet` instances.
+
+    """
+
+    for chunk in parallel_map(path, _unpack_fields, processes, chunk_size, subscribe):
+        for fields in chunk:
+            yield Packet(fields)
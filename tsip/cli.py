@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+"""
+Command-line tool for reading TSIP packets.
+
+Reads packets from a capture file, standard input or a serial device
+(requires pySerial) and prints them in one of several formats::
+
+  read-tsip [options] <file|device|-> [<baudrate>]
+
+Data is read in chunks and framed by a `FrameDecoder`, so a 115200 baud
+stream can be printed without falling behind. Packets written in the
+``hex`` format are not decoded at all.
+
+* ``-f human`` (the default) -- packet code/subcode followed by the fields.
+* ``-f json`` -- one JSON object per line with ``code`` and ``fields``.
+  Binary fields are written as hex strings.
+* ``-f hex`` -- the raw packet, including framing and byte stuffing.
+
+``-s`` restricts output to the listed packet codes or code/subcodes,
+``--summary`` writes the counters of `tsip.stats.Statistics` to standard
+error on exit and ``--stats-interval`` writes the packet and byte rates
+to standard error every so many seconds.
+
+"""
+
+import argparse
+import binascii
+import json
+import math
+import os
+import sys
+import time
+
+from tsip.config import *
+from tsip.structs import *
+from tsip.llapi import *
+from tsip.hlapi import *
+from tsip.stats import Statistics
+
+
+FORMATS = ['human', 'json', 'hex']
+
+DEFAULT_BAUDRATE = 9600
+
+SERIAL_TIMEOUT = 0.1
+"""Seconds a read from a serial device may block, so that rates can be
+displayed while the device is silent."""
+
+
+def get_key(fields):
+    """
+    Return the code or code/subcode of a decoded packet.
+
+    Unlike `get_key_for_fields()` this accepts 0xFF pseudo-packets.
+
+    :param fields: Fields of a packet, starting with the code (and
+        subcode).
+
+    """
+
+    if fields[0] in PACKET_STRUCTURES or len(fields) < 2 or not isinstance(fields[1], int):
+        return fields[0]
+    else:
+        return fields[0] << 8 | fields[1]
+
+
+def _value(value):
+    if isinstance(value, (bytes, bytearray)):
+        return binascii.hexlify(value).decode('ascii')
+    return value
+
+
+def format_human(packet):
+    """Return `packet` as its code/subcode followed by its fields."""
+
+    fields = packet.fields
+    key = get_key(fields)
+    values = fields[2:] if key > 0xff else fields[1:]
+    return '%#x %s' % (key, ' '.join([repr(_value(value)) for value in values]))
+
+
+def _json_value(value):
+    # NaN and infinity are not valid JSON. Receivers report NaN e.g. for
+    # positions before they have a fix.
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return _value(value)
+
+
+def format_json(packet):
+    """
+    Return `packet` as a JSON object with ``code`` and ``fields``.
+
+    Fields which are NaN or infinite are written as ``null``.
+
+    """
+
+    fields = packet.fields
+    return json.dumps({'code': '%#x' % (get_key(fields)),
+                       'fields': [_json_value(value) for value in fields]}, allow_nan=False)
+
+
+def format_hex(packet):
+    """Return the raw `packet` in hex."""
+    return binascii.hexlify(packet).decode('ascii')
+
+
+FORMATTERS = {
+    'human': format_human,
+    'json': format_json,
+    'hex': format_hex,
+}
+
+
+def format_rates(stats, last):
+    """
+    Return a line with the packet and byte rates since `last`.
+
+    :param stats: `tsip.stats.Statistics` instance.
+    :param last: Tuple ``(time, packets_in, bytes_in)`` of the previous
+        call, as returned along with the line.
+    :return: ``(line, last)``
+
+    """
+
+    now = stats.clock()
+    elapsed = now - last[0]
+    packets = stats.packets_in - last[1]
+    size = stats.bytes_in - last[2]
+
+    line = '%8.1fs %10d packets %8.1f packets/s %10.0f bytes/s %8d discarded %6d failures' % (
+        now - stats.started, stats.packets_in,
+        packets / elapsed if elapsed else 0.0, size / elapsed if elapsed else 0.0,
+        stats.bytes_discarded, stats.decode_failures)
+
+    return (line, (now, stats.packets_in, stats.bytes_in))
+
+
+def format_summary(snapshot):
+    """
+    Return a summary of the counters returned by
+    `tsip.stats.Statistics.snapshot()`.
+
+    :rtype: String.
+
+    """
+
+    lines = [
+        'elapsed          %.1f s' % (snapshot['elapsed']),
+        'bytes in         %d (%.0f bytes/s)' % (snapshot['bytes_in'], snapshot['byte_rate_in']),
+        'packets in       %d' % (snapshot['packets_in']),
+        'packets skipped  %d' % (snapshot['packets_skipped']),
+        'bytes discarded  %d' % (snapshot['bytes_discarded']),
+        'resyncs          %d' % (snapshot['resyncs']),
+        'decode failures  %d' % (snapshot['decode_failures']),
+    ]
+
+    codes = snapshot['codes']
+    if codes:
+        lines.append('%-8s %10s %10s %12s' % ('code', 'count', 'packets/s', 'bytes'))
+        for key in sorted(codes):
+            lines.append('%-8s %10d %10.1f %12d' % (
+                '%#x' % (key), codes[key]['count'], codes[key]['rate'], codes[key]['bytes']))
+
+    return '\n'.join(lines)
+
+
+def open_source(source, baudrate=DEFAULT_BAUDRATE):
+    """
+    Open a capture file, standard input (``-``) or a serial device.
+
+    :return: ``(conn, follow)`` where `follow` is ``True`` if reading
+        should continue after a read returned no data.
+
+    """
+
+    if source == '-':
+        return (getattr(sys.stdin, 'buffer', sys.stdin), False)
+    elif os.path.isfile(source):
+        return (open(source, 'rb'), False)
+    else:
+        import serial
+        return (serial.Serial(source, baudrate, timeout=SERIAL_TIMEOUT), True)
+
+
+def _parse_key(s):
+    return int(s, 16)
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(prog='read-tsip',
+                                     description='Read TSIP packets from a capture file or device.')
+    parser.add_argument('source', help='capture file, serial device or - for standard input')
+    parser.add_argument('baudrate', nargs='?', type=int, default=DEFAULT_BAUDRATE,
+                        help='baud rate of a serial device (default: %(default)s)')
+    parser.add_argument('-f', '--format', choices=FORMATS, default='human',
+                        help='output format (default: %(default)s)')
+    parser.add_argument('-s', '--subscribe', action='append', type=_parse_key,
+                        help='print only this packet code or code/subcode, e.g. 8fab (repeatable)')
+    parser.add_argument('-n', '--count', type=int, default=None,
+                        help='stop after this many packets')
+    parser.add_argument('--summary', action='store_true',
+                        help='write statistics to standard error on exit')
+    parser.add_argument('--stats-interval', type=float, default=None, metavar='SECONDS',
+                        help='write packet and byte rates to standard error every SECONDS')
+    return parser
+
+
+def run(conn, out, err, format='human', subscribe=None, count=None, follow=False,
+        summary=False, stats_interval=None, clock=time.monotonic):
+    """
+    Read packets from `conn` and write them to `out`.
+
+    :param conn: File-like object, socket or serial port.
+    :param out: Text stream receiving one line per packet.
+    :param err: Text stream receiving rates and the summary.
+    :param format: One of `FORMATS`.
+    :param subscribe: Print only these packets, see `Subscription`.
+    :param count: Stop after this many packets.
+    :param follow: Keep reading when `conn` returns no data (a timeout)
+        instead of stopping.
+    :param summary: Write a summary to `err` when done.
+    :param stats_interval: Write rates to `err` every so many seconds.
+    :param clock: Function returning the current time in seconds.
+    :return: Number of packets written.
+
+    """
+
+    if summary or stats_interval:
+        stats = Statistics(clock=clock)
+    else:
+        stats = None
+
+    if format == 'hex':
+        reader = gps(conn, chunksize=READ_CHUNK_SIZE, subscribe=subscribe, stats=stats)
+    else:
+        reader = GPS(conn, chunksize=READ_CHUNK_SIZE, subscribe=subscribe, stats=stats)
+
+    read = reader.read
+    write = out.write
+    formatter = FORMATTERS[format]
+    written = 0
+
+    if stats_interval:
+        last = (stats.started, 0, 0)
+        due = stats.started + stats_interval
+
+    try:
+        while count is None or written < count:
+            packet = read()
+
+            if packet is not None:
+                write(formatter(packet) + '\n')
+                written += 1
+            elif follow:
+                out.flush()
+            else:
+                break
+
+            if stats_interval and clock() >= due:
+                (line, last) = format_rates(stats, last)
+                err.write(line + '\n')
+                err.flush()
+                due = last[0] + stats_interval
+    except KeyboardInterrupt:
+        pass
+    finally:
+        out.flush()
+        if summary:
+            err.write(format_summary(stats.snapshot()) + '\n')
+            err.flush()
+
+    return written
+
+
+def main(argv=None):
+    """Entry point of the ``read-tsip`` console script."""
+
+    parser = make_parser()
+    args = parser.parse_args(argv)
+
+    try:
+        (conn, follow) = open_source(args.source, args.baudrate)
+    except ImportError:
+        parser.error('pySerial is required for reading from %s' % (args.source))
+    except (IOError, OSError) as e:
+        parser.error(str(e))
+
+    try:
+        run(conn, sys.stdout, sys.stderr, format=args.format, subscribe=args.subscribe,
+            count=args.count, follow=follow, summary=args.summary,
+            stats_interval=args.stats_interval)
+    except BrokenPipeError:
+        # Output was piped into e.g. `head`. Stop quietly and keep the
+        # interpreter from failing to flush standard output on exit.
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 1
+    finally:
+        conn.close()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -21,6 +21,11 @@ bDLE = DLE.to_bytes(1, 'little')
 bETX = ETX.to_bytes(1, 'little')
 
 
+# Seconds per GPS week
+#
+SECONDS_PER_WEEK = 7 * 24 * 60 * 60
+
+
 # Contants for setting bits
 #
 BIT0 = B0 = 0b00000001
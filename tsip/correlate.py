@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+"""
+Request/response correlation.
+
+`Correlator` sends command packets and returns a future for each of them.
+The futures are resolved with the matching report packets (see
+`COMMAND_REPORTS`) as they are read from the GPS, so several commands can
+be outstanding at the same time. All other packets, e.g. broadcasts, are
+returned by `Correlator.read()` like `tsip.GPS.read()` would.
+
+`Correlator` does not read on its own. Wrap it into a
+`tsip.reader.BackgroundReader` to have the futures resolved by a
+background thread::
+
+  >>> correlator = Correlator(GPS(serial.Serial('/dev/ttyS0', 9600, timeout=0.1)))
+  >>> with BackgroundReader(correlator) as reader:
+  ...     futures = [correlator.request(Packet(0x8e, 0xab, 0)),
+  ...                correlator.request(Packet(0x8e, 0xac, 0)),
+  ...                correlator.request(Packet(0x1c, 0x01))]
+  ...     for future in futures:
+  ...         print(future.result())
+  ...     for packet in reader:          # broadcasts
+  ...         print(packet)
+
+Timed out requests are failed when the GPS returns from reading, so the
+connection should have a read timeout (e.g. pySerial's ``timeout``)
+shorter than the request timeouts if the GPS may be silent.
+
+"""
+
+import collections
+import concurrent.futures
+import threading
+import time
+
+from tsip.config import *
+from tsip.structs import *
+from tsip.hlapi import *
+
+
+DEFAULT_REQUEST_TIMEOUT = 2.0
+"""Seconds to wait for the reports answering a command."""
+
+# Raised when completing a future another thread cancelled meanwhile.
+# Older Pythons don't check this.
+#
+_InvalidStateError = getattr(concurrent.futures, 'InvalidStateError', RuntimeError)
+
+
+class Request(object):
+    """
+    A command waiting for its reports.
+
+    :param key: Code or code/subcode of the command.
+    :param reports: Codes or code/subcodes of the expected reports.
+    :param deadline: Time at which the request times out, ``None`` for
+        never.
+
+    """
+
+    def __init__(self, key, reports, deadline):
+        self.key = key
+        self.reports = list(reports)
+        self.deadline = deadline
+        self.future = concurrent.futures.Future()
+        self.received = [None] * len(self.reports)
+        self.remaining = len(self.reports)
+
+    def match(self, key, packet):
+        """
+        Store `packet` if it is one of the outstanding reports.
+
+        :return: ``True`` if the packet was stored.
+
+        """
+
+        for (i, report) in enumerate(self.reports):
+            if report == key and self.received[i] is None:
+                self.received[i] = packet
+                self.remaining -= 1
+                return True
+        return False
+
+    def result(self):
+        if len(self.received) == 1:
+            return self.received[0]
+        else:
+            return self.received
+
+
+class Correlator(object):
+    """
+    Match report packets to the command packets they answer.
+
+    A report is matched to the oldest outstanding command expecting it,
+    i.e. the GPS is assumed to answer commands in order.
+
+    :param gps: `tsip.GPS` instance or anything else with ``read()`` and
+        ``write(packet, *values)`` methods.
+    :param timeout: Default timeout of requests in seconds. ``None``
+        waits indefinitely.
+    :param clock: Function returning the current time in seconds.
+
+    """
+
+    def __init__(self, gps, timeout=DEFAULT_REQUEST_TIMEOUT, clock=time.monotonic):
+        self.gps = gps
+        self.timeout = timeout
+        self.clock = clock
+        self.requests_completed = 0
+        self.requests_expired = 0
+        self._pending = collections.deque()
+        self._lock = threading.Lock()
+
+    def __iter__(self):
+        return self
+
+    def __len__(self):
+        """Number of outstanding requests."""
+        return len(self._pending)
+
+    def request(self, packet, *values, **kwargs):
+        """
+        Send a command and return a future for its reports.
+
+        :param packet: Command to send.
+        :type packet: `Packet` or `Command` instance.
+        :param values: Values of the parameters of a `Command`.
+        :param timeout: Keyword argument. Seconds to wait for the reports,
+            defaults to the `Correlator`'s timeout.
+        :param reports: Keyword argument. Codes or code/subcodes of the
+            expected reports, defaults to those listed in `COMMAND_REPORTS`.
+        :return: ``concurrent.futures.Future`` whose result is the report
+            packet, or a list of the report packets if the command is
+            answered by several. It fails with
+            ``concurrent.futures.TimeoutError`` if not all reports were
+            received in time.
+        :raise: ``ValueError`` if the reports answering the command are
+            unknown.
+
+        """
+
+        timeout = kwargs.pop('timeout', self.timeout)
+        reports = kwargs.pop('reports', None)
+        if kwargs:
+            raise TypeError('unexpected keyword arguments %s' % (', '.join(kwargs)))
+
+        key = get_key_for_fields(packet.fields)
+
+        if reports is None:
+            try:
+                reports = COMMAND_REPORTS[key]
+            except KeyError:
+                raise ValueError('no reports known for command %#x' % (key))
+
+        deadline = None if timeout is None else self.clock() + timeout
+        request = Request(key, reports, deadline)
+
+        # Register the request first so a quick response can't be missed.
+        #
+        with self._lock:
+            self._pending.append(request)
+
+        try:
+            self.gps.write(packet, *values)
+        except Exception:
+            with self._lock:
+                self._pending.remove(request)
+            raise
+
+        return request.future
+
+    def dispatch(self, packet):
+        """
+        Pass a packet read from the GPS to the outstanding requests.
+
+        :param packet: Packet read from the GPS.
+        :return: ``True`` if the packet answered a request.
+
+        """
+
+        try:
+            key = get_key_for_fields(packet.fields)
+        except (IndexError, TypeError):
+            return False
+
+        with self._lock:
+            for request in self._pending:
+                if request.match(key, packet):
+                    break
+            else:
+                return False
+
+            if request.remaining:
+                return True
+
+            self._pending.remove(request)
+            self.requests_completed += 1
+
+        # The future may be cancelled at any time by another thread.
+        #
+        if not request.future.cancelled():
+            try:
+                request.future.set_result(request.result())
+            except _InvalidStateError:
+                pass
+        return True
+
+    def expire(self, now=None):
+        """
+        Fail all requests which timed out and drop cancelled ones.
+
+        :param now: Current time, defaults to ``clock()``.
+        :return: Number of requests which timed out.
+
+        """
+
+        if now is None:
+            now = self.clock()
+
+        with self._lock:
+            expired = [request for request in self._pending
+                       if request.future.cancelled() or
+                       (request.deadline is not None and request.deadline <= now)]
+            for request in expired:
+                self._pending.remove(request)
+
+        count = 0
+        for request in expired:
+            if not request.future.cancelled():
+                try:
+                    request.future.set_exception(concurrent.futures.TimeoutError(
+                        'no response to command %#x' % (request.key)))
+                except _InvalidStateError:
+                    continue
+                count += 1
+
+        self.requests_expired += count
+        return count
+
+    def read(self):
+        """
+        Read the next packet which does not answer a request.
+
+        Reports answering requests are passed to their futures and timed
+        out requests are failed while reading.
+
+        :returns: `Packet` instance or ``None`` on timeout or end-of-file.
+
+        """
+
+        read = self.gps.read
+
+        while True:
+            packet = read()
+
+            if self._pending:
+                self.expire()
+
+            if packet is None or not self.dispatch(packet):
+                return packet
+
+    def next(self):
+        packet = self.read()
+
+        if packet is None:
+            raise StopIteration()
+        else:
+            return packet
+
+    def __next__(self):
+        return self.next()
+
+    def close(self):
+        """Cancel all outstanding requests."""
+
+        with self._lock:
+            pending = list(self._pending)
+            self._pending.clear()
+
+        for request in pending:
+            request.future.cancel()
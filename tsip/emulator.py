@@ -0,0 +1,406 @@
+# -*- coding: utf-8 -*-
+"""
+Receiver emulator.
+
+`Emulator` speaks TSIP over a pty, socket or any other connection like a
+Trimble Copernicus II or Thunderbolt receiver would. It sends periodic
+broadcasts and replies to command packets with the matching report
+packets (see `COMMAND_REPORTS`). It allows testing applications
+without a receiver attached and serves as a high-rate source of TSIP
+data for throughput tests.
+
+Example::
+
+  >>> (emulator, conn) = socketpair(broadcasts={0x8fab: 1, 0x8fac: 1})
+  >>> emulator.start()
+  >>> gps = GPS(conn)
+  >>> gps.read()
+  Packet(0x8f, 0xab, ...)
+  >>> gps.write(Packet(0x1c, 0x01))
+  >>> emulator.close()
+
+"""
+
+import errno
+import os
+import pty
+import selectors
+import socket
+import threading
+import time
+import tty
+
+from tsip.config import *
+from tsip.structs import *
+from tsip.llapi import *
+from tsip.hlapi import *
+
+
+GPS_EPOCH = 315964800
+"""Start of GPS time (06-Jan-1980) in seconds since the Unix epoch."""
+
+LEAP_SECONDS = 18
+"""Difference between GPS time and UTC in seconds."""
+
+DEFAULT_BROADCASTS = {0x8fab: 1.0, 0x8fac: 1.0}
+"""Broadcast packets and their rates (packets per second) of a Thunderbolt."""
+
+MAX_POLL_INTERVAL = 0.1
+"""Maximum time `Emulator.serve()` waits before checking whether it was stopped."""
+
+
+def default_reports():
+    """
+    Return the report packets sent by an `Emulator` unless changed.
+
+    :return: Dictionary mapping packet codes/subcodes to `Packet` instances.
+
+    """
+
+    reports = [
+        Packet(0x1c, 0x81, 0, 1, 11, 2, 11, 20, 2015, 'Emulated TSIP Receiver'),
+        Packet(0x1c, 0x83, 12345678, 19, 11, 2015, 14, 1, 'Emulated TSIP Receiver'),
+        Packet(0x41, 0.0, 0, float(LEAP_SECONDS)),
+        Packet(0x45, 1, 11, 20, 11, 15, 3, 0, 2, 4, 15),
+        Packet(0x46, 0, 0),
+        Packet(0x47, 6, 2, 45.0, 5, 42.5, 12, 38.0, 15, 44.0, 21, 40.5, 29, 36.0),
+        Packet([0x49] + [0] * 32),
+        Packet(0x4a, -0.6565, 2.5155, 25.0, 0.0, 0.0),
+        Packet(0x4b, 0x5a, 0, 0),
+        Packet(0x4d, 12.5),
+        Packet(0x55, 0x03, 0x02, 0x00, 0x08),
+        Packet(0x56, 0.0, 0.0, 0.0, 0.0, 0.0),
+        Packet(0x57, 2, 4, 0.0, 0),
+        Packet([0x59, 0] + [0] * 32),
+        Packet(0x5c, 2, 1, 0, 0x08, 45.0, 0.0, 0.8, 0.2, 1, 1, 0, 0),
+        Packet(0x6d, 0x64, 1.2, 1.6, 0.8, 0.9, 2, 5, 12, 15, 21, 29),
+        Packet(0x70, 1, 1, 1, 0),
+        Packet(0x82, 0),
+        Packet(0x83, -4130000.0, 2890000.0, -3890000.0, 0.0, 0.0),
+        Packet(0x84, -0.6565, 2.5155, 25.0, 0.0, 0.0),
+        Packet(0xbb, 0x00, 0, 0xff, 4, 0xff, 0.1745, 0.0, 12.0, 8.0, 0xff, 0xff,
+               0xff, 0xff, 0xff, 0xff, 0xff, 0xff, 0xff, 0xff, 0xff, 0xff,
+               0xff, 0xff, 0xff, 0xff, 0xff, 0xff, 0xff),
+        Packet(0xbc, 0xff, 7, 7, 3, 0, 1, 0, 2, 2, 0),
+        Packet(0x8f, 0x15, 0, 6378137.0, 6356752.314, 0.0, 0.0, 0.0),
+        Packet(0x8f, 0x41, 1, 12345678, 15, 11, 19, 14, 1.0, 0),
+        Packet(0x8f, 0x42, 0, 0, 2, 12345678, 12345678, 0, 0, 0),
+        Packet(0x8f, 0x4a, 1, 0, 0, 0.0, -1.0),
+        Packet(0x8f, 0x4e, 2),
+        Packet(0x8f, 0xa0, 31650, 0.3, 20, 0, -5.0, 5.0),
+        Packet(0x8f, 0xa2, 0),
+        Packet(0x8f, 0xa5, 0x0005, 0x0000),
+        Packet(0x8f, 0xa8, 1, 100.0, 1.0, 0.0),
+        Packet(0x8f, 0xa9, 1, 1, 2000, 0),
+        Packet(0x8f, 0xab, 0, 0, LEAP_SECONDS, 0x03, 0, 0, 0, 6, 1, 1980),
+        Packet(0x8f, 0xac, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0.0, 0.0, 31650, 0.3, 40.0,
+               -0.6565, 2.5155, 25.0, 0.0, 0),
+    ]
+
+    return dict([(get_key_for_fields(packet.fields), packet) for packet in reports])
+
+
+class Emulator(object):
+    """
+    Emulated TSIP receiver.
+
+    Reports are kept in `reports`. They are sent as broadcasts and in
+    response to command packets. Command packets with the same number of
+    fields as their report (i.e. commands setting rather than requesting
+    values, e.g. 0x35 or 0x8E-A5) update the report. Time fields of 0x41
+    and 0x8F-AB packets are updated from `clock` every time they are sent.
+
+    :param conn: File-like object, socket or serial port. It must provide
+        ``fileno()`` for `serve()`.
+    :param reports: Report packets replacing those of `default_reports()`.
+    :type reports: List of `Packet` instances.
+    :param broadcasts: Keys of broadcast packets mapped to the number of
+        packets sent per second. Defaults to `DEFAULT_BROADCASTS`.
+    :type broadcasts: Dictionary.
+    :param clock: Function returning the current time in seconds since
+        the Unix epoch.
+
+    """
+
+    def __init__(self, conn, reports=None, broadcasts=None, clock=time.time):
+        self.conn = conn
+        self.clock = clock
+
+        self.reports = default_reports()
+        for packet in reports or []:
+            self.reports[get_key_for_fields(packet.fields)] = packet
+
+        if broadcasts is None:
+            broadcasts = DEFAULT_BROADCASTS
+        self.broadcasts = dict(broadcasts)
+
+        self.decoder = FrameDecoder()
+        self.commands_received = 0
+        self.packets_sent = 0
+
+        self._read_chunk = chunk_reader(conn)
+        self._write = getattr(conn, 'sendall', None) or conn.write
+        self._schedule = {}
+        self._stopped = threading.Event()
+        self._thread = None
+        self._cleanup = []
+
+    def report(self, key):
+        """
+        Return the current report packet for `key`.
+
+        :param key: Packet code or code/subcode.
+        :return: `Packet` instance or ``None`` if the emulator does not
+            know this report.
+
+        """
+
+        packet = self.reports.get(key)
+
+        if key in (0x41, 0x8fab):
+            self._set_time(self.clock())
+
+        return packet
+
+    def _set_time(self, now):
+        gps_seconds = int(now) - GPS_EPOCH + LEAP_SECONDS
+        (week, tow) = divmod(gps_seconds, SECONDS_PER_WEEK)
+        utc = time.gmtime(int(now))
+
+        if 0x41 in self.reports:
+            packet = self.reports[0x41]
+            packet[1] = float(tow) + now % 1
+            packet[2] = week
+        if 0x8fab in self.reports:
+            packet = self.reports[0x8fab]
+            packet[2] = tow
+            packet[3] = week
+            packet[6:12] = [utc.tm_sec, utc.tm_min, utc.tm_hour,
+                            utc.tm_mday, utc.tm_mon, utc.tm_year]
+
+    def handle(self, rawpacket):
+        """
+        Process a command packet.
+
+        :param rawpacket: TSIP packet without framing and byte stuffing.
+        :type rawpacket: Binary string.
+        :return: The report packets to send in response.
+        :rtype: List of `Packet` instances.
+
+        """
+
+        self.commands_received += 1
+
+        key = get_key_for_rawpacket(rawpacket)
+        command = Packet.unpack(rawpacket)
+
+        if key == 0x8ea0 and len(command) == 4 and 0x8fa0 in self.reports:
+            # Set DAC voltage (flag 0) or value (flag 1).
+            self.reports[0x8fa0][3 - command[2]] = command[3]
+
+        responses = []
+        for report_key in COMMAND_REPORTS.get(key, []):
+            packet = self.reports.get(report_key)
+
+            if packet is None:
+                continue
+
+            # Keep the code (and subcode) of the report.
+            header = 2 if report_key > 0xff else 1
+            if len(command) == len(packet) > header:
+                packet.fields = packet.fields[:header] + command.fields[header:]
+
+            responses.append(self.report(report_key))
+
+        return responses
+
+    def due(self, now):
+        """
+        Return the broadcast packets due at `now`.
+
+        Broadcasts which have fallen behind schedule (e.g. because the
+        connection could not keep up) are all returned at once.
+
+        :param now: Time as returned by ``time.monotonic()``.
+        :return: List of `Packet` instances.
+
+        """
+
+        packets = []
+
+        for (key, rate) in self.broadcasts.items():
+            period = 1.0 / rate
+            next_ = self._schedule.setdefault(key, now)
+
+            if next_ <= now:
+                count = int((now - next_) / period) + 1
+                self._schedule[key] = next_ + count * period
+                packet = self.report(key)
+                if packet is not None:
+                    packets += [packet] * count
+
+        return packets
+
+    def timeout(self, now):
+        """Return the number of seconds until the next broadcast is due."""
+
+        if not self._schedule:
+            return 0.0
+        else:
+            return max(0.0, min(self._schedule.values()) - now)
+
+    def send(self, packets):
+        """
+        Send packets to `conn`.
+
+        :param packets: Packets to send.
+        :type packets: List of `Packet` instances.
+
+        """
+
+        if packets:
+            # Broadcasts which have fallen behind are the same `Packet`
+            # instance repeated so each is only packed once.
+            #
+            framed = {}
+            for packet in packets:
+                if id(packet) not in framed:
+                    framed[id(packet)] = frame(stuff(packet.pack()))
+
+            self._write(b''.join([framed[id(packet)] for packet in packets]))
+            self.packets_sent += len(packets)
+
+    def feed(self, data):
+        """
+        Process data received from `conn` and send the responses.
+
+        :param data: TSIP data with framing and byte stuffing.
+        :type data: Binary string.
+
+        """
+
+        responses = []
+        for packet in self.decoder.feed(data):
+            responses += self.handle(unframe_unstuff(packet))
+        self.send(responses)
+
+    def serve(self, duration=None):
+        """
+        Send broadcasts and respond to commands.
+
+        :param duration: Return after this many seconds. By default
+            `serve()` returns when `stop()` is called or `conn` is closed
+            by the other end.
+
+        """
+
+        selector = selectors.DefaultSelector()
+        selector.register(self.conn, selectors.EVENT_READ)
+
+        now = time.monotonic()
+        if duration is not None:
+            deadline = now + duration
+
+        try:
+            while not self._stopped.is_set():
+                now = time.monotonic()
+                if duration is not None and now >= deadline:
+                    break
+
+                timeout = min(self.timeout(now), MAX_POLL_INTERVAL)
+                if duration is not None:
+                    timeout = min(timeout, max(0.0, deadline - now))
+
+                try:
+                    self.send(self.due(now))
+
+                    if selector.select(timeout):
+                        data = self._read_chunk(READ_CHUNK_SIZE)
+                        if not data:                # end-of-file
+                            break
+                        self.feed(data)
+
+                except OSError as e:
+                    # The other end has gone away (a closed pty fails
+                    # with `EIO`) or `close()` shut down the connection.
+                    #
+                    if e.errno in (errno.EIO, errno.EPIPE, errno.ECONNRESET) \
+                            or self._stopped.is_set():
+                        break
+                    raise
+        finally:
+            selector.close()
+
+    def start(self):
+        """Run `serve()` in a background thread."""
+
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self.serve, name='tsip-emulator')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop `serve()` and wait for the background thread to exit."""
+
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        """Stop the emulator and close its end of the connection."""
+
+        self._stopped.set()
+
+        # Wake up `serve()` if it is blocked sending to a client which
+        # does not read.
+        #
+        if hasattr(self.conn, 'shutdown'):
+            try:
+                self.conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        for conn in self._cleanup:
+            conn.close()
+
+        self.stop()
+        self.conn.close()
+
+
+def socketpair(**kwargs):
+    """
+    Create an emulator connected to an in-memory socket pair.
+
+    All arguments are passed to `Emulator()`.
+
+    :return: ``(emulator, sock)`` where `sock` is the client's end of
+        the connection.
+
+    """
+
+    (sock1, sock2) = socket.socketpair()
+    return (Emulator(sock1, **kwargs), sock2)
+
+
+def open_pty(**kwargs):
+    """
+    Create an emulator connected to a pseudo-terminal.
+
+    The returned device name may be opened like a serial port, e.g. with
+    ``serial.Serial(name)``. All arguments are passed to `Emulator()`.
+
+    :return: ``(emulator, name)``
+
+    """
+
+    (master, slave) = pty.openpty()
+    tty.setraw(slave)
+
+    emulator = Emulator(os.fdopen(master, 'r+b', buffering=0), **kwargs)
+
+    # Keep the slave end open so the master does not fail with `EIO`
+    # while no client has the device open.
+    #
+    emulator._cleanup.append(os.fdopen(slave, 'r+b', buffering=0))
+
+    return (emulator, os.ttyname(slave))
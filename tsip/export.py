@@ -0,0 +1,363 @@
+# -*- coding: utf-8 -*-
+"""
+Columnar export of decoded packets.
+
+Packets are decoded in batches with `tsip.bulk.BulkDecoder` and every
+field is appended to its own NumPy ``.npy`` file, one directory per
+packet type::
+
+  <directory>/0x8fab/f0.npy
+  <directory>/0x8fab/f1.npy
+  ...
+  <directory>/0x8fac/f15.npy
+
+Column names and types are those of the NumPy structured arrays returned
+by `tsip.bulk.decode_arrays()`, stored in native byte order. The files
+are valid ``.npy`` files after every batch and can be loaded (or
+memory-mapped) with ``numpy.load()`` without any parsing. Packet types
+with payloads of several fixed lengths (e.g. 0x46) get one directory per
+length, e.g. ``0x46-3``. Payloads which do not match any structure of a
+packet type of fixed size, e.g. truncated ones, are kept apart in a
+directory like ``0x8fac-malformed`` with the columns of
+`tsip.bulk.dtype_for_variable()`. This requires NumPy_ to be installed.
+
+Example::
+
+  >>> export_capture('thunderbolt.tsip', 'thunderbolt')
+  211
+  >>> columns = load_columns('thunderbolt')
+  >>> columns[0x8fac]['f15']       # DAC voltage of all 0x8F-AC packets
+
+From the command line::
+
+  python -m tsip.export thunderbolt.tsip thunderbolt
+
+.. _NumPy: https://numpy.org/
+
+"""
+
+import argparse
+import os
+import os.path
+import struct
+import sys
+
+try:
+    import numpy
+    import numpy.lib.format
+except ImportError:
+    numpy = None
+
+from tsip.config import *
+from tsip.structs import *
+from tsip.bulk import BulkDecoder, _fixed_array, _variable_array, _require_numpy
+
+
+EXPORT_BATCH_SIZE = 65536
+"""Default number of packets decoded and written at once."""
+
+VARIABLE_SIZE = 256
+"""Size to which payloads of variable length are padded (or truncated),
+see `tsip.bulk.dtype_for_variable()`."""
+
+
+def column_set_name(key, length=None, malformed=False):
+    """
+    Return the name of the directory holding the columns of a packet type.
+
+    :param key: Packet code or code/subcode.
+    :param length: Payload length of a fixed-size structure of a packet
+        type which also has other structures.
+    :param malformed: Name the directory of the payloads of a fixed-size
+        packet type which match none of its structures.
+    :return: E.g. ``'0x8fac'``, ``'0x46-3'`` or ``'0x8fac-malformed'``.
+
+    """
+
+    if key is None:
+        return 'unknown'
+    elif malformed:
+        return '%#x-malformed' % (key)
+    elif length is None:
+        return '%#x' % (key)
+    else:
+        return '%#x-%d' % (key, length)
+
+
+def parse_column_set_name(name):
+    """
+    Reverse `column_set_name()`.
+
+    :return: Key or ``(key, length)`` tuple as used by
+        `tsip.bulk.BulkDecoder.arrays()`, ``None`` for unknown packets.
+        Malformed payloads are returned as ``(key, None)``.
+
+    """
+
+    if name == 'unknown':
+        return None
+    elif name.endswith('-malformed'):
+        return (int(name[:-len('-malformed')], 16), None)
+    elif '-' in name:
+        (key, length) = name.split('-')
+        return (int(key, 16), int(length))
+    else:
+        return int(name, 16)
+
+
+class ColumnWriter(object):
+    """
+    A ``.npy`` file to which arrays can be appended.
+
+    The header is rewritten after every append so the file can be loaded
+    at any time. It is padded to hold any number of rows.
+
+    :param path: Name of the ``.npy`` file. An existing file is replaced.
+    :param dtype: Data type of the column.
+    :param shape: Shape of each element, ``()`` for scalars.
+
+    """
+
+    def __init__(self, path, dtype, shape=()):
+        _require_numpy()
+
+        self.path = path
+        self.dtype = numpy.dtype(dtype)
+        self.shape = tuple(shape)
+        self.rows = 0
+
+        magic = numpy.lib.format.magic(1, 0)
+        size = len(magic) + 2 + len(self._header(2 ** 63)) + 1
+        self._header_size = (size + 63) // 64 * 64 - len(magic) - 2
+
+        self._file = open(path, 'wb')
+        self._file.write(magic + struct.pack('<H', self._header_size))
+        self._write_header()
+
+    def _header(self, rows):
+        return "{'descr': %r, 'fortran_order': False, 'shape': %r, }" % (
+            numpy.lib.format.dtype_to_descr(self.dtype), (rows,) + self.shape)
+
+    def _write_header(self):
+        header = self._header(self.rows).ljust(self._header_size - 1) + '\n'
+        self._file.seek(len(numpy.lib.format.magic(1, 0)) + 2)
+        self._file.write(header.encode('latin1'))
+        self._file.flush()
+
+    def append(self, array):
+        """
+        Append rows.
+
+        :param array: Array of shape ``(rows,) + shape``. It is converted
+            to the column's data type.
+
+        """
+
+        array = numpy.ascontiguousarray(array, dtype=self.dtype)
+
+        self._file.seek(0, os.SEEK_END)
+        self._file.write(array.tobytes())
+        self.rows += len(array)
+        self._write_header()
+
+    def close(self):
+        self._file.close()
+
+
+class Exporter(object):
+    """
+    Write the fields of packets to one ``.npy`` file per field and type.
+
+    :param directory: Directory receiving the column sets. It is created
+        if necessary. Existing columns are replaced.
+    :param batch_size: Number of packets decoded and written at once.
+
+    """
+
+    def __init__(self, directory, batch_size=EXPORT_BATCH_SIZE):
+        _require_numpy()
+
+        self.directory = directory
+        self.batch_size = batch_size
+        self.packets_written = 0
+        self._decoder = BulkDecoder()
+        self._pending = 0
+        self._columns = {}      # (name, field) -> ColumnWriter
+        self._names = {}        # (key, length) -> name
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add(self, payload):
+        """
+        Add the payload of a packet.
+
+        :param payload: TSIP packet without framing and byte stuffing.
+        :type payload: Binary string or ``memoryview``.
+
+        """
+
+        self._decoder.add(payload)
+        self._pending += 1
+
+        if self._pending >= self.batch_size:
+            self.flush()
+
+    def extend(self, payloads):
+        for payload in payloads:
+            self.add(payload)
+
+    def _name(self, key, length=None):
+        try:
+            return self._names[(key, length)]
+        except KeyError:
+            pass
+
+        # The name must not depend on the packets in a batch so it is
+        # derived from the structures defined for `key`. Payloads of
+        # fixed-size packets which match no structure must not end up
+        # with the valid ones.
+        #
+        load_structures(key)
+        structures = len([k for (k, l) in UNPACK_INDEX if k == key])
+
+        if length is None:
+            name = column_set_name(key, malformed=structures > 0 and key not in VARIABLE_STRUCTURES)
+        elif structures == 1 and key not in VARIABLE_STRUCTURES:
+            name = column_set_name(key)
+        else:
+            name = column_set_name(key, length)
+
+        self._names[(key, length)] = name
+        return name
+
+    def _write(self, name, array):
+        for field in array.dtype.names:
+            column = array[field]
+
+            try:
+                writer = self._columns[(name, field)]
+            except KeyError:
+                path = os.path.join(self.directory, name)
+                if not os.path.isdir(path):
+                    os.makedirs(path)
+
+                writer = self._columns[(name, field)] = ColumnWriter(
+                    os.path.join(path, field + '.npy'),
+                    column.dtype.newbyteorder('='), column.shape[1:])
+
+            writer.append(column)
+
+    def flush(self):
+        """Write all packets added so far."""
+
+        decoder = self._decoder
+
+        for ((key, length), buf) in decoder._fixed.items():
+            self._write(self._name(key, length), _fixed_array(key, length, buf))
+
+        for (key, payloads) in decoder._variable.items():
+            self._write(self._name(key), _variable_array(key, payloads, VARIABLE_SIZE))
+
+        decoder.clear()
+        self.packets_written += self._pending
+        self._pending = 0
+
+    def close(self):
+        """Write all pending packets and close the column files."""
+
+        self.flush()
+        for writer in self._columns.values():
+            writer.close()
+        self._columns.clear()
+
+
+def export_payloads(payloads, directory, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Export payloads into columns, see `Exporter`.
+
+    :param payloads: TSIP packets without framing and byte stuffing.
+    :param directory: Directory receiving the column sets.
+    :param batch_size: Number of packets decoded and written at once.
+    :return: Number of packets written.
+
+    """
+
+    with Exporter(directory, batch_size) as exporter:
+        exporter.extend(payloads)
+    return exporter.packets_written
+
+
+def export_capture(path, directory, subscribe=None, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Export a capture file into columns, see `Exporter`.
+
+    :param path: Name of the capture file.
+    :param directory: Directory receiving the column sets.
+    :param subscribe: Export only these packets, see `tsip.Subscription`.
+    :param batch_size: Number of packets decoded and written at once.
+    :return: Number of packets written.
+
+    """
+
+    from tsip.capture import Capture
+
+    with Capture(path, subscribe) as capture:
+        return export_payloads(capture.payloads(), directory, batch_size)
+
+
+def load_columns(directory, mmap_mode='r'):
+    """
+    Load the columns written by `Exporter`.
+
+    :param directory: Directory holding the column sets.
+    :param mmap_mode: See ``numpy.load()``. ``None`` reads the columns
+        into memory.
+    :return: Dictionary mapping packet codes/subcodes (see
+        `parse_column_set_name()`) to dictionaries mapping field names
+        to arrays.
+
+    """
+
+    _require_numpy()
+
+    result = {}
+
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if not os.path.isdir(path):
+            continue
+
+        columns = {}
+        for filename in sorted(os.listdir(path)):
+            if filename.endswith('.npy'):
+                columns[filename[:-4]] = numpy.load(os.path.join(path, filename), mmap_mode=mmap_mode)
+
+        result[parse_column_set_name(name)] = columns
+
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m tsip.export',
+                                     description='Export a TSIP capture file into .npy columns.')
+    parser.add_argument('capture', help='capture file')
+    parser.add_argument('directory', help='output directory')
+    parser.add_argument('-b', '--batch-size', type=int, default=EXPORT_BATCH_SIZE,
+                        help='packets decoded and written at once (default: %(default)s)')
+    parser.add_argument('-s', '--subscribe', action='append', type=lambda s: int(s, 16),
+                        help='export only this packet code or code/subcode, e.g. 8fac (repeatable)')
+    args = parser.parse_args(argv)
+
+    count = export_capture(args.capture, args.directory, args.subscribe, args.batch_size)
+    sys.stdout.write('%d packets exported to %s\n' % (count, args.directory))
+
+
+if __name__ == '__main__':
+    main()
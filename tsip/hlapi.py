@@ -5,11 +5,11 @@ High-level API.
 """
 
 import struct
-import binascii
 
 from tsip.config import *
 from tsip.llapi import *
 from tsip.structs import *
+from tsip import profiling
 
 
 class PackError(Exception):
@@ -20,6 +20,47 @@ class PackError(Exception):
         return 'unable to pack packet %s' % (self.packet)
 
 
+def _unpack_fields(rawpacket):
+    """
+    Decode the fields of a packet, see `Packet.unpack()`.
+
+    :return: ``(key, fields)``. `key` is the code or code/subcode of the
+        packet (see `get_key_for_rawpacket()`), ``None`` if the packet
+        could not be decoded and `fields` is the 0xFF pseudo-packet.
+
+    """
+
+    key = get_key_for_rawpacket(rawpacket)
+
+    # Fixed-size structure matching the length of `rawpacket`.
+    #
+    struct_ = UNPACK_INDEX.get((key, len(rawpacket)))
+    if struct_ is not None:
+        return (key, struct_.unpack(rawpacket))
+
+    # The structures of a packet are created when first needed.
+    #
+    if load_structures(key):
+        return _unpack_fields(rawpacket)
+
+    # Structures of variable length.
+    #
+    for struct_ in VARIABLE_STRUCTURES.get(key, ()):
+        try:
+            return (key, struct_.unpack(rawpacket))
+        except struct.error:
+            # Try next one.
+            pass
+
+    # Packet ID 0xff is a pseudo-packet representing
+    # packets unknown to `python-TSIP` in their raw format.
+    #
+    if isinstance(rawpacket, memoryview):
+        rawpacket = rawpacket.tobytes()
+
+    return (None, (0xff, rawpacket))
+
+
 class Packet(object):
     """
     TSIP packet.
@@ -39,8 +80,7 @@ class Packet(object):
 
     """
 
-    _fields = []
-    """The data fields of the packet."""
+    __slots__ = {'_fields': 'The data fields of the packet.'}
 
 
     def __init__(self, *fields):
@@ -53,10 +93,13 @@ class Packet(object):
         # Packet((1,2,3)) -> ((1,2,3)) -> self.fields = fields[0]
         # Packet([1,2,3]) -> [(1,2,3)] -> self.fields = fields[0]
         #
-        try:
-            fields[0][0]             # Passed list or tuple to `Packet()`?
+        # Any sequence is accepted, e.g. another `Packet` or a NumPy array.
+        # NumPy scalars support indexing but have no length.
+        #
+        if fields and not isinstance(fields[0], (int, float)) and hasattr(fields[0], '__len__') \
+                and hasattr(fields[0], '__getitem__'):
             self.fields = fields[0]
-        except TypeError:
+        else:
             self.fields = fields
 
     # Packets are equal if their fields are equal
@@ -98,26 +141,16 @@ class Packet(object):
 
         """
 
-        # Possible structs for packet ID.
+        # Possible structs for these fields.
         #
         try:
-            structs_ = get_structs_for_fields([self.fields[0]])
-        except (TypeError):
-            # TypeError, if self.fields[0] is a wrong argument to `chr()`.
+            structs_ = get_structs_for_fields(self.fields)
+        except (IndexError, TypeError):
+            # IndexError, if no self.fields[1]
+            # TypeError, if self.fields[0] or self.fields[1] are not integers.
             raise PackError(self)
 
 
-        # Possible structs for packet ID + subcode
-        #
-        if structs_ == []:
-            try:
-                structs_ = get_structs_for_fields([self.fields[0], self.fields[1]])
-            except (IndexError, TypeError):
-                # IndexError, if no self.fields[1]
-                # TypeError, if self.fields[1] is a wrong argument to `chr()`.
-                raise PackError(self)
-
-
         # Try to pack the packet with any of the possible structs.
         #
         for struct_ in structs_:
@@ -139,39 +172,403 @@ class Packet(object):
            :param rawpacket: TSIP pkt in binary format.
            :type rawpacket: String.
 
+           `rawpacket` must already have framing (DLE...DLE/ETX) removed and
+           byte stuffing reversed. It may also be a ``memoryview``, the
+           returned packet does not keep a reference to it.
+
+        """
+
+        return cls(*_unpack_fields(rawpacket)[1])
+
+
+    def __repr__(self):
+        return 'Packet%s' % (str(tuple(self.fields)))
+
+
+class LazyPacket(Packet):
+    """
+    TSIP packet decoded on demand.
+
+    A `LazyPacket` only keeps a reference to the binary packet. Accessing
+    a single field by index decodes just that field if the packet has a
+    fixed structure. Everything else (`fields`, iteration, comparison,
+    `repr()`, ...) decodes the whole packet once and caches the result.
+    Apart from that `LazyPacket` instances behave like `Packet` instances.
+
+    Use `LazyPacket.unpack()` to create instances.
+
+    """
+
+    __slots__ = {'_raw': 'The binary packet.'}
+
+    # Offsets and `struct.Struct()` instances of the fields of fixed-size
+    # packets (``None`` for all others), created on demand. Keys are the
+    # first two bytes and length of the binary packet which is enough to
+    # determine its structure.
+    #
+    _layouts = {}
+
+
+    def __init__(self, rawpacket):
+        self._raw = rawpacket
+        self._fields = None
+
+    @classmethod
+    def unpack(cls, rawpacket):
+        """Instantiate `LazyPacket` from binary string.
+
+           :param rawpacket: TSIP pkt in binary format.
+           :type rawpacket: Binary string or ``memoryview``.
+
            `rawpacket` must already have framing (DLE...DLE/ETX) removed and
            byte stuffing reversed.
 
         """
 
-        structs_ = get_structs_for_rawpacket(rawpacket)
+        if isinstance(rawpacket, memoryview):
+            rawpacket = rawpacket.tobytes()
+
+        return cls(rawpacket)
+
+    def pack(self):
+        # Re-use the binary packet unless the fields have been decoded
+        # (and possibly modified).
+        #
+        if self._fields is None:
+            return self._raw
+        else:
+            return super(LazyPacket, self).pack()
+
+    def _get_fields(self):
+        fields = self._fields
+
+        if fields is None:
+            fields = self._fields = Packet.unpack(self._raw)._fields
+
+        return fields
+
+    fields = property(_get_fields, Packet._set_fields)
+
+    def __getitem__(self, index):
+        if self._fields is None and isinstance(index, int):
+            raw = self._raw
 
-        for struct_ in structs_:
             try:
-                return cls(*struct_.unpack(rawpacket))
-            except struct.error:
-                # Try next one.
-                pass
+                layout = self._layouts[(raw[:2], len(raw))]
+            except KeyError:
+                layout = self._layout(raw)
+
+            if layout is not None:
+                (offset, struct_) = layout[index]
+                return struct_.unpack_from(raw, offset)[0]
+
+        return self.fields[index]
+
+    @classmethod
+    def _layout(cls, raw):
+        key = get_key_for_rawpacket(raw)
+        load_structures(key)
+        struct_ = UNPACK_INDEX.get((key, len(raw)))
+
+        if struct_ is None:
+            layout = None
+        else:
+            layout = [(offset, struct.Struct(fmt)) for (offset, fmt) in parse_format(struct_.format)]
+
+        cls._layouts[(raw[:2], len(raw))] = layout
+        return layout
+
+
+INDEX_CACHES.append(LazyPacket._layouts)
+
+
+class Command(object):
+    """
+    Command packet compiled once for sending many times.
+
+    Fields given as ``None`` are parameters whose values are passed to
+    `frame()`. All other fields are constant. The bytes of constant
+    fields are packed, byte-stuffed and framed when the `Command` is
+    created, so a command without parameters is sent as a cached binary
+    string and a command with parameters only packs and stuffs the
+    values of its parameters.
+
+    Examples::
+
+      >>> poll = Command(0x8e, 0xab, 0)               # Request timing packet.
+      >>> gps.write(poll)
+      >>> set_dac = Command(0x8e, 0xa0, 0, None)      # Set DAC voltage.
+      >>> gps.write(set_dac, 1.25)
+
+    :raise: `PackError` if the fields cannot be packed, ``ValueError`` if
+        the code or subcode are parameters.
 
-        # Packet ID 0xff is a pseudo-packet representing
-        # packets unknown to `python-TSIP` in their raw format.
+    """
+
+    def __init__(self, *fields):
+        if fields and isinstance(fields[0], (list, tuple)):
+            fields = fields[0]
+
+        self.fields = list(fields)
+        self.parameters = [i for (i, field) in enumerate(self.fields) if field is None]
+
+        # The second field is the subcode unless the code has no subcodes.
+        if 0 in self.parameters or (1 in self.parameters and self.fields[0] not in PACKET_STRUCTURES):
+            raise ValueError('the code and subcode of a command must be constant')
+
+        self.data = None
+        self._segments = None
+
+        fmt = self._format()
+        if fmt is None:
+            # The structure of this packet is not known in advance, so
+            # the whole packet is packed by `Packet.pack()` every time.
+            return
+
+        # Pack the constant fields with dummy values for the parameters
+        # and split the result into constant and parameter segments.
         #
-        return cls(0xff, rawpacket)
+        layout = parse_format(fmt)
+        dummies = [b'' if fmt_[-1] in 'sp' else 0 for (offset, fmt_) in layout]
+        raw = self._pack([dummies[i] if field is None else field
+                          for (i, field) in enumerate(self.fields)])
+
+        segments = []
+        end = 0
+        for i in self.parameters:
+            (offset, fmt_) = layout[i]
+            if segments and offset == end:
+                segments[-1].append(fmt_[1:])
+            else:
+                segments.append(raw[end:offset])
+                segments.append([fmt_])
+            end = offset + struct.calcsize(fmt_)
+        segments.append(raw[end:])
+
+        # Byte stuffing doesn't depend on neighbouring bytes so each
+        # segment can be stuffed on its own.
+        #
+        for (i, segment) in enumerate(segments):
+            if isinstance(segment, list):
+                segments[i] = (struct.Struct(''.join(segment)), len(segment))
+            else:
+                segments[i] = segment.replace(bDLE, bDLE + bDLE)
+
+        segments[0] = bDLE + segments[0]
+        segments[-1] = segments[-1] + bDLE + bETX
+
+        if len(segments) == 1:
+            self.data = segments[0]
+        else:
+            self._segments = segments
+
+    def _format(self):
+        try:
+            structs_ = get_structs_for_fields(self.fields)
+        except (IndexError, TypeError):
+            raise PackError(Packet(self.fields))
+
+        for struct_ in structs_:
+            if isinstance(struct_, struct.Struct):
+                return struct_.format
+            elif hasattr(struct_, 'format_for_fields'):
+                try:
+                    return struct_.format_for_fields(self.fields)
+                except (IndexError, ValueError):
+                    pass
+
+        return None
+
+    def _pack(self, fields):
+        try:
+            return Packet(fields).pack()
+        except struct.error:
+            raise PackError(Packet(fields))
+
+    def frame(self, *values):
+        """
+        Return the command ready to be sent to the GPS.
 
+        :param values: Values of the parameters, in order.
+        :return: Packet with byte stuffing and framing applied.
+        :rtype: Binary string.
+        :raise: ``TypeError`` if the number of values does not match the
+            number of parameters, `PackError` if the values cannot be
+            packed.
+
+        """
+
+        if self.data is not None and not values:
+            return self.data
+
+        if len(values) != len(self.parameters):
+            raise TypeError('command takes %d parameters (%d given)' % (len(self.parameters), len(values)))
+
+        if self._segments is None:
+            fields = list(self.fields)
+            for (i, value) in zip(self.parameters, values):
+                fields[i] = value
+            return frame(stuff(self._pack(fields)))
+
+        data = []
+        i = 0
+        try:
+            for segment in self._segments:
+                if isinstance(segment, bytes):
+                    data.append(segment)
+                else:
+                    (struct_, count) = segment
+                    data.append(struct_.pack(*values[i:i + count]).replace(bDLE, bDLE + bDLE))
+                    i += count
+        except struct.error:
+            raise PackError(Packet(self.fields))
+
+        return b''.join(data)
+
+    def packet(self, *values):
+        """Return the command with the given parameters as `Packet`."""
+
+        return Packet.unpack(unframe_unstuff(self.frame(*values)))
 
     def __repr__(self):
-        return 'Packet%s' % (str(tuple(self.fields)))
+        return 'Command%s' % (str(tuple(self.fields)))
+
+
+def frame_packet(packet, *values):
+    """
+    Return a packet ready to be sent to the GPS.
+
+    :param packet: Packet to send.
+    :type packet: `Packet` or `Command` instance.
+    :param values: Values of the parameters of a `Command`.
+    :return: Packet with byte stuffing and framing applied.
+    :rtype: Binary string.
+
+    """
+
+    if isinstance(packet, Command):
+        return packet.frame(*values)
+    else:
+        return frame(stuff(packet.pack()))
+
+
+def decode_profiled(profiler, unpack, packet):
+    """
+    Decode a packet and record the time spent on each stage.
+
+    :param profiler: `tsip.profiling.Profiler` instance.
+    :param unpack: ``unpack()`` method of the packet class.
+    :param packet: TSIP packet with framing and byte stuffing applied.
+    :return: Decoded packet.
+
+    """
+
+    perf_counter_ns = profiling.perf_counter_ns
+
+    t0 = perf_counter_ns()
+    rawpacket = unframe_unstuff(packet)
+    t1 = perf_counter_ns()
+    decoded = unpack(rawpacket)
+    t2 = perf_counter_ns()
+
+    key = get_key_for_rawpacket(rawpacket) if rawpacket else None
+    profiler.record(profiling.STAGE_UNSTUFF, t1 - t0, key)
+    profiler.record(profiling.STAGE_UNPACK, t2 - t1, key)
+    return decoded
+
+
+class PacketDecoder(FrameDecoder):
+    """
+    Incremental TSIP packet decoder.
+
+    Like `FrameDecoder` but `feed()` returns `Packet` instances.
+
+    :param packet_class: `Packet`, `LazyPacket` or `tsip.records.Record`.
+    :param subscribe: Decode only these packets, see `FrameDecoder`.
+    :param stats: See `FrameDecoder`. Packets which cannot be decoded are
+        counted as well.
+
+    Examples::
+
+      >>> decoder = PacketDecoder()
+      >>> decoder.feed(b'\\x10\\x8f\\xab\\x10')
+      []
+      >>> decoder.feed(b'\\x10\\x01\\x10\\x03')
+      [Packet(255, b'\\x8f\\xab\\x10\\x01')]
+
+    """
+
+    def __init__(self, packet_class=Packet, subscribe=None, stats=None):
+        super(PacketDecoder, self).__init__(subscribe, stats)
+        self.packet_class = packet_class
+
+    def feed(self, data):
+        """
+        Add `data` to the decoder and return all packets completed by it.
+
+        :param data: Data received from a GPS.
+        :type data: Binary string.
+        :returns: Decoded packets. May be an empty list.
+        :rtype: List of `Packet` instances.
+
+        """
+
+        unpack = self.packet_class.unpack
+        frames = super(PacketDecoder, self).feed(data)
+
+        if profiling.profiler is None:
+            packets = [unpack(unframe_unstuff(frame)) for frame in frames]
+        else:
+            packets = [decode_profiled(profiling.profiler, unpack, frame) for frame in frames]
+
+        if self.stats is not None:
+            for packet in packets:
+                self.stats.decoded(packet)
+
+        return packets
 
 
 class GPS(gps):
+    """
+    Read and write `Packet` instances from and to `conn`.
 
-    def __init__(self, conn):
-        super(GPS, self).__init__(conn)
+    :param conn: File-like object, socket or serial port.
+    :param chunksize: See `gps`.
+    :param packet_class: `Packet`, `LazyPacket` or `tsip.records.Record`.
+    :param subscribe: See `gps`. Other packets are neither unstuffed nor
+        decoded.
+    :param stats: See `gps`. Packets which cannot be decoded are counted
+        as well.
+
+    """
+
+    def __init__(self, conn, chunksize=None, packet_class=Packet, subscribe=None, stats=None):
+        super(GPS, self).__init__(conn, chunksize=chunksize, subscribe=subscribe, stats=stats)
+        self.packet_class = packet_class
 
 
     def read(self):
         pkt = super(GPS, self).read()
-        return Packet.unpack(unstuff(unframe(pkt)))
 
-    def write(self, packet):
-        super(GPS, self).write(frame(stuff(packet.pack())))
+        if pkt is None:
+            return None
+
+        if profiling.profiler is None:
+            packet = self.packet_class.unpack(unframe_unstuff(pkt))
+        else:
+            packet = decode_profiled(profiling.profiler, self.packet_class.unpack, pkt)
+
+        if self.decoder.stats is not None:
+            self.decoder.stats.decoded(packet)
+        return packet
+
+    def write(self, packet, *values):
+        """
+
+           :param packet: Packet to send.
+           :type packet: `Packet` or `Command` instance.
+           :param values: Values of the parameters of a `Command`.
+
+        """
+
+        super(GPS, self).write(frame_packet(packet, *values))
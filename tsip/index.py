@@ -0,0 +1,348 @@
+# -*- coding: utf-8 -*-
+"""
+Capture file index.
+
+`CaptureIndex` records the offset, length, packet code/subcode and GPS
+time of every packet in a capture file (see `tsip.capture`) in a
+sidecar file next to it. Packets of certain types or within a range of
+GPS time can then be read without scanning the whole capture file.
+
+The GPS time of a packet is taken from the last packet carrying the
+time (see `TIME_SOURCES`) at or before it, i.e. 0x41 or 0x8F-AB. Packets
+received before the first of these have no time.
+
+When the capture file grows, e.g. while still being recorded, only
+the new data is scanned and appended to the index.
+
+Example::
+
+  >>> index = CaptureIndex('thunderbolt.tsip')
+  >>> start = gps_seconds(1849, 520352)
+  >>> for packet in index.packets([0x8fac], start, start + 60):
+  ...     print(packet)
+
+"""
+
+import array
+import bisect
+import math
+import os
+import struct
+
+from tsip.config import *
+from tsip.structs import *
+from tsip.llapi import *
+from tsip.hlapi import *
+from tsip.capture import Capture
+
+
+INDEX_SUFFIX = '.idx'
+"""Suffix appended to the name of the capture file to name its index."""
+
+INDEX_MAGIC = b'TSIPIDX1'
+
+INDEX_HEADER = struct.Struct('<8sQQd')
+"""Magic, number of records, offset up to which the capture was indexed
+and GPS time of the last packet indexed."""
+
+INDEX_RECORD = struct.Struct('<QIHd')
+"""Offset, length, code/subcode and GPS time of a packet."""
+
+INDEX_BATCH_SIZE = 65536
+"""Number of records written to the index at once."""
+
+
+def gps_seconds(week, tow):
+    """
+    Convert a GPS week number and time of week to seconds.
+
+    :param week: GPS week number (not truncated to 10 bits).
+    :param tow: GPS time of week in seconds.
+    :return: Seconds since the start of GPS time.
+
+    """
+
+    return week * SECONDS_PER_WEEK + tow
+
+
+def _time_0x41(rawpacket):
+    if len(rawpacket) != 11:
+        return None
+
+    (tow, week) = struct.unpack_from('>fh', rawpacket, 1)
+
+    # The time of week is negative until the receiver knows the time.
+    if tow < 0:
+        return None
+    return gps_seconds(week, tow)
+
+
+def _time_0x8fab(rawpacket):
+    if len(rawpacket) != 18:
+        return None
+
+    (tow, week) = struct.unpack_from('>IH', rawpacket, 2)
+    return gps_seconds(week, tow)
+
+
+TIME_SOURCES = {
+    0x41: _time_0x41,
+    0x8fab: _time_0x8fab,
+}
+"""Functions returning the GPS time in seconds (or ``None``) from a packet
+without framing and byte stuffing, by code/subcode."""
+
+
+def _is_sorted(times):
+    last = -math.inf
+    for t in times:
+        if t < last:
+            return False
+        last = t
+    return True
+
+
+class CaptureIndex(object):
+    """
+    Index of a capture file.
+
+    The index is read from its sidecar file and updated with any data
+    appended to the capture file since it was last written. It is
+    (re)built if the sidecar file does not exist, is invalid or the
+    capture file got shorter.
+
+    :param path: Name of the capture file.
+    :param index_path: Name of the sidecar file. Defaults to `path`
+        followed by `INDEX_SUFFIX`.
+
+    The records are held in the following ``array.array`` attributes:
+
+    * ``offsets`` -- offset of the leading DLE of each packet.
+    * ``lengths`` -- length of each packet including framing and byte
+      stuffing.
+    * ``keys`` -- code or code/subcode of each packet (see
+      `get_key_for_rawpacket()`).
+    * ``times`` -- GPS time of each packet in seconds, NaN if unknown.
+
+    """
+
+    def __init__(self, path, index_path=None):
+        self.path = path
+        self.index_path = index_path if index_path is not None else path + INDEX_SUFFIX
+
+        self._clear()
+        self._load()
+        self.update()
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def _clear(self):
+        self.offsets = array.array('Q')
+        self.lengths = array.array('I')
+        self.keys = array.array('H')
+        self.times = array.array('d')
+        self.indexed = 0
+        self.time = math.nan
+        self._timed = 0         # records before this have no time
+        self._sorted = True
+
+    def _load(self):
+        try:
+            with open(self.index_path, 'rb') as f:
+                data = f.read()
+        except (IOError, OSError):
+            return
+
+        if len(data) < INDEX_HEADER.size:
+            return
+
+        (magic, count, indexed, time_) = INDEX_HEADER.unpack_from(data)
+        size = INDEX_HEADER.size + count * INDEX_RECORD.size
+
+        if magic != INDEX_MAGIC or len(data) < size:
+            return
+
+        # Records written after the header was last updated are ignored,
+        # they will be indexed again.
+        #
+        self._append(data[INDEX_HEADER.size:size])
+        self.indexed = indexed
+        self.time = time_
+
+    def _append(self, records):
+        if not records:
+            return
+
+        (offsets, lengths, keys, times) = zip(*INDEX_RECORD.iter_unpack(records))
+
+        if len(self.times) == self._timed:
+            nans = 0
+            for t in times:
+                if not math.isnan(t):
+                    break
+                nans += 1
+            self._timed += nans
+            timed = times[nans:]
+        else:
+            timed = times
+
+        if self._sorted and timed:
+            if len(self.times) > self._timed and timed[0] < self.times[-1]:
+                self._sorted = False
+            else:
+                self._sorted = _is_sorted(timed)
+
+        self.offsets.extend(offsets)
+        self.lengths.extend(lengths)
+        self.keys.extend(keys)
+        self.times.extend(times)
+
+    def update(self):
+        """
+        Index the data appended to the capture file since the last update
+        and write the new records to the sidecar file.
+
+        :return: Number of packets added to the index.
+
+        """
+
+        if not os.path.exists(self.index_path) or os.path.getsize(self.path) < self.indexed:
+            self._clear()
+
+        count = len(self)
+        mode = 'r+b' if os.path.exists(self.index_path) else 'w+b'
+
+        with Capture(self.path) as capture, open(self.index_path, mode) as f:
+            buf = capture._mmap
+            f.seek(INDEX_HEADER.size + count * INDEX_RECORD.size)
+            f.truncate()
+
+            pos = indexed = self.indexed
+            time_ = self.time
+            records = bytearray()
+            pack = INDEX_RECORD.pack
+            sources = TIME_SOURCES
+
+            while True:
+                (start, stop, pos) = find_frame(buf, pos)
+
+                if stop is None or len(records) >= INDEX_BATCH_SIZE * INDEX_RECORD.size:
+                    f.write(records)
+                    self._append(records)
+                    records = bytearray()
+
+                if stop is None:
+                    break
+
+                code = buf[start + 1]
+                if code in PACKET_STRUCTURES or stop - start < 5:
+                    key = code
+                else:
+                    key = code << 8 | buf[start + 2]
+
+                source = sources.get(key)
+                if source is not None:
+                    t = source(unframe_unstuff(buf, start, stop))
+                    if t is not None:
+                        time_ = t
+
+                records += pack(start, stop - start, key, time_)
+
+                # A partial packet at the end of the file is indexed
+                # once it is complete.
+                indexed = stop
+
+            self.indexed = indexed
+            self.time = time_
+            f.seek(0)
+            f.write(INDEX_HEADER.pack(INDEX_MAGIC, len(self), self.indexed, self.time))
+
+        return len(self) - count
+
+    def select(self, keys=None, start=None, end=None):
+        """
+        Return the positions of records matching all conditions.
+
+        :param keys: Only these packets, see `Subscription`.
+        :type keys: Iterable of packet codes or code/subcodes.
+        :param start: Only packets with a GPS time (in seconds, see
+            `gps_seconds()`) of at least `start`.
+        :param end: Only packets with a GPS time before `end`.
+        :return: Positions into ``offsets``, ``keys`` etc. in ascending
+            order.
+        :rtype: ``range`` or list.
+
+        """
+
+        times = self.times
+        lo = 0
+        hi = len(times)
+
+        if start is not None or end is not None:
+            if self._sorted:
+                lo = self._timed
+                if start is not None:
+                    lo = bisect.bisect_left(times, start, lo, hi)
+                if end is not None:
+                    hi = bisect.bisect_left(times, end, lo, hi)
+                positions = range(lo, hi)
+            else:
+                start = -math.inf if start is None else start
+                end = math.inf if end is None else end
+                positions = [i for i in range(self._timed, hi) if start <= times[i] < end]
+        else:
+            positions = range(lo, hi)
+
+        if keys is not None:
+            match = Subscription(keys)
+            wanted = set(key for key in set(self.keys)
+                         if key in match.subcodes or (key if key <= 0xff else key >> 8) in match.codes)
+            all_keys = self.keys
+            positions = [i for i in positions if all_keys[i] in wanted]
+
+        return positions
+
+    def records(self, keys=None, start=None, end=None):
+        """
+        Return the records matching all conditions, see `select()`.
+
+        :return: List of tuples ``(offset, length, key, time)``.
+
+        """
+
+        return [(self.offsets[i], self.lengths[i], self.keys[i], self.times[i])
+                for i in self.select(keys, start, end)]
+
+    def payloads(self, keys=None, start=None, end=None):
+        """
+        Read the payloads of the packets matching all conditions from the
+        capture file, see `select()`.
+
+        :returns: Generator of packets without framing and byte stuffing.
+        :rtype: ``bytes``.
+
+        """
+
+        offsets = self.offsets
+        lengths = self.lengths
+
+        with Capture(self.path) as capture:
+            buf = capture._mmap
+            for i in self.select(keys, start, end):
+                offset = offsets[i]
+                yield unframe_unstuff(buf, offset, offset + lengths[i])
+
+    def packets(self, keys=None, start=None, end=None, packet_class=Packet):
+        """
+        Read the packets matching all conditions from the capture file,
+        see `select()`.
+
+        :param packet_class: `Packet`, `LazyPacket` or `tsip.records.Record`.
+        :returns: Generator of `packet_class` instances.
+
+        """
+
+        unpack = packet_class.unpack
+        for payload in self.payloads(keys, start, end):
+            yield unpack(payload)
@@ -4,7 +4,17 @@ Low-level API.
 
 """
 
+import collections
+
 from tsip.config import *
+from tsip import profiling
+
+
+READ_CHUNK_SIZE = 4096
+"""Default maximum number of bytes requested from `conn` per read in chunked mode."""
+
+bDLE2 = bDLE + bDLE
+"""Stuffed DLE."""
 
 
 def is_framed(packet):
@@ -54,7 +64,7 @@ def unframe(packet):
     """
 
     if is_framed(packet):
-        return packet.lstrip(bDLE).rstrip(bETX).rstrip(bDLE)
+        return packet[1:-2]
     else:
         raise ValueError('packet does not contain leading DLE and trailing DLE/ETX')
 
@@ -93,48 +103,466 @@ def unstuff(packet):
         return packet.replace(bDLE + bDLE, bDLE)
 
 
+def unframe_unstuff(buf, start=0, stop=None):
+    """
+    Remove framing and byte stuffing from a TSIP packet in a single pass.
+
+    Equivalent to ``unstuff(unframe(buf[start:stop]))`` but the framing is
+    checked only once and the packet is copied once, or twice if it
+    contains stuffed DLEs, whatever the type of `buf`. Like `unstuff()` this does not check whether
+    all DLEs are stuffed, which is always the case for packets located by
+    `find_frame()`.
+
+    :param buf: Data containing the packet, e.g. a packet returned by
+        `gps.read()` or a buffer searched with `find_frame()`.
+    :type buf: ``bytes``, ``bytearray`` or ``mmap.mmap``.
+    :param start: Offset of the leading DLE.
+    :param stop: Offset following the trailing DLE/ETX. Defaults to
+        ``len(buf)``.
+    :return: TSIP packet without framing and byte stuffing.
+    :rtype: Binary string.
+    :raise: ``ValueError`` if the packet does not start with DLE and end
+        in DLE/ETX.
+
+    """
+
+    if stop is None:
+        stop = len(buf)
+    end = stop - 2
+
+    if end <= start or buf[start] != DLE or buf[end] != DLE or buf[stop - 1] != ETX:
+        raise ValueError('packet does not contain leading DLE and trailing DLE/ETX')
+
+    # `bytes.replace()` returns the object itself if there is nothing to
+    # replace, so packets without stuffed DLE are only copied once. Other
+    # buffers are copied into a binary string through a memoryview first,
+    # as slicing a bytearray and calling its `replace()` would both copy.
+    #
+    if isinstance(buf, bytes):
+        packet = buf[start + 1:end]
+    else:
+        with memoryview(buf) as view:
+            packet = bytes(view[start + 1:end])
+
+    return packet.replace(bDLE2, bDLE)
+
+
+def chunk_reader(conn):
+    """
+    Return a function reading whatever data is available from `conn`.
+
+    The returned function takes a single `size` argument and returns at most
+    `size` bytes without waiting for more data than is already available,
+    if `conn` allows this.
+
+    * pySerial ports: at least one byte is read (subject to the port's
+      timeout) plus anything else waiting in the input buffer.
+    * Buffered files, e.g. ``open(..., 'rb')`` or ``socket.makefile('rb')``:
+      ``read1()`` is used.
+    * Sockets: ``recv()`` is used. A socket timeout is reported as an
+      empty read.
+    * Anything else: ``read(size)`` is used.
+
+    :param conn: File-like object, socket or serial port.
+    :return: Function ``read(size)`` returning binary strings. An empty
+        binary string signals a timeout or end-of-file.
+
+    """
+
+    if hasattr(conn, 'in_waiting'):
+        def read(size):
+            return conn.read(max(1, min(conn.in_waiting, size)))
+    elif hasattr(conn, 'read1'):
+        read = conn.read1
+    elif hasattr(conn, 'recv'):
+        # `socket` is only imported here; it has been imported already by
+        # whoever created `conn`.
+        import socket
+
+        def read(size):
+            try:
+                return conn.recv(size)
+            except socket.timeout:
+                return b''
+    else:
+        read = conn.read
+
+    return read
+
+
+def find_frame(buf, pos=0, start=-1, end=None):
+    """
+    Locate the next complete packet in `buf`.
+
+    Instead of looking at every byte this searches for DLE and only
+    inspects the byte following it. DLE/DLE pairs are skipped as a whole so
+    stuffed DLEs are never mistaken for the start or end of a packet. Data
+    before the first DLE/<not DLE, not ETX> start pattern (i.e. a partial
+    packet when starting to read mid-message) is skipped.
+
+    :param buf: Data received from a GPS.
+    :type buf: ``bytes``, ``bytearray``, ``mmap.mmap`` or similar.
+    :param pos: Offset at which to start searching.
+    :param start: Offset of the start of a packet found by a previous call
+        which returned an incomplete packet, -1 otherwise.
+    :param end: Offset at which to stop searching. Defaults to ``len(buf)``.
+    :returns: Tuple ``(start, stop, pos)``. If a complete packet was found
+        it is ``buf[start:stop]`` (framing and byte stuffing still applied)
+        and ``pos == stop``. Otherwise `stop` is ``None``, `start` is the
+        offset of the incomplete packet at the end of `buf` (or -1) and
+        `pos` is the offset at which to continue searching once more
+        data is available.
+
+    """
+
+    if end is None:
+        end = len(buf)
+
+    find = buf.find
+
+    while True:
+        i = find(bDLE, pos, end)
+
+        if i < 0:
+            return (start, None, end)
+        elif i + 1 == end:
+            return (start, None, i)     # need the byte following DLE
+
+        c = buf[i + 1]
+        pos = i + 2
+
+        if c == DLE:
+            # Stuffed DLE, or pair of DLEs in a partial packet.
+            pass
+        elif c == ETX:
+            if start >= 0:
+                return (start, pos, pos)
+            # else found end of partial message, ignore
+        else:
+            # Start of packet. If already inside a packet, that
+            # packet was truncated and is discarded.
+            start = i
+
+
+class Subscription(object):
+    """
+    Set of packets an application is interested in.
+
+    Packets are matched on the first bytes of the framed packet, i.e.
+    before byte stuffing is reversed or the packet is decoded.
+
+    :param keys: Packet codes (e.g. ``0x41``), matching all packets with
+        this code, and/or code/subcodes (e.g. ``0x8fab``), matching only
+        packets with this subcode.
+    :type keys: Iterable of integers.
+
+    Examples::
+
+      >>> subscription = Subscription([0x46, 0x8fab, 0x8fac])
+      >>> subscription.match(b'\x10\x8f\xab...\x10\x03')
+      True
+
+    """
+
+    def __init__(self, keys):
+        keys = set(keys)
+        self.codes = frozenset([key for key in keys if key <= 0xff])
+        self.subcodes = frozenset([key for key in keys if key > 0xff])
+
+    def match(self, buf, start=0):
+        """
+        Return whether the packet starting at `buf[start]` is subscribed.
+
+        :param buf: Data containing the packet.
+        :param start: Offset of the leading DLE of the packet.
+
+        """
+
+        code = buf[start + 1]
+
+        # If the subcode is a stuffed DLE, `buf[start + 2]` is its first
+        # DLE, which is the subcode anyway.
+        #
+        return code in self.codes or (code << 8 | buf[start + 2]) in self.subcodes
+
+
+class FrameDecoder(object):
+    """
+    Incremental TSIP frame decoder.
+
+    The decoder does not perform any I/O. Data is passed to `feed()` in
+    arbitrarily sized chunks, split anywhere, and complete packets are
+    returned as soon as their trailing DLE/ETX has been seen.
+
+    Packets are located by `find_frame()`. Data that cannot be part of a
+    packet is discarded.
+
+    :param subscribe: Return only these packets, see `Subscription`. Other
+        packets are dropped without copying them and counted in
+        ``packets_skipped``.
+    :type subscribe: Iterable of packet codes or code/subcodes.
+    :param stats: Count packets and discarded data in this
+        `tsip.stats.Statistics` instance. May also be set later through
+        the ``stats`` attribute.
+
+    Examples::
+
+      >>> decoder = FrameDecoder()
+      >>> decoder.feed(b'\\x10\\x8f\\xab\\x10')
+      []
+      >>> decoder.feed(b'\\x10\\x01\\x10\\x03')
+      [b'\\x10\\x8f\\xab\\x10\\x10\\x01\\x10\\x03']
+
+    """
+
+    def __init__(self, subscribe=None, stats=None):
+        if subscribe is None:
+            self.subscription = None
+        else:
+            self.subscription = Subscription(subscribe)
+        self.stats = stats
+        self.packets_skipped = 0
+        self.reset()
+
+    def reset(self):
+        """Discard any buffered data."""
+
+        # Receive buffer, the position from which to continue searching
+        # for DLE and the offset of the start of the current packet within
+        # the buffer (-1 if outside of a packet).
+        #
+        self._buffer = bytearray()
+        self._scan = 0
+        self._start = -1
+
+        # Whether data was discarded since the last complete packet, so
+        # that a gap split across several calls counts as one resync.
+        #
+        self._discarding = False
+
+    def _discard(self, size):
+        if size > 0:
+            self.stats.discarded(size, resync=not self._discarding)
+            self._discarding = True
+
+    def feed(self, data):
+        """
+        Add `data` to the decoder and return all packets completed by it.
+
+        :param data: Data received from a GPS.
+        :type data: Binary string.
+        :returns: Complete TSIP packets with framing and byte stuffing still
+            applied. May be an empty list.
+        :rtype: List of binary strings.
+
+        """
+
+        profiler = profiling.profiler
+        if profiler is not None:
+            t0 = profiling.perf_counter_ns()
+
+        self._buffer += data
+
+        packets = []
+        while True:
+            packet = self.next_frame()
+            if packet is None:
+                break
+            packets.append(packet)
+
+        if profiler is not None:
+            profiler.record(profiling.STAGE_SCAN, profiling.perf_counter_ns() - t0)
+
+        return packets
+
+    def next_frame(self):
+        """
+        Return the next complete packet from the receive buffer.
+
+        :returns: TSIP packet with framing and byte stuffing still applied
+            or ``None`` if the receive buffer does not contain a complete
+            packet.
+
+        """
+
+        buf = self._buffer
+        subscription = self.subscription
+        stats = self.stats
+        (start, stop, pos) = find_frame(buf, self._scan, self._start)
+
+        # Data between `base` and the start of the next packet is not part
+        # of any packet.
+        #
+        base = 0
+
+        while stop is not None and subscription is not None \
+                and not subscription.match(buf, start):
+            self.packets_skipped += 1
+            if stats is not None:
+                stats.skipped()
+                self._discard(start - base)
+                self._discarding = False
+            base = stop
+            (start, stop, pos) = find_frame(buf, pos)
+
+        if stop is not None:
+            if stats is not None:
+                self._discard(start - base)
+                self._discarding = False
+                stats.frame(buf, start, stop)
+
+            packet = bytes(buf[start:stop])
+            del buf[:stop]
+            self._scan = 0
+            self._start = -1
+            return packet
+
+        # No complete packet in buffer. Drop data that cannot be part
+        # of a packet and remember where to continue.
+        #
+        if start < 0:
+            if stats is not None:
+                self._discard(pos - base)
+            del buf[:pos]
+            pos = 0
+        elif start > 0:
+            if stats is not None:
+                self._discard(start - base)
+            del buf[:start]
+            pos -= start
+            start = 0
+
+        self._scan = pos
+        self._start = start
+        return None
+
+
 class gps(object):
+    """
+    Read and write TSIP packets from and to `conn`.
+
+    Packets are extracted from the data read from `conn` by a
+    `FrameDecoder` instance.
+
+    :param conn: File-like object, socket or serial port.
+    :param chunksize: ``None`` (the default) reads `conn` one byte at a time
+        and passes the bytes to the decoder once they may complete a
+        packet. Otherwise `conn` is read in chunks of up to `chunksize`
+        bytes (see `chunk_reader()`), which is much faster.
+    :type chunksize: Integer or ``None``.
+    :param subscribe: Read only these packets, see `FrameDecoder`.
+    :type subscribe: Iterable of packet codes or code/subcodes.
+    :param stats: Count data and packets in this `tsip.stats.Statistics`
+        instance. May also be set later through the ``stats`` attribute.
 
-    def __init__(self, conn):
+    """
+
+    def __init__(self, conn, chunksize=None, subscribe=None, stats=None):
         self.conn = conn
+        self.chunksize = chunksize
+        self.decoder = FrameDecoder(subscribe, stats)
+        self._packets = collections.deque()
+
+        # Bytes read one at a time but not yet passed to the decoder and
+        # the number of consecutive DLEs at their end.
+        #
+        self._pending = bytearray()
+        self._dles = 0
+
+        if chunksize:
+            self._read_chunk = chunk_reader(conn)
+        else:
+            self._read_chunk = conn.read
 
     def __iter__(self):
         return self
 
+    @property
+    def packets_skipped(self):
+        """Number of packets dropped because they were not subscribed."""
+        return self.decoder.packets_skipped
+
+    def _get_stats(self):
+        return self.decoder.stats
+
+    def _set_stats(self, stats):
+        self.decoder.stats = stats
+
+    stats = property(_get_stats, _set_stats, doc='`tsip.stats.Statistics` instance or ``None``.')
+
     def read(self):
+        """
+        Read the next packet from `conn`.
 
-        packet = bytes()
-        pkt_active = 0
+        :returns: TSIP packet with framing and byte stuffing still applied
+            or ``None`` on timeout or end-of-file.
 
-        #hold last 3 bytes (initialize assuming previous byte wasn't DLE)
-        #could get unlucky if start reading mid-message with 2nd data DLE (stuffed) byte as first byte seen
-        #would mis-interpret as start of message, but will simply return corrupt first packet, which was invalid anyway
-        b = [b'\0x00', b'\0x00', b'\0x00']
-        while True:
-            b[0] = self.conn.read(1)
+        """
 
-            if len(b[0]) == 0: #timeout
-                return None
+        packets = self._packets
+        profiler = profiling.profiler
+
+        if not self.chunksize:
+            if profiler is None:
+                return self._read_bytewise()
+            packets.extend(self._flush())
+
+        while not packets:
+            if profiler is not None:
+                t0 = profiling.perf_counter_ns()
 
-            #rather than counting even/odd DLEs, look for known pattern for start/end, to prevent issues when start reading mid-message
-            #end will always be <not DLE> <DLE> <ETX>
-            #start will always be <not DLE> <DLE> <not DLE, not ETX> (1 byte delayed, since DLE is the start)
-            if b[2][0] != DLE and b[1][0] == DLE and b[0][0] == ETX: #end of message
-                if pkt_active: #only return packet if active, otherwise found end of partial message, ignore
-                    packet += b[0]
-                    return packet
-            elif b[2][0] != DLE and b[1][0] == DLE and b[0][0] != DLE: #start of message
-                pkt_active = 1
-                packet += bDLE #start is delayed by 1 byte, need to put first DLE byte into packet
-                packet += b[0]
+            chunk = self._read_chunk(self.chunksize or 1)
+
+            if profiler is not None:
+                profiler.record(profiling.STAGE_READ, profiling.perf_counter_ns() - t0)
+
+            if not chunk:   # timeout
+                return None
+            if self.decoder.stats is not None:
+                self.decoder.stats.received(len(chunk))
+            packets.extend(self.decoder.feed(chunk))
+
+        return packets.popleft()
+
+    def _read_bytewise(self):
+        # Feeding the decoder one byte at a time is slow, so the bytes are
+        # collected and only fed when a DLE/ETX that is not a stuffed DLE
+        # followed by ETX may have completed a packet, or on timeout.
+        #
+        packets = self._packets
+        read = self.conn.read
+        pending = self._pending
+        dles = self._dles
+
+        while not packets:
+            c = read(1)
+
+            if not c:   # timeout
+                self._dles = dles
+                packets.extend(self._flush())
+                return packets.popleft() if packets else None
+
+            pending += c
+            if c == bDLE:
+                dles += 1
             else:
-                if pkt_active: #only accumulate packet data after start of message was found
-                    packet += b[0]
+                if c == bETX and dles & 1:
+                    packets.extend(self._flush())
+                dles = 0
 
-            #shift old bytes
-            b[2] = b[1]
-            b[1] = b[0]
+        self._dles = dles
+        return packets.popleft()
 
+    def _flush(self):
+        pending = self._pending
+        if not pending:
+            return []
+
+        if self.decoder.stats is not None:
+            self.decoder.stats.received(len(pending))
+        packets = self.decoder.feed(pending)
+        del pending[:]
+        return packets
 
     def next(self):
         packet = self.read()
@@ -156,4 +584,10 @@ class gps(object):
 
         """
 
-        self.conn.write(packet)
+        if hasattr(self.conn, 'sendall'):     # socket
+            self.conn.sendall(packet)
+        else:
+            self.conn.write(packet)
+
+        if self.decoder.stats is not None:
+            self.decoder.stats.sent(len(packet))
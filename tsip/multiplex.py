@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+Multiplexer API.
+
+`Multiplexer` reads packets from many receivers in a single thread. All
+connections are registered with a ``selectors`` poller and each has its
+own `PacketDecoder`, so data may arrive in arbitrary chunks on any
+connection.
+
+Example::
+
+  >>> mux = Multiplexer()
+  >>> for (i, device) in enumerate(['/dev/ttyUSB0', '/dev/ttyUSB1']):
+  ...     mux.add(i, serial.Serial(device, 9600, timeout=0))
+  >>> for (port_id, packet) in mux:
+  ...     print(port_id, packet)
+
+"""
+
+import collections
+import errno
+import selectors
+import time
+
+from tsip.config import *
+from tsip.llapi import *
+from tsip.hlapi import *
+
+
+class Port(object):
+    """
+    State of a connection registered with a `Multiplexer`.
+
+    :param port_id: Identifier of the port.
+    :param conn: File-like object, socket or serial port.
+    :param decoder: `PacketDecoder` instance.
+
+    """
+
+    def __init__(self, port_id, conn, decoder):
+        self.port_id = port_id
+        self.conn = conn
+        self.decoder = decoder
+        self.bytes_read = 0
+        self.packets_read = 0
+        self._read_chunk = chunk_reader(conn)
+
+
+class Multiplexer(object):
+    """
+    Read packets from many connections in a single thread.
+
+    :param chunksize: Maximum number of bytes read from a connection at once.
+    :param packet_class: `Packet`, `LazyPacket` or `tsip.records.Record`.
+    :param subscribe: Read only these packets, see `FrameDecoder`.
+
+    """
+
+    def __init__(self, chunksize=READ_CHUNK_SIZE, packet_class=Packet, subscribe=None):
+        self.chunksize = chunksize
+        self.packet_class = packet_class
+        self.subscribe = subscribe
+        self.ports = {}
+        self._selector = selectors.DefaultSelector()
+        self._packets = collections.deque()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __iter__(self):
+        return self
+
+    def __len__(self):
+        return len(self.ports)
+
+    def add(self, port_id, conn):
+        """
+        Register a connection.
+
+        :param port_id: Identifier returned with the packets read from
+            `conn`. Any hashable value.
+        :param conn: File-like object, socket or serial port. It must
+            provide ``fileno()`` and should not block when reading (e.g.
+            a ``serial.Serial`` instance with ``timeout=0``) as the
+            multiplexer reads all data available when `conn` is readable.
+        :raise: ``KeyError`` if `port_id` is already registered.
+
+        """
+
+        if port_id in self.ports:
+            raise KeyError('port %r already registered' % (port_id,))
+
+        port = Port(port_id, conn, PacketDecoder(self.packet_class, self.subscribe))
+        self._selector.register(conn, selectors.EVENT_READ, port)
+        self.ports[port_id] = port
+
+    def remove(self, port_id):
+        """
+        Unregister a connection. The connection is not closed.
+
+        :return: The connection.
+
+        """
+
+        port = self.ports.pop(port_id)
+        self._selector.unregister(port.conn)
+        return port.conn
+
+    def write(self, port_id, packet, *values):
+        """
+        Send a packet to a connection.
+
+        :param port_id: Identifier of the connection.
+        :param packet: Packet to send.
+        :type packet: `Packet` or `Command` instance.
+        :param values: Values of the parameters of a `Command`.
+
+        """
+
+        conn = self.ports[port_id].conn
+        data = frame_packet(packet, *values)
+
+        if hasattr(conn, 'sendall'):     # socket
+            conn.sendall(data)
+        else:
+            conn.write(data)
+
+    def poll(self, timeout=None):
+        """
+        Read from all readable connections.
+
+        Connections at end-of-file (or closed ptys) are removed.
+
+        :param timeout: Seconds to wait for any connection to become
+            readable. ``None`` waits indefinitely.
+        :return: ``(port_id, packet)`` tuples in the order the packets
+            were received. May be an empty list.
+        :rtype: List.
+
+        """
+
+        packets = []
+        chunksize = self.chunksize
+
+        for (key, events) in self._selector.select(timeout):
+            port = key.data
+
+            try:
+                data = port._read_chunk(chunksize)
+            except OSError as e:
+                if e.errno != errno.EIO:
+                    raise
+                data = b''
+
+            if not data:
+                self.remove(port.port_id)
+                continue
+
+            port.bytes_read += len(data)
+
+            port_id = port.port_id
+            decoded = port.decoder.feed(data)
+            port.packets_read += len(decoded)
+            packets += [(port_id, packet) for packet in decoded]
+
+        return packets
+
+    def read(self, timeout=None):
+        """
+        Return the next packet from any connection.
+
+        :param timeout: Seconds to wait for a packet.
+        :returns: Tuple ``(port_id, packet)`` or ``None`` on timeout or
+            when no connections are left.
+
+        """
+
+        packets = self._packets
+
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+
+        while not packets:
+            if not self.ports:
+                return None
+
+            if timeout is not None:
+                timeout = deadline - time.monotonic()
+                if timeout < 0:
+                    return None
+
+            packets.extend(self.poll(timeout))
+
+        return packets.popleft()
+
+    def next(self):
+        packet = self.read()
+
+        if packet is None:
+            raise StopIteration()
+        else:
+            return packet
+
+    def __next__(self):
+        return self.next()
+
+    def close(self):
+        """Unregister all connections and close the poller."""
+
+        for port_id in list(self.ports):
+            self.remove(port_id)
+        self._selector.close()
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+Profiling hooks.
+
+When profiling is enabled `tsip.gps`, `tsip.GPS`, `FrameDecoder` and
+`PacketDecoder` record the time spent in each stage of reading a packet
+into histograms:
+
+* ``read`` -- waiting for and reading data from the connection.
+* ``scan`` -- locating packets in the received data.
+* ``unstuff`` -- removing framing and byte stuffing, per packet code.
+* ``unpack`` -- decoding packets, per packet code.
+
+Profiling is enabled by calling `enable()` or, without changing any code,
+by setting the environment variable ``TSIP_PROFILE`` to a non-empty
+value. In the latter case the report is written to standard error when
+the program exits. While profiling is disabled each stage costs a
+single ``is None`` check.
+
+Example::
+
+  >>> profiling.enable()
+  >>> for packet in GPS(conn):
+  ...     pass
+  >>> print(profiling.report())
+
+"""
+
+import atexit
+import os
+import sys
+import time
+
+from tsip.config import *
+
+
+STAGE_READ = 'read'
+STAGE_SCAN = 'scan'
+STAGE_UNSTUFF = 'unstuff'
+STAGE_UNPACK = 'unpack'
+
+STAGES = [STAGE_READ, STAGE_SCAN, STAGE_UNSTUFF, STAGE_UNPACK]
+
+SUB_BUCKET_BITS = 3
+"""Each power of two is split into ``2 ** SUB_BUCKET_BITS`` buckets, so
+percentiles are accurate to within 1/8."""
+
+perf_counter_ns = time.perf_counter_ns
+
+profiler = None
+"""The active `Profiler` or ``None`` if profiling is disabled."""
+
+
+class Histogram(object):
+    """
+    Histogram of durations in nanoseconds with logarithmic buckets.
+
+    """
+
+    __slots__ = ('buckets', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    @staticmethod
+    def bucket(value):
+        """Return the index of the bucket holding `value`."""
+
+        if value < (2 << SUB_BUCKET_BITS):
+            return value
+        shift = value.bit_length() - SUB_BUCKET_BITS - 1
+        return (shift << SUB_BUCKET_BITS) + (value >> shift)
+
+    @staticmethod
+    def upper(bucket):
+        """Return the largest value in `bucket`."""
+
+        if bucket < (2 << SUB_BUCKET_BITS):
+            return bucket
+        shift = (bucket >> SUB_BUCKET_BITS) - 1
+        return ((bucket - (shift << SUB_BUCKET_BITS) + 1) << shift) - 1
+
+    def add(self, value):
+        bucket = self.bucket(value)
+        buckets = self.buckets
+        buckets[bucket] = buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def update(self, other):
+        """Add the values counted in another `Histogram`."""
+
+        for (bucket, count) in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, p):
+        """
+        Return the `p`-th percentile.
+
+        :param p: Percentile between 0 and 100.
+        :return: Upper bound of the bucket holding the percentile, at
+            most the largest value added. 0 if no values were added.
+
+        """
+
+        rank = max(1, -(-self.count * p // 100))
+        seen = 0
+
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(self.upper(bucket), self.max)
+
+        return 0
+
+
+class Profiler(object):
+    """
+    Histograms of the time spent in each stage, by packet code.
+
+    ``histograms`` maps ``(stage, key)`` tuples to `Histogram` instances
+    where `key` is a packet code or code/subcode, or ``None`` for stages
+    not related to a single packet.
+
+    """
+
+    def __init__(self):
+        self.histograms = {}
+
+    def record(self, stage, ns, key=None):
+        """Record that `stage` took `ns` nanoseconds."""
+
+        try:
+            histogram = self.histograms[(stage, key)]
+        except KeyError:
+            histogram = self.histograms[(stage, key)] = Histogram()
+        histogram.add(ns)
+
+    def reset(self):
+        """Discard all recorded timings."""
+        self.histograms = {}
+
+    def stage(self, stage):
+        """Return a `Histogram` of `stage` across all packet codes."""
+
+        histogram = Histogram()
+        for ((stage_, key), other) in self.histograms.items():
+            if stage_ == stage:
+                histogram.update(other)
+        return histogram
+
+    def report(self, per_code=True):
+        """
+        Return a table of the count, p50, p99 and maximum of each stage
+        in microseconds.
+
+        :param per_code: Also list each stage by packet code.
+        :rtype: String.
+
+        """
+
+        lines = ['%-10s %-8s %10s %10s %10s %10s' % ('stage', 'code', 'count', 'p50 us', 'p99 us', 'max us')]
+
+        def line(stage, code, histogram):
+            lines.append('%-10s %-8s %10d %10.1f %10.1f %10.1f' % (
+                stage, code, histogram.count, histogram.percentile(50) / 1e3,
+                histogram.percentile(99) / 1e3, histogram.max / 1e3))
+
+        stages = STAGES + sorted(set([stage for (stage, key) in self.histograms]) - set(STAGES))
+        for stage in stages:
+            histogram = self.stage(stage)
+            if not histogram.count:
+                continue
+
+            line(stage, 'all', histogram)
+
+            if per_code:
+                keys = sorted([key for (stage_, key) in self.histograms
+                               if stage_ == stage and key is not None])
+                for key in keys:
+                    line(stage, '%#x' % (key), self.histograms[(stage, key)])
+
+        return '\n'.join(lines)
+
+
+def enable():
+    """
+    Enable profiling. Timings recorded so far are kept.
+
+    :return: The active `Profiler`.
+
+    """
+
+    global profiler
+
+    if profiler is None:
+        profiler = Profiler()
+    return profiler
+
+
+def disable():
+    """Disable profiling and discard all timings."""
+
+    global profiler
+    profiler = None
+
+
+def report(per_code=True):
+    """Return the report of the active `Profiler`, see `Profiler.report()`."""
+
+    if profiler is None:
+        return 'profiling is disabled'
+    return profiler.report(per_code)
+
+
+def _report_at_exit():
+    if profiler is not None:
+        sys.stderr.write(report() + '\n')
+
+
+if os.environ.get('TSIP_PROFILE'):
+    enable()
+    atexit.register(_report_at_exit)
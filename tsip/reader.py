@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+Background reader API.
+
+`BackgroundReader` reads packets from a `gps` or `GPS` instance in a
+separate thread and keeps them in a bounded queue until the application
+asks for them. The connection is drained continuously, so packets are
+not lost in the operating system's buffers while the application is
+busy with something else.
+
+Example::
+
+  >>> gps = GPS(serial.Serial('/dev/ttyS0', 9600, timeout=0.5), chunksize=4096)
+  >>> with BackgroundReader(gps, maxlen=10000) as reader:
+  ...     for packet in reader:
+  ...         print(packet)
+
+"""
+
+import collections
+import threading
+
+from tsip.config import *
+from tsip.llapi import *
+from tsip.hlapi import *
+
+
+DROP_OLDEST = 'drop_oldest'
+"""Overflow policy: discard the oldest queued packet to make room."""
+
+DROP_NEWEST = 'drop_newest'
+"""Overflow policy: discard the packet just read."""
+
+BLOCK = 'block'
+"""Overflow policy: stop reading until the application made room."""
+
+OVERFLOW_POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+
+class BackgroundReader(object):
+    """
+    Read packets in a background thread.
+
+    :param gps: `gps` instance returning raw packets or `GPS` instance
+        returning `Packet` instances. Its connection should have a timeout
+        so the thread notices `stop()` even while no data is received.
+    :param maxlen: Maximum number of packets in the queue.
+    :param overflow: What to do when a packet is read while the queue is
+        full. One of `DROP_OLDEST` (the default), `DROP_NEWEST` or `BLOCK`.
+    :param stop_at_eof: By default ``gps.read()`` returning ``None`` is
+        taken to be a timeout and the thread continues reading. With
+        `stop_at_eof` it is taken to be the end-of-file and the thread
+        exits, e.g. when reading from a file.
+    :raise: ``ValueError`` if `overflow` is invalid.
+
+    Statistics are kept in the following attributes:
+
+    * ``packets_read`` -- number of packets read from `gps`.
+    * ``packets_dropped`` -- number of packets discarded because the queue
+      was full.
+    * ``high_water_mark`` -- largest number of packets queued at once.
+
+    """
+
+    def __init__(self, gps, maxlen=1024, overflow=DROP_OLDEST, stop_at_eof=False):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError('invalid overflow policy %r' % (overflow))
+
+        self.gps = gps
+        self.maxlen = maxlen
+        self.overflow = overflow
+        self.stop_at_eof = stop_at_eof
+
+        self.packets_read = 0
+        self.packets_dropped = 0
+        self.high_water_mark = 0
+
+        self._queue = collections.deque()
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+        self._error = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def __iter__(self):
+        return self
+
+    def __len__(self):
+        return len(self._queue)
+
+    def start(self):
+        """Start the background thread."""
+
+        self._running = True
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name='tsip-reader')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the background thread and wait for it to exit.
+
+        Packets which are still queued may be read afterwards.
+
+        """
+
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        read = self.gps.read
+
+        try:
+            while self._running:
+                packet = read()
+
+                if packet is None:
+                    if self.stop_at_eof:
+                        break
+                    continue
+
+                self._put(packet)
+
+        except Exception as e:
+            self._error = e
+
+        finally:
+            with self._cond:
+                self._running = False
+                self._cond.notify_all()
+
+    def _put(self, packet):
+        queue = self._queue
+
+        with self._cond:
+            self.packets_read += 1
+
+            if len(queue) >= self.maxlen:
+                if self.overflow == DROP_OLDEST:
+                    queue.popleft()
+                    self.packets_dropped += 1
+                elif self.overflow == DROP_NEWEST:
+                    self.packets_dropped += 1
+                    return
+                else:
+                    while len(queue) >= self.maxlen and self._running:
+                        self._cond.wait()
+                    if not self._running:
+                        self.packets_dropped += 1
+                        return
+
+            queue.append(packet)
+            if len(queue) > self.high_water_mark:
+                self.high_water_mark = len(queue)
+
+            self._cond.notify_all()
+
+    def read(self, timeout=None):
+        """
+        Return the next packet from the queue.
+
+        :param timeout: Seconds to wait for a packet if the queue is empty.
+            ``None`` waits until a packet is read or the thread exits.
+        :returns: Packet as returned by ``gps.read()`` or ``None`` on
+            timeout or if the queue is empty and the thread has exited.
+        :raise: Any exception raised by ``gps.read()`` in the thread once
+            all packets read before it have been returned.
+
+        """
+
+        queue = self._queue
+
+        with self._cond:
+            if not queue:
+                self._cond.wait_for(lambda: queue or not self._running, timeout)
+
+            if queue:
+                packet = queue.popleft()
+                self._cond.notify_all()
+                return packet
+
+            if self._error is not None:
+                (error, self._error) = (self._error, None)
+                raise error
+
+            return None
+
+    def next(self):
+        packet = self.read()
+
+        if packet is None:
+            raise StopIteration()
+        else:
+            return packet
+
+    def __next__(self):
+        return self.next()
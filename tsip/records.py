@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+"""
+Packets with named fields.
+
+For every packet code/subcode of `PACKET_STRUCTURES` a subclass of
+`Record` (and thus of `Packet`) is generated whose fields can also be
+accessed by name, e.g. ``packet.time_of_week`` instead of ``packet[2]``
+for 0x8F-AB. The names are listed in `FIELD_NAMES`. Fields without a name
+(e.g. the repeated fields of variable-length packets) and all fields of
+packets without names are only accessible by index.
+
+Record classes have no instance dictionary and `Record.unpack()` creates
+instances without calling `Packet.__init__()`, so they are slightly
+cheaper to create than `Packet` instances. Pass ``packet_class=Record``
+to `GPS`, `PacketDecoder`, `tsip.capture.Capture.packets()` and friends.
+
+Example::
+
+  >>> for packet in GPS(conn, packet_class=Record):
+  ...     if packet.key == 0x8fab:
+  ...         print(packet.week_number, packet.time_of_week, packet.utc_offset)
+
+"""
+
+import keyword
+
+from tsip.config import *
+from tsip.structs import *
+from tsip.hlapi import *
+from tsip.hlapi import _unpack_fields
+
+
+# Names of the fields of each packet. Keys are packet codes/subcodes as in
+# `PACKET_STRUCTURES`. Packets of variable length only have names for the
+# fields they have in common. Packets with several structures are named
+# after the longest one, e.g. 0x46. Fields missing from a shorter packet,
+# like the status of a one-byte 0x46, raise ``AttributeError`` and are
+# left out by `Record.asdict()`.
+#
+FIELD_NAMES = {
+    0x1c01: ('code', 'subcode'),
+    0x1c81: ('code', 'subcode', 'reserved', 'major_version', 'minor_version',
+             'build_number', 'month', 'day', 'year', 'product_name'),
+    0x1c03: ('code', 'subcode'),
+    0x1c83: ('code', 'subcode', 'serial_number', 'build_day', 'build_month',
+             'build_year', 'build_hour', 'hardware_code', 'hardware_id'),
+    0x1e:   ('code', 'reset_type'),
+    0x1f:   ('code',),
+    0x21:   ('code',),
+    0x23:   ('code', 'x', 'y', 'z'),
+    0x24:   ('code',),
+    0x25:   ('code',),
+    0x26:   ('code',),
+    0x27:   ('code',),
+    0x29:   ('code',),
+    0x2d:   ('code',),
+    0x31:   ('code', 'x', 'y', 'z'),
+    0x32:   ('code', 'latitude', 'longitude', 'altitude'),
+    0x34:   ('code', 'sv_prn'),
+    0x35:   ('code', 'position', 'velocity', 'timing', 'auxiliary'),
+    0x37:   ('code',),
+    0x38:   ('code', 'operation', 'data_type', 'sv_prn'),
+    0x39:   ('code', 'operation', 'sv_prn'),
+    0x3a:   ('code', 'sv_prn'),
+    0x3b:   ('code', 'sv_prn'),
+    0x3c:   ('code', 'sv_prn'),
+    0x3f:   ('code', 'subcode'),
+    0x41:   ('code', 'time_of_week', 'week_number', 'utc_offset'),
+    0x42:   ('code', 'x', 'y', 'z', 'time_of_fix'),
+    0x43:   ('code', 'x_velocity', 'y_velocity', 'z_velocity', 'bias_rate', 'time_of_fix'),
+    0x45:   ('code', 'nav_major_version', 'nav_minor_version', 'nav_month', 'nav_day',
+             'nav_year', 'dsp_major_version', 'dsp_minor_version', 'dsp_month',
+             'dsp_day', 'dsp_year'),
+    0x46:   ('code', 'status', 'error_code'),
+    0x47:   ('code', 'count'),
+    0x49:   ('code',),
+    0x4a:   ('code', 'latitude', 'longitude', 'altitude', 'clock_bias', 'time_of_fix'),
+    0x4b:   ('code', 'machine_id', 'status_1', 'status_2'),
+    0x4d:   ('code', 'oscillator_offset'),
+    0x55:   ('code', 'position', 'velocity', 'timing', 'auxiliary'),
+    0x56:   ('code', 'east_velocity', 'north_velocity', 'up_velocity', 'clock_bias_rate',
+             'time_of_fix'),
+    0x57:   ('code', 'source_of_information', 'diagnostic_code', 'time_of_fix', 'week_number'),
+    0x58:   ('code', 'operation', 'data_type', 'sv_prn', 'length'),
+    0x59:   ('code', 'operation'),
+    0x5a:   ('code', 'sv_prn', 'sample_length', 'signal_level', 'code_phase', 'doppler',
+             'time_of_measurement'),
+    0x5b:   ('code', 'time_of_collection', 'health', 'iode', 'toe', 'fit_interval_flag',
+             'ura'),
+    0x5c:   ('code', 'sv_prn', 'slot_channel', 'acquisition_flag', 'ephemeris_flag',
+             'signal_level', 'time_of_last_measurement', 'elevation', 'azimuth',
+             'old_measurement', 'integer_msec', 'bad_data', 'data_collection'),
+    0x5f:   ('data',),
+    0x6d:   ('code', 'mode', 'pdop', 'hdop', 'vdop', 'tdop'),
+    0x70:   ('code', 'dynamics_switch', 'static_filter_switch', 'altitude_filter_switch',
+             'reserved'),
+    0x82:   ('code', 'status'),
+    0x83:   ('code', 'x', 'y', 'z', 'clock_bias', 'time_of_fix'),
+    0x84:   ('code', 'latitude', 'longitude', 'altitude', 'clock_bias', 'time_of_fix'),
+    0xbb00: ('code', 'subcode', 'receiver_mode', 'reserved_1', 'dynamics_code', 'reserved_2',
+             'elevation_mask', 'amu_mask', 'pdop_mask', 'pdop_switch', 'reserved_3',
+             'foliage_mode'),
+    0xbc:   ('code', 'port_to_change', 'input_baud_rate', 'output_baud_rate', 'data_bits',
+             'parity', 'stop_bits', 'flow_control', 'input_protocol', 'output_protocol',
+             'reserved'),
+    0x8e15: ('code', 'subcode'),
+    0x8e23: ('code', 'subcode', 'enable'),
+    0x8e26: ('code', 'subcode'),
+    0x8e41: ('code', 'subcode'),
+    0x8e42: ('code', 'subcode'),
+    0x8e45: ('code', 'subcode', 'segment'),
+    0x8e4a: ('code', 'subcode', 'pps_enabled', 'time_base', 'pps_polarity', 'pps_offset',
+             'bias_uncertainty_threshold'),
+    0x8e4c: ('code', 'subcode', 'segment'),
+    0x8e4e: ('code', 'subcode', 'pps_output'),
+    0x8ea0: ('code', 'subcode', 'mode', 'value'),
+    0x8ea2: ('code', 'subcode', 'utc_gps_time'),
+    0x8ea3: ('code', 'subcode', 'command'),
+    0x8ea4: ('code', 'subcode', 'test_mode'),
+    0x8ea5: ('code', 'subcode', 'mask_0', 'mask_1'),
+    0x8ea6: ('code', 'subcode', 'self_survey_command'),
+    0x8ea8: ('code', 'subcode', 'type'),
+    0x8ea9: ('code', 'subcode', 'self_survey_enable', 'position_save_flag',
+             'self_survey_length', 'reserved'),
+    0x8eab: ('code', 'subcode', 'request_type'),
+    0x8eac: ('code', 'subcode', 'request_type'),
+    0x8f15: ('code', 'subcode', 'datum_index', 'dx', 'dy', 'dz', 'semi_major_axis',
+             'eccentricity_squared'),
+    0x8f23: ('code', 'subcode', 'time_of_fix', 'week_number', 'leap_seconds', 'fix_flags',
+             'latitude', 'longitude', 'altitude', 'east_velocity', 'north_velocity',
+             'up_velocity', 'reserved'),
+    0x8f41: ('code', 'subcode', 'serial_number_prefix', 'serial_number', 'build_year',
+             'build_month', 'build_day', 'build_hour', 'oscillator_offset', 'test_code_id'),
+    0x8f42: ('code', 'subcode', 'production_options_prefix', 'production_number_extension',
+             'case_serial_number_prefix', 'case_serial_number', 'production_number',
+             'reserved_1', 'machine_id', 'reserved_2'),
+    0x8f4a: ('code', 'subcode', 'pps_enabled', 'time_base', 'pps_polarity', 'pps_offset',
+             'bias_uncertainty_threshold'),
+    0x8f4e: ('code', 'subcode', 'pps_output'),
+    0x8fa0: ('code', 'subcode', 'dac_value', 'dac_voltage', 'dac_resolution',
+             'dac_data_format', 'min_dac_voltage', 'max_dac_voltage'),
+    0x8fa2: ('code', 'subcode', 'utc_gps_time'),
+    0x8fa3: ('code', 'subcode', 'command'),
+    0x8fa4: ('code', 'subcode', 'test_mode'),
+    0x8fa5: ('code', 'subcode', 'mask_0', 'mask_1'),
+    0x8fa6: ('code', 'subcode', 'status'),
+    0x8fa8: ('code', 'subcode', 'type'),
+    0x8fa9: ('code', 'subcode', 'self_survey_enable', 'position_save_flag',
+             'self_survey_length', 'reserved'),
+    0x8fab: ('code', 'subcode', 'time_of_week', 'week_number', 'utc_offset', 'timing_flag',
+             'seconds', 'minutes', 'hours', 'day_of_month', 'month', 'year'),
+    0x8fac: ('code', 'subcode', 'receiver_mode', 'disciplining_mode', 'self_survey_progress',
+             'holdover_duration', 'critical_alarms', 'minor_alarms', 'gps_decoding_status',
+             'disciplining_activity', 'spare_status_1', 'spare_status_2', 'pps_offset',
+             'clock_offset', 'dac_value', 'dac_voltage', 'temperature', 'latitude',
+             'longitude', 'altitude', 'pps_quantization_error', 'spare'),
+}
+
+
+class Record(Packet):
+    """
+    TSIP packet with named fields.
+
+    `Record` itself is used for packets which could not be decoded (0xFF
+    pseudo-packets). `Record.unpack()` returns an instance of the record
+    class of the packet, see `get_record_class()`.
+
+    """
+
+    __slots__ = ()
+
+    key = None
+    """Packet code or code/subcode of this record class."""
+
+    field_names = ()
+    """Names of the fields in order."""
+
+    @classmethod
+    def unpack(cls, rawpacket):
+        """Instantiate the record class of `rawpacket` from binary string.
+
+           :param rawpacket: TSIP pkt in binary format.
+           :type rawpacket: Binary string or ``memoryview``.
+
+           `rawpacket` must already have framing (DLE...DLE/ETX) removed and
+           byte stuffing reversed.
+
+        """
+
+        (key, fields) = _unpack_fields(rawpacket)
+
+        if key is None:
+            return Record(*fields)
+
+        try:
+            record_class = RECORD_CLASSES[key]
+        except KeyError:
+            record_class = get_record_class(key)
+
+        record = _new(record_class)
+        record._fields = fields if isinstance(fields, list) else list(fields)
+        return record
+
+    def asdict(self):
+        """Return the named fields as dictionary."""
+        return dict(zip(self.field_names, self._fields))
+
+
+_new = object.__new__
+
+
+def _field(index, name):
+    def get(self):
+        try:
+            return self._fields[index]
+        except IndexError:
+            raise AttributeError(name)
+
+    def set(self, value):
+        self._fields[index] = value
+
+    return property(get, set, doc='Field %d.' % (index))
+
+
+def make_record_class(key, names):
+    """
+    Return a new `Record` subclass with named fields.
+
+    :param key: Packet code or code/subcode.
+    :param names: Field names in order, starting with the code.
+    :raise: ``ValueError`` if a name is not a valid identifier or clashes
+        with an attribute of `Record`.
+
+    """
+
+    names = tuple(names)
+
+    attributes = {
+        '__slots__': (),
+        '__module__': __name__,
+        '__doc__': 'Packet 0x%x with the fields %s.' % (key, ', '.join(names)),
+        'key': key,
+        'field_names': names,
+    }
+
+    for (index, name) in enumerate(names):
+        if not name.isidentifier() or keyword.iskeyword(name) or hasattr(Record, name) \
+                or name in attributes:
+            raise ValueError('invalid field name %r' % (name))
+        attributes[name] = _field(index, name)
+
+    return type('Record0x%x' % (key), (Record,), attributes)
+
+
+def register_record(key, names):
+    """
+    Set the field names of a packet, e.g. of a packet registered with
+    `register_packet()`.
+
+    :param key: Packet code or code/subcode.
+    :param names: Field names in order, starting with the code.
+    :return: The new record class.
+
+    """
+
+    record_class = make_record_class(key, names)
+    FIELD_NAMES[key] = record_class.field_names
+    RECORD_CLASSES[key] = record_class
+
+    # Make the class accessible by name so instances can be pickled.
+    #
+    globals()[record_class.__name__] = record_class
+
+    return record_class
+
+
+def get_record_class(key):
+    """
+    Return the record class of a packet.
+
+    Record classes of packets without entry in `FIELD_NAMES` only name
+    the code (and subcode).
+
+    :param key: Packet code or code/subcode.
+
+    """
+
+    try:
+        return RECORD_CLASSES[key]
+    except KeyError:
+        pass
+
+    if key in FIELD_NAMES:
+        names = FIELD_NAMES[key]
+    elif key > 0xff:
+        names = ('code', 'subcode')
+    else:
+        names = ('code',)
+
+    return register_record(key, names)
+
+
+RECORD_CLASSES = {}
+"""Record classes by packet code or code/subcode."""
+
+for key in PACKET_STRUCTURES:
+    get_record_class(key)
@@ -0,0 +1,672 @@
+# -*- coding: utf-8 -*-
+"""
+Declarative packet schemas.
+
+A `Schema` describes the binary structure of a packet as a sequence of
+elements:
+
+* ``struct`` format strings -- fixed fields, e.g. ``'>BBIH'``. The byte
+  order of the first format string applies to the whole schema.
+* `Repeat` -- a group of fields repeated as often as given by an earlier
+  field (count-prefixed) or until the end of the packet.
+* `Variant` -- the structure of the rest of the packet is selected by the
+  value of a discriminating field.
+* `String` -- a length-prefixed string. The length is not a field of the
+  packet, it is derived from the string when packing.
+
+A schema is compiled once, when it is created. Consecutive fixed fields
+are merged into a single `struct.Struct` which is applied with
+``unpack_from()`` at a precomputed offset, and repeated groups are
+decoded with one `struct.Struct` per repeat count, created on first use.
+
+`Schema` instances provide the same `pack()`/`unpack()` interface as the
+other packet structures and are registered with
+`tsip.structs.register_packet()`.
+
+Example::
+
+  >>> schema = Schema('>BB', Repeat('Bf', count=1))
+  >>> schema.unpack(b'G\\x01\\x02A\\xa0\\x00\\x00')
+  [71, 1, 2, 20.0]
+  >>> register_packet(0x47, schema)
+
+"""
+
+import struct
+
+from tsip.config import *
+
+
+BYTE_ORDERS = ('@', '=', '<', '>', '!')
+
+MAX_LAYOUTS = 1024
+"""Maximum number of structures cached per schema, see `Schema`."""
+
+
+def format_tokens(fmt):
+    """
+    Split a `struct` format into its codes.
+
+    >>> format_tokens('>BB2Hx3s')
+    [('', 'B'), ('', 'B'), ('2', 'H'), ('', 'x'), ('3', 's')]
+
+    :return: Repeat count (possibly empty) and code of each item. Byte
+        order characters and whitespace are skipped.
+    :rtype: List of ``(count, code)`` tuples.
+
+    """
+
+    tokens = []
+    count = ''
+    for c in fmt:
+        if c.isdigit():
+            count += c
+        elif c.isalpha() or c == '?':
+            tokens.append((count, c))
+            count = ''
+        else:
+            count = ''
+    return tokens
+
+
+def count_fields(fmt):
+    """Return the number of fields of the `struct` format `fmt`."""
+
+    count = 0
+    for (n, code) in format_tokens(fmt):
+        if code in ('s', 'p'):
+            count += 1
+        elif code != 'x':
+            count += int(n) if n else 1
+    return count
+
+
+def field_offset(order, fmt, index):
+    """
+    Return the offset and `struct` code of a field.
+
+    :param order: Byte order.
+    :param fmt: `struct` format without byte order.
+    :param index: Index of the field.
+    :rtype: Tuple ``(offset, code)``.
+
+    """
+
+    offset = 0
+    for (n, code) in format_tokens(fmt):
+        n = int(n) if n else 1
+        if code in ('s', 'p'):
+            if index == 0:
+                return (offset, '%d%s' % (n, code))
+            index -= 1
+        elif code != 'x':
+            if index < n:
+                return (offset + index * struct.calcsize(order + code), code)
+            index -= n
+        offset += struct.calcsize(order + str(n) + code)
+
+    raise IndexError('no field %d' % (index))
+
+
+class Repeat(object):
+    """
+    Group of fields repeated a variable number of times.
+
+    :param fmt: `struct` format of one group, without byte order.
+    :param count: Index of the field holding the number of repetitions.
+        ``None`` repeats the group until the end of the packet, which
+        is only allowed for the last element of a schema.
+
+    """
+
+    def __init__(self, fmt, count=None):
+        self.fmt = fmt
+        self.count = count
+
+
+class Variant(object):
+    """
+    Structure selected by the value of a field.
+
+    :param field: Index of the discriminating field. This is either a
+        field preceding the variant or the first field of every variant.
+    :param variants: Dictionary mapping values of the discriminating field
+        to the elements of the rest of the packet, either a format string
+        or a list of elements. The ``None`` variant, if any, is selected
+        by packets ending before the variant.
+
+    """
+
+    def __init__(self, field, variants):
+        self.field = field
+        self.variants = variants
+
+
+class String(object):
+    """
+    Length-prefixed string.
+
+    :param prefix: `struct` format of the length, without byte order.
+    :param encoding: Encoding of the string.
+
+    """
+
+    def __init__(self, prefix='B', encoding='utf-8'):
+        self.prefix = prefix
+        self.encoding = encoding
+
+
+# Compiled elements. `unpack(buf, offset, fields)` appends the decoded
+# fields to `fields` and returns the offset following them. `pack(fields,
+# index, chunks)` appends the binary data of `fields[index:]` consumed by
+# the element to `chunks` and returns the index of the next field.
+# `format(fields, index, formats)` does the same with `struct` formats.
+#
+
+class _Fixed(object):
+
+    def __init__(self, order, fmt):
+        self.fmt = fmt
+        self.struct = struct.Struct(order + fmt)
+        self.size = self.struct.size
+        self.nfields = count_fields(fmt)
+
+    def unpack(self, buf, offset, fields):
+        fields.extend(self.struct.unpack_from(buf, offset))
+        return offset + self.size
+
+    def pack(self, fields, index, chunks):
+        end = index + self.nfields
+        chunks.append(self.struct.pack(*fields[index:end]))
+        return end
+
+    def format(self, fields, index, formats):
+        formats.append(self.fmt)
+        return index + self.nfields
+
+
+class _Repeat(object):
+
+    def __init__(self, order, fmt, count):
+        self.order = order
+        self.fmt = fmt
+        self.count = count
+        self.size = struct.calcsize(order + fmt)
+        self.nfields = count_fields(fmt)
+        self.structs = {}
+
+    def get_struct(self, count):
+        try:
+            return self.structs[count]
+        except KeyError:
+            struct_ = self.structs[count] = struct.Struct(self.order + self.fmt * count)
+            return struct_
+
+    def get_count(self, fields, index):
+        if self.count is None:
+            (count, rest) = divmod(len(fields) - index, self.nfields)
+            if rest or count < 0:
+                raise struct.error('incomplete repeated group')
+            return count
+
+        count = fields[self.count]
+        if not isinstance(count, int):
+            raise ValueError('repeat count is not an integer')
+        return count
+
+    def unpack(self, buf, offset, fields):
+        if self.count is None:
+            (count, rest) = divmod(len(buf) - offset, self.size)
+            if rest or count < 0:
+                raise struct.error('incomplete repeated group')
+        else:
+            count = fields[self.count]
+
+        struct_ = self.get_struct(count)
+        fields.extend(struct_.unpack_from(buf, offset))
+        return offset + struct_.size
+
+    def pack(self, fields, index, chunks):
+        count = self.get_count(fields, index)
+        end = index + count * self.nfields
+        chunks.append(self.get_struct(count).pack(*fields[index:end]))
+        return end
+
+    def format(self, fields, index, formats):
+        count = self.get_count(fields, index)
+        formats.append(self.fmt * count)
+        return index + count * self.nfields
+
+
+class _String(object):
+
+    def __init__(self, order, prefix, encoding):
+        self.prefix = struct.Struct(order + prefix)
+        self.encoding = encoding
+
+    def unpack(self, buf, offset, fields):
+        (length,) = self.prefix.unpack_from(buf, offset)
+        offset += self.prefix.size
+        value = bytes(buf[offset:offset + length])
+        if len(value) != length:
+            raise struct.error('string exceeds the packet')
+        fields.append(value.decode(self.encoding, 'replace'))
+        return offset + length
+
+    def pack(self, fields, index, chunks):
+        value = fields[index]
+        if not isinstance(value, (bytes, bytearray)):
+            value = value.encode(self.encoding)
+        chunks.append(self.prefix.pack(len(value)) + value)
+        return index + 1
+
+    def format(self, fields, index, formats):
+        raise ValueError('strings have no fixed format')
+
+
+class _Variant(object):
+
+    def __init__(self, order, field, variants, nfields, offset):
+        self.field = field
+        self.variants = {}
+
+        for (value, elements) in variants.items():
+            if isinstance(elements, str):
+                elements = [elements]
+            self.variants[value] = _compile(order, elements, nfields, offset)
+
+        # The discriminator is either a preceding field or the first field
+        # of each variant. In the latter case it is read at its offset
+        # before selecting the variant.
+        #
+        if field < nfields:
+            self.peek = None
+        elif field == nfields:
+            if offset is None:
+                raise ValueError('the discriminating field must follow fields of fixed size')
+
+            codes = set()
+            for (value, elements) in self.variants.items():
+                if value is None:
+                    continue
+                if not elements or not isinstance(elements[0], _Fixed):
+                    raise ValueError('variants must start with the discriminating field')
+                codes.add(format_tokens(elements[0].fmt)[0][1])
+
+            if len(codes) != 1 or 'x' in codes:
+                raise ValueError('the discriminating field must have the same format in all variants')
+            self.peek = struct.Struct(order + codes.pop())
+        else:
+            raise ValueError('the discriminating field must not follow the variant')
+
+    def select(self, value):
+        try:
+            return self.variants[value]
+        except (KeyError, TypeError):
+            raise struct.error('no variant for %r' % (value,))
+
+    def unpack(self, buf, offset, fields):
+        if offset == len(buf) and None in self.variants:
+            elements = self.variants[None]
+        elif self.peek is None:
+            elements = self.select(fields[self.field])
+        else:
+            elements = self.select(self.peek.unpack_from(buf, offset)[0])
+
+        for element in elements:
+            offset = element.unpack(buf, offset, fields)
+        return offset
+
+    def _elements(self, fields, index):
+        if index == len(fields):
+            return self.select(None)
+
+        value = fields[self.field]
+        if value is None:
+            raise ValueError('the discriminating field is a parameter')
+        return self.select(value)
+
+    def pack(self, fields, index, chunks):
+        for element in self._elements(fields, index):
+            index = element.pack(fields, index, chunks)
+        return index
+
+    def format(self, fields, index, formats):
+        for element in self._elements(fields, index):
+            index = element.format(fields, index, formats)
+        return index
+
+
+class _Layouts(object):
+    """
+    Structures of the whole packet, one per value of a selector (a repeat
+    count, the value of a discriminating field or the length of a string).
+
+    The selector is read from the packet at a fixed offset, so packets
+    are decoded with a single `struct.Struct`. Only used for schemas
+    consisting of fixed fields followed by a `Repeat`, a `String` or a
+    `Variant` of fixed fields.
+
+    """
+
+    def __init__(self, order, head):
+        self.order = order
+        self.head = head
+        self.structs = {}
+
+    def get(self, selector):
+        try:
+            return self.structs[selector]
+        except (KeyError, TypeError):
+            fmt = self.format_for(selector)
+            if fmt is None:
+                raise struct.error('no structure for %r' % (selector,))
+            struct_ = struct.Struct(self.order + self.head.fmt + fmt)
+            if len(self.structs) < MAX_LAYOUTS:
+                self.structs[selector] = struct_
+            return struct_
+
+    def unpack(self, buf):
+        return list(self.get(self.selector(buf)).unpack(buf))
+
+    def pack(self, fields):
+        return self.get(self.field_selector(fields)).pack(*fields)
+
+    def format(self, fields):
+        fmt = self.get(self.field_selector(fields)).format
+        if count_fields(fmt) != len(fields):
+            raise ValueError('wrong number of fields')
+        return fmt
+
+
+class _RepeatLayouts(_Layouts):
+
+    def __init__(self, order, head, repeat):
+        super(_RepeatLayouts, self).__init__(order, head)
+        self.repeat = repeat
+
+        if repeat.count is not None:
+            (self.offset, code) = field_offset(order, head.fmt, repeat.count)
+            self.peek = struct.Struct(order + code)
+
+    def format_for(self, count):
+        if isinstance(count, int) and count >= 0:
+            return self.repeat.fmt * count
+        return None
+
+    def selector(self, buf):
+        if self.repeat.count is None:
+            (count, rest) = divmod(len(buf) - self.head.size, self.repeat.size)
+            return None if rest else count
+        return self.peek.unpack_from(buf, self.offset)[0]
+
+    def field_selector(self, fields):
+        if self.repeat.count is None:
+            (count, rest) = divmod(len(fields) - self.head.nfields, self.repeat.nfields)
+            return None if rest else count
+        return fields[self.repeat.count]
+
+
+class _VariantLayouts(_Layouts):
+
+    def __init__(self, order, head, variant):
+        super(_VariantLayouts, self).__init__(order, head)
+        self.variant = variant
+
+        if variant.peek is None:
+            (self.offset, code) = field_offset(order, head.fmt, variant.field)
+            self.peek = struct.Struct(order + code)
+        else:
+            (self.offset, self.peek) = (head.size, variant.peek)
+
+    def format_for(self, value):
+        try:
+            elements = self.variant.variants[value]
+        except KeyError:
+            return None
+        return elements[0].fmt if elements else ''
+
+    def selector(self, buf):
+        if len(buf) == self.head.size:
+            return None
+        return self.peek.unpack_from(buf, self.offset)[0]
+
+    def field_selector(self, fields):
+        if len(fields) == self.head.nfields:
+            return None
+        value = fields[self.variant.field]
+        if value is None:
+            raise ValueError('the discriminating field is a parameter')
+        return value
+
+
+class _StringLayouts(_Layouts):
+
+    def __init__(self, order, head, string):
+        super(_StringLayouts, self).__init__(order, head)
+        self.string = string
+        self.peek = string.prefix
+        self.offset = head.size
+
+    def format_for(self, length):
+        return '%s%ds' % (self.peek.format[1:], length)
+
+    def unpack(self, buf):
+        fields = list(self.get(self.peek.unpack_from(buf, self.offset)[0]).unpack(buf))
+        del fields[-2]
+        fields[-1] = fields[-1].decode(self.string.encoding, 'replace')
+        return fields
+
+    def pack(self, fields):
+        value = fields[-1]
+        if not isinstance(value, (bytes, bytearray)):
+            value = value.encode(self.string.encoding)
+        return self.get(len(value)).pack(*(fields[:-1] + (len(value), value)))
+
+    def format(self, fields):
+        raise ValueError('strings have no fixed format')
+
+
+def _layouts(order, compiled):
+    """Return `_Layouts` for `compiled` or ``None`` if not applicable."""
+
+    if not compiled or not isinstance(compiled[0], _Fixed):
+        compiled = [_Fixed(order, '')] + compiled
+    if len(compiled) != 2:
+        return None
+
+    (head, tail) = compiled
+
+    if isinstance(tail, _Repeat):
+        return _RepeatLayouts(order, head, tail)
+    elif isinstance(tail, _String):
+        return _StringLayouts(order, head, tail)
+    elif isinstance(tail, _Variant):
+        for elements in tail.variants.values():
+            if len(elements) > 1 or (elements and not isinstance(elements[0], _Fixed)):
+                return None
+        return _VariantLayouts(order, head, tail)
+    else:
+        return None
+
+
+def _compile(order, elements, nfields=0, offset=0):
+    """
+    Compile `elements` which follow `nfields` fields.
+
+    :param offset: Offset of the first element in the packet or ``None``
+        if it depends on the packet.
+    :return: List of compiled elements.
+
+    """
+
+    compiled = []
+
+    for (i, element) in enumerate(elements):
+        if isinstance(element, bytes):
+            element = element.decode()
+
+        if isinstance(element, str):
+            if element[:1] in BYTE_ORDERS:
+                element = element[1:]
+            if not element:
+                continue
+
+            # Merge with preceding fixed fields.
+            #
+            if compiled and isinstance(compiled[-1], _Fixed):
+                previous = compiled.pop()
+                element = previous.fmt + element
+                if nfields is not None:
+                    nfields -= previous.nfields
+                if offset is not None:
+                    offset -= previous.size
+
+            element = _Fixed(order, element)
+            if nfields is not None:
+                nfields += element.nfields
+            if offset is not None:
+                offset += element.size
+
+        elif isinstance(element, Repeat):
+            if element.count is None and i != len(elements) - 1:
+                raise ValueError('only the last element may repeat until the end of the packet')
+            if element.count is not None and nfields is not None and element.count >= nfields:
+                raise ValueError('the repeat count must precede the repeated fields')
+            element = _Repeat(order, element.fmt, element.count)
+            (nfields, offset) = (None, None)
+
+        elif isinstance(element, String):
+            element = _String(order, element.prefix, element.encoding)
+            (nfields, offset) = (None if nfields is None else nfields + 1, None)
+
+        elif isinstance(element, Variant):
+            if nfields is None:
+                raise ValueError('variants must follow fields of fixed number')
+            if i != len(elements) - 1:
+                raise ValueError('a variant must be the last element')
+            element = _Variant(order, element.field, element.variants, nfields, offset)
+
+        else:
+            raise TypeError('invalid schema element %r' % (element,))
+
+        compiled.append(element)
+
+    return compiled
+
+
+class Schema(object):
+    """
+    Compiled structure of a packet.
+
+    :param elements: Format strings, `Repeat`, `Variant` and `String`
+        instances. Subclasses may instead set the ``elements`` class
+        attribute.
+    :raise: ``ValueError`` or ``TypeError`` if the schema is invalid.
+
+    Packing and unpacking raise ``struct.error`` if a packet does not
+    match the schema, like `struct.Struct` does.
+
+    """
+
+    elements = ()
+
+    def __init__(self, *elements):
+        if not elements:
+            elements = self.elements
+
+        self.elements = elements
+
+        first = elements[0] if elements else ''
+        if isinstance(first, bytes):
+            first = first.decode()
+        if isinstance(first, str) and first[:1] in BYTE_ORDERS:
+            self.order = first[0]
+        else:
+            self.order = '>'
+
+        self._compiled = _compile(self.order, elements)
+
+        self._layouts = _layouts(self.order, self._compiled)
+
+        if len(self._compiled) == 1 and isinstance(self._compiled[0], _Fixed):
+            self.fixed_format = self.order + self._compiled[0].fmt
+        else:
+            self.fixed_format = None
+
+    def unpack(self, rawpacket):
+        """
+        Return the fields of `rawpacket`.
+
+        :param rawpacket: Packet without framing and byte stuffing.
+        :type rawpacket: Binary string, ``bytearray`` or ``memoryview``.
+        :rtype: List.
+
+        """
+
+        if self._layouts is not None:
+            return self._layouts.unpack(rawpacket)
+
+        fields = []
+        offset = 0
+
+        try:
+            for element in self._compiled:
+                offset = element.unpack(rawpacket, offset, fields)
+        except IndexError:
+            raise struct.error('packet does not match the schema')
+
+        if offset != len(rawpacket):
+            raise struct.error('unexpected data at the end of the packet')
+
+        return fields
+
+    def pack(self, *fields):
+        """Return `fields` in binary format."""
+
+        chunks = []
+        index = 0
+
+        try:
+            if self._layouts is not None:
+                return self._layouts.pack(fields)
+
+            for element in self._compiled:
+                index = element.pack(fields, index, chunks)
+        except (IndexError, ValueError, TypeError, AttributeError):
+            raise struct.error('fields do not match the schema')
+
+        if index != len(fields):
+            raise struct.error('too many fields')
+
+        return b''.join(chunks)
+
+    def format_for_fields(self, fields):
+        """
+        Return the `struct` format for packing `fields`.
+
+        :raise: ``ValueError`` if the format cannot be determined, e.g.
+            for packets containing strings or if the field a variant
+            depends on is ``None``.
+
+        """
+
+        formats = [self.order]
+        index = 0
+
+        try:
+            if self._layouts is not None:
+                return self._layouts.format(fields)
+
+            for element in self._compiled:
+                index = element.format(fields, index, formats)
+        except (struct.error, IndexError, TypeError):
+            raise ValueError('fields do not match the schema')
+
+        if index != len(fields):
+            raise ValueError('too many fields')
+
+        return ''.join(formats)
+
+    def __repr__(self):
+        return '%s%r' % (self.__class__.__name__, tuple(self.elements))
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+Runtime statistics.
+
+A `Statistics` instance attached to `tsip.gps`/`tsip.GPS` (or to a
+`FrameDecoder`/`PacketDecoder`) counts the data and packets flowing
+through it. Statistics are disabled by default and then cost a single
+``is None`` check per packet.
+
+Example::
+
+  >>> gps = GPS(conn, stats=Statistics())
+  >>> for packet in gps:
+  ...     pass
+  >>> snapshot = gps.stats.snapshot()
+  >>> snapshot['bytes_in'], snapshot['codes'][0x8fab]['rate']
+
+"""
+
+import time
+
+from tsip.config import *
+from tsip.structs import *
+
+
+class CodeStatistics(object):
+    """
+    Statistics of the packets with one code or code/subcode.
+
+    * ``count`` -- number of packets received.
+    * ``bytes`` -- bytes received in these packets, including framing
+      and byte stuffing.
+    * ``first``, ``last`` -- times of the first and last packet.
+    * ``min_interval``, ``max_interval`` -- shortest and longest time
+      between two packets, ``None`` until two packets were received.
+
+    """
+
+    __slots__ = ('count', 'bytes', 'first', 'last', 'min_interval', 'max_interval')
+
+    def __init__(self, now):
+        self.count = 0
+        self.bytes = 0
+        self.first = now
+        self.last = now
+        self.min_interval = None
+        self.max_interval = None
+
+    def add(self, size, now):
+        if self.count:
+            interval = now - self.last
+            if self.min_interval is None or interval < self.min_interval:
+                self.min_interval = interval
+            if self.max_interval is None or interval > self.max_interval:
+                self.max_interval = interval
+
+        self.count += 1
+        self.bytes += size
+        self.last = now
+
+    def snapshot(self, elapsed):
+        if self.count > 1:
+            mean_interval = (self.last - self.first) / (self.count - 1)
+        else:
+            mean_interval = None
+
+        return {
+            'count': self.count,
+            'bytes': self.bytes,
+            'rate': self.count / elapsed if elapsed else 0.0,
+            'byte_rate': self.bytes / elapsed if elapsed else 0.0,
+            'mean_interval': mean_interval,
+            'min_interval': self.min_interval,
+            'max_interval': self.max_interval,
+        }
+
+
+class Statistics(object):
+    """
+    Counters of a TSIP stream.
+
+    * ``bytes_in``, ``bytes_out`` -- bytes read from and written to the
+      connection.
+    * ``packets_in``, ``packets_out`` -- packets received and sent.
+    * ``packets_skipped`` -- packets dropped because they were not
+      subscribed.
+    * ``bytes_discarded`` -- bytes dropped because they were not part of
+      a packet, e.g. a partial packet when starting to read mid-stream.
+    * ``resyncs`` -- number of times such bytes were dropped, counting
+      all bytes dropped between two packets once.
+    * ``decode_failures`` -- packets which could not be decoded and were
+      returned as 0xFF pseudo-packets. `LazyPacket` instances are only
+      counted if decoded by the time they are returned.
+    * ``codes`` -- `CodeStatistics` by packet code or code/subcode.
+
+    :param clock: Function returning the current time in seconds.
+
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.reset()
+
+    def reset(self):
+        """Reset all counters."""
+
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.packets_in = 0
+        self.packets_out = 0
+        self.packets_skipped = 0
+        self.bytes_discarded = 0
+        self.resyncs = 0
+        self.decode_failures = 0
+        self.codes = {}
+        self.started = self.clock()
+
+    def received(self, size):
+        """Count `size` bytes read from the connection."""
+        self.bytes_in += size
+
+    def sent(self, size):
+        """Count a packet of `size` bytes written to the connection."""
+        self.bytes_out += size
+        self.packets_out += 1
+
+    def discarded(self, size, resync=True):
+        """
+        Count `size` bytes which are not part of a packet.
+
+        :param resync: Whether these bytes start a new gap between
+            packets, ``False`` if they continue the gap of the previous
+            call.
+
+        """
+
+        self.bytes_discarded += size
+        if resync:
+            self.resyncs += 1
+
+    def skipped(self):
+        """Count a packet which was not subscribed."""
+        self.packets_skipped += 1
+
+    def frame(self, buf, start, stop):
+        """
+        Count the packet ``buf[start:stop]``.
+
+        :param buf: Receive buffer.
+        :param start: Offset of the leading DLE.
+        :param stop: Offset following the trailing DLE/ETX.
+
+        """
+
+        code = buf[start + 1]
+        if code in PACKET_STRUCTURES or stop - start < 5:
+            key = code
+        else:
+            key = code << 8 | buf[start + 2]
+
+        now = self.clock()
+        try:
+            codes = self.codes[key]
+        except KeyError:
+            codes = self.codes[key] = CodeStatistics(now)
+
+        codes.add(stop - start, now)
+        self.packets_in += 1
+
+    def decoded(self, packet):
+        """Count `packet` as a decode failure if it is a 0xFF pseudo-packet."""
+
+        fields = packet._fields
+        if fields is not None and fields[0] == 0xff:
+            self.decode_failures += 1
+
+    def snapshot(self):
+        """
+        Return the current counters.
+
+        :return: Dictionary with the counters listed above, ``elapsed``
+            (seconds since the last reset), ``byte_rate_in`` and
+            ``byte_rate_out`` (bytes per second) and ``codes``, mapping
+            packet codes/subcodes to dictionaries with ``count``,
+            ``bytes``, ``rate`` (packets per second), ``byte_rate``,
+            ``mean_interval``, ``min_interval`` and ``max_interval``.
+        :rtype: Dictionary.
+
+        """
+
+        elapsed = self.clock() - self.started
+
+        return {
+            'elapsed': elapsed,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'byte_rate_in': self.bytes_in / elapsed if elapsed else 0.0,
+            'byte_rate_out': self.bytes_out / elapsed if elapsed else 0.0,
+            'packets_in': self.packets_in,
+            'packets_out': self.packets_out,
+            'packets_skipped': self.packets_skipped,
+            'bytes_discarded': self.bytes_discarded,
+            'resyncs': self.resyncs,
+            'decode_failures': self.decode_failures,
+            'codes': dict([(key, codes.snapshot(elapsed)) for (key, codes) in self.codes.items()]),
+        }
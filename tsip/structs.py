@@ -13,9 +13,9 @@ create are valid.
 """
 
 import struct
-import types
 
 from tsip.config import *
+from tsip.schema import *
 
 
 MAX_PRODUCTNAME_LEN = 30
@@ -47,12 +47,10 @@ MAX_CHANNELS = 12
 #
 
 def tobytes(s):
-    try:
-        return bytes(s.encode())
-    except AttributeError:
+    if isinstance(s, str):
+        return s.encode()
+    else:
         return s
-    except UnicodeDecodeError:
-        return bytes(s)             # a no-op in Python 2
 
 
 def unpack(fmt, x):
@@ -66,6 +64,49 @@ def unpack(fmt, x):
         return list(struct.unpack(fmt, tobytes(x)))
 
 
+def parse_format(fmt):
+    """
+    Split a `struct` format string into the formats of its fields.
+
+    >>> parse_format('>BB2Hx3s')
+    [(0, '>B'), (1, '>B'), (2, '>H'), (4, '>H'), (7, '>3s')]
+
+    :param fmt: Format string, e.g. the `format` attribute of a `Struct`.
+        Padding for native alignment (``'@'``) is not taken into account.
+    :type fmt: String or binary string.
+    :return: Offset and format of each field.
+    :rtype: List of ``(offset, format)`` tuples.
+
+    """
+
+    if isinstance(fmt, bytes):
+        fmt = fmt.decode()
+
+    if fmt[:1] in ('@', '=', '<', '>', '!'):
+        (order, fmt) = (fmt[0], fmt[1:])
+    else:
+        order = '@'
+
+    fields = []
+    offset = 0
+
+    for (count, code) in format_tokens(fmt):
+        count = int(count) if count else 1
+
+        if code in ('s', 'p'):
+            fields.append((offset, '%s%d%s' % (order, count, code)))
+            offset += count
+        elif code == 'x':
+            offset += count
+        else:
+            size = struct.calcsize(order + code)
+            for i in range(0, count):
+                fields.append((offset, order + code))
+                offset += size
+
+    return fields
+
+
 class Struct(struct.Struct):
     """Custom `struct.Struct` class.
 
@@ -124,108 +165,71 @@ class StructRaw(object):
         return struct.unpack('>%ds' % (len(s)), s)
 
 
-class Struct0x1c81(object):
+class Struct0x1c81(Schema):
     """Report packet 0x1C:81 - Report firmware version.
 
        The product name is of variable length.
 
     """
 
-    format = '>BBBBBBBBH'
+    elements = ('>BBBBBBBBH', String())
 
-    def pack(self, *f):
-        return struct.pack(self.format, *f[:-1]) + struct.pack('>B', len(f[-1])) + tobytes(f[-1])
 
-    def unpack(self, rawpacket):
-        return struct.unpack(self.format, rawpacket[:10]) + (rawpacket[11:].decode(),)
+class Struct0x1c83(Schema):
+    """Report packet 0x1C:83 - Hardware component version information.
 
+       The hardware code is of variable length.
 
-class Struct0x1c83(object):
-    format = '>BBIBBHBH'
+    """
 
-    def pack(self, *f):
-        return struct.pack(self.format, *f[:-1]) + struct.pack('>B', len(f[-1])) + tobytes(f[-1])
+    elements = ('>BBIBBHBH', String())
 
-    def unpack(self, s):
-        return struct.unpack(self.format, s[:13]) + (s[14:].decode(),)
 
-class Struct0x47(object):
-    def pack(self, *f):
-        raise NotImplementedError
+class Struct0x47(Schema):
+    """Report Packet 0x47: Signal Levels for all Tracked Satellites.
 
-    def unpack(self, s):
-        count = struct.unpack('>B', s[1].to_bytes(1,'little'))[0]
-        fields = [0x47, count]
+       The count field is followed by that many satellite number/signal
+       level pairs.
+
+    """
 
-        for i in range(0, count):
-            i1 = 2 + i * 5
-            i2 = 2 + i * 5 + 5
-            (satnum, siglevel) = struct.unpack('>Bf', s[i1:i2])
-            fields.append(satnum)
-            fields.append(siglevel)
+    elements = ('>BB', Repeat('Bf', count=1))
 
-        return fields
 
+class Struct0x58(Schema):
+    """Report Packet 0x58: GPS System Data from Receiver.
 
-class Struct0x58(object):
-    # ONLY TESTED WITH COPERNICUS II
+       The structure of the data depends on the type of data (byte 1).
+       Packets without data (e.g. operation 3, "no data") only contain
+       the header.
 
-    def pack(self, *f):
-        raise NotImplementedError
+    """
+    # ONLY TESTED WITH COPERNICUS II
 
-    def unpack(self, s):
-        fields = list(struct.unpack('>BBBBB', s[:5]))
-
-        type_of_data = fields[2]
-        s = s[5:]
-
-        if type_of_data == 2:
-            # Almanac
-            fields += list(struct.unpack('>BBfffffffffffffffHH', s))
-        elif type_of_data == 3:
-            # Health page
-            fields += list(struct.unpack('>BBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBh', s))
-        elif type_of_data == 4:
-            # Ionospheric
-            fields += list(struct.unpack('>ffffffff', s[8:]))
-        elif type_of_data == 5:
-            # UTC
-            fields += list(struct.unpack('>dfhfHHHh', s[13:]))
-        elif type_of_data == 6:
-            # Ephemeris
-            fields += list(struct.unpack('>BfhBBBBhffffffBBffdfdfdffdfdfdffddddd', s))
-
-        return fields
-        
-
-class Struct0x6d(object):
+    elements = ('>BBBBB', Variant(2, {
+        None: '',
+        # Almanac
+        2: 'BBfffffffffffffffHH',
+        # Health page
+        3: 'BBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBh',
+        # Ionospheric
+        4: '8xffffffff',
+        # UTC
+        5: '13xdfhfHHHh',
+        # Ephemeris
+        6: 'BfhBBBBhffffffBBffdfdfdffdfdfdffddddd',
+    }))
+
+
+class Struct0x6d(Schema):
     """Report Packet 0x6D: Satellite Selection List.
 
-       This packet is of variable length equal to 6+nsvs where "nsvs" is
+       This packet is of variable length equal to 18+nsvs where "nsvs" is
        the number of satellites used in the solution.
 
     """
 
-
-    def pack(self, *f):
-        fmt = '>BBffff' + 'b' * (len(f) - 6)
-        return struct.pack(fmt, *f)
-
-    def unpack(self, s):
-        fields = list(struct.unpack('>BBffff', s[:18]))
-        nsvs = (fields[0] & 0b11110000) >> 4
-
-        try:
-            s = s[18:]
-            for n in range(0, nsvs):
-                fields.append(struct.unpack('>b', s[n].to_bytes(1,'little'))[0])
-        except IndexError:
-            # Occasionally `s` doesn't seem to be long enough
-            # so in this case instead of causing an exception we
-            # simply return the data so far.
-            pass
-
-        return fields
+    elements = ('>BBffff', Repeat('b'))
 
 
 class Struct0xbb(object):
@@ -261,7 +265,7 @@ class Struct0xbb(object):
 
 
 
-class Struct0x8ea0(object):
+class Struct0x8ea0(Schema):
     """Command Packet 0x8E-A0: Set DAC Value.
 
        There are three variants of this packet: Without data, the packet
@@ -272,260 +276,419 @@ class Struct0x8ea0(object):
 
     """
 
-    def pack(self, *fields):
-        if fields == (0x8e, 0xa0):
-            return struct.pack('>BB', *fields)
-        elif fields[2] == 0:
-            return struct.pack('>BBBf', *fields)
-        elif fields[2] == 1:
-            return struct.pack('>BBBI', *fields)
-        else:
-            raise ValueError
+    elements = ('>BB', Variant(2, {None: '', 0: 'Bf', 1: 'BI'}))
 
-    def unpack(self, rawpacket):
 
+class Struct0x8ea8(Schema):
+    """Command Packet 0x8E-A8: Set or Request Disciplining Parameters.
+
+       The parameters depend on the type (byte 1).
+
+    """
+
+    elements = ('>BB', Variant(2, {0: 'Bff', 1: 'Bfff', 2: 'Bff', 3: 'Bf'}))
+
+
+Struct0x8fa8 = Struct0x8ea8
+
+
+class PacketStructures(dict):
+    """
+    Dictionary of packet structures which are created on first lookup.
+
+    Values may be tuples of `struct` format strings and structure classes.
+    Looking up such a value replaces it with a list of the corresponding
+    `Struct()` and class instances and adds these to the dispatch indexes.
+    Lists are stored as they are, see `register_packet()`.
+
+    Iterating over the keys or testing for a key does not create any
+    structures.
+
+    """
+
+    def __getitem__(self, key):
+        structs_ = dict.__getitem__(self, key)
+        if type(structs_) is tuple:
+            structs_ = self._load(key, structs_)
+        return structs_
+
+    def get(self, key, default=None):
         try:
-            flag = unpack('>B', rawpacket[2])[0]
-        except IndexError:
-            return unpack('>BB', rawpacket)
-
-        if flag == 0:
-            return unpack('>BBBf', rawpacket)
-        elif flag == 1:
-            return unpack('>BBBI', rawpacket)
-        else:
-            raise ValueError('Invalid flag in packet 0x8ea0')
+            return self[key]
+        except KeyError:
+            return default
 
+    def values(self):
+        return [self[key] for key in self]
 
-class Struct0x8ea8(object):
-    fmt0 = '>BBBff'
-    fmt1 = '>BBBfff'
-    fmt2 = '>BBBff'
-    fmt3 = '>BBBf'
+    def items(self):
+        return [(key, self[key]) for key in self]
 
-    def pack(self, *fields):
-        type_ = fields[2]
-
-        if type_ == 0:
-            return struct.pack(self.fmt0, *fields)
-        elif type_ == 1:
-            return struct.pack(self.fmt1, *fields)
-        elif type_ == 2:
-            return struct.pack(self.fmt2, *fields)
-        elif type_ == 3:
-            return struct.pack(self.fmt3, *fields)
-        else:
-            raise ValueError('Invalid type in packet 0x8ea8')
+    def load(self, key):
+        """
+        Create and index the structures of packet `key` unless done before.
 
-    def unpack(self, rawpacket):
-        type_ = unpack('>B', rawpacket[2])[0]
-
-        if type_ == 0:
-            return unpack(self.fmt0, rawpacket)
-        elif type_ == 1:
-            return unpack(self.fmt1, rawpacket)
-        elif type_ == 2:
-            return unpack(self.fmt2, rawpacket)
-        elif type_ == 3:
-            return unpack(self.fmt3, rawpacket)
-        else:
-            raise ValueError('Invalid type in packet 0x8ea8')
+        :return: ``True`` if the structures were created just now.
 
+        """
 
-Struct0x8fa8 = Struct0x8ea8
+        structs_ = dict.get(self, key)
+        if type(structs_) is tuple:
+            self._load(key, structs_)
+            return True
+        else:
+            return False
+
+    def _load(self, key, specs):
+        structs_ = [Struct(spec) if isinstance(spec, str) else spec() for spec in specs]
+        dict.__setitem__(self, key, structs_)
+        index_structures(key, structs_)
+        return structs_
 
 
 # Packet structures.
 #
-# Keys are the packet codes/subcodes. Values are lists(!) of instances
-# of `Struct()` or class instances providing custom `pack()`
-# and `unpack()` methods for a particular TSIP packet. The values
-# must be lists even if it contains only a single item.
+# Keys are the packet codes/subcodes. Values are tuples(!) of `struct`
+# format strings and classes providing custom `pack()` and `unpack()`
+# methods for a particular TSIP packet. The values must be tuples even if
+# they contain only a single item. They are turned into lists of `Struct()`
+# and class instances when a packet is first looked up, so that importing
+# `tsip` does not create any of them.
 #
-PACKET_STRUCTURES = {
+PACKET_STRUCTURES = PacketStructures({
     # Report packet 0X13 unparsable packet
     # TODO: Report packet 0X13 unparsable packe
     # Command Packet 0x1C - Firmware Version
-    0x1c01: [Struct('>BB')],
+    0x1c01: ('>BB',),
     # Report Packet 0x1C - Firmware Version
-    0x1c81: [Struct0x1c81()],
+    0x1c81: (Struct0x1c81,),
     # Command Packet 0x1C - Hardware Component Version Information
-    0x1c03: [Struct('>BB')],
+    0x1c03: ('>BB',),
     # Report Packet 0x1C - Hardware Component Version Information
-    0x1c83: [Struct0x1c83()],
+    0x1c83: (Struct0x1c83,),
     # Command Packet 0x1E - Clear Battery Backup, then Reset
-    0x1e:   [Struct('>BB')],
+    0x1e:   ('>BB',),
     # Command Packet 0x1F - Request Software Versions
-    0x1f:   [Struct('>B')],
+    0x1f:   ('>B',),
     # Command Packet 0x21 - Request Current Time
-    0x21:   [Struct('>B')],
+    0x21:   ('>B',),
     # Command Packet 0x23 - Initial Position (XYZ ECEF)
-    0x23:   [Struct('>Bfff')],
+    0x23:   ('>Bfff',),
     # Command Packet 0x24: Request GPS Satellite Selection
-    0x24:   [Struct('>B')],
+    0x24:   ('>B',),
     # Command Packet 0x25: Initiate Hot Reset
-    0x25:   [Struct('>B')],
+    0x25:   ('>B',),
     # Command Packet 0x26: Request Receiver Health
-    0x26:   [Struct('>B')],
+    0x26:   ('>B',),
     # Command Packet 0x27: Request Signal Levels
-    0x27:   [Struct('>B')],
+    0x27:   ('>B',),
     # Command Packet 0x29: Request Almanac Health
-    0x29:   [Struct('>B')],
+    0x29:   ('>B',),
     # Command Packet 0x2d: request oscillator offset
-    0x2d:   [Struct('>B')],
+    0x2d:   ('>B',),
     # Command Packet 0x31: Accurate Initial Position (XYZ Cartesian ECEF)
     # Here this packet will always contain double precision values.
-    0x31:   [Struct('>Bddd')],
+    0x31:   ('>Bddd',),
     # Command Packet 0x32: Accurate Initial Position (LLA)
     # Here this packet will always contain double precision values.
-    0x32:   [Struct('>Bddd')],
+    0x32:   ('>Bddd',),
     # Command Packet 0x34: Satellite Selection For One-Satellite Mode
-    0x34:   [Struct('>BB')],
+    0x34:   ('>BB',),
     # Command Packet 0x35: Set or Request I/O Options
-    0x35:   [Struct('>BBBBB')],
+    0x35:   ('>BBBBB',),
     # Command Packet 0x37: Request Status and Values of Last Position
-    0x37:   [Struct('>B')],
+    0x37:   ('>B',),
     # Command Packet 0x38: Request Satellite System Data
-    0x38:   [Struct('>BBBB')],
+    0x38:   ('>BBBB',),
     # Command Packet 0x39: Set or Request SV Disable and Health Use
-    0x39:   [Struct('>BBB')],
+    0x39:   ('>BBB',),
     # Command Packet 0x3A: Request Last Raw Measurement
-    0x3a:   [Struct('>BB')],
+    0x3a:   ('>BB',),
     # Command Packet 0x3B: Request Ephemeris Status
-    0x3b:   [Struct('>BB')],
+    0x3b:   ('>BB',),
     # Command Packet 0x3C: Request Satellite Tracking Status
-    0x3c:   [Struct('>BB')],
+    0x3c:   ('>BB',),
     # Command Packet 0x3F-11: Request EEPROM Segment Status
-    0x3f:   [Struct('>BB')],
+    0x3f:   ('>BB',),
     # Report packet 0x41: GPS Time
-    0x41:   [Struct('>Bfhf')],
+    0x41:   ('>Bfhf',),
     # Report Packet 0x42: Single-precision Position Fix
-    0x42:   [Struct('>Bffff')],
+    0x42:   ('>Bffff',),
     # Report Packet 0x43: Velocity Fix, XYZ ECEF
-    0x43:   [Struct('>Bfffff')],
+    0x43:   ('>Bfffff',),
     # Report Packet 0x45: Software Version Information
-    0x45:   [Struct('>BBBBBBBBBBB')],
+    0x45:   ('>BBBBBBBBBBB',),
     # Report Packet 0x46: Receiver Health
     # In contradiction to the official documentation packet 0x46 may occur
     # with only single unsigned integer field.
-    0x46:   [Struct('>BBB'), Struct('>B')],
+    0x46:   ('>BBB', '>B'),
     # Report Packet 0x47: Signals Levels for Tracked Satellites
     # Up to 12 satellite number/signal level pairs may be sent as indicated by
     # the count field
-    0x47:   [Struct0x47()],
+    0x47:   (Struct0x47,),
     # Report Packet 0x49: Almanac Health
-    0x49:   [Struct('>B32B')],
+    0x49:   ('>B32B',),
     # Report Packet 0x4A: Single Precision LLA Position Fix
-    0x4a:   [Struct('>Bfffff')],
+    0x4a:   ('>Bfffff',),
     # Report Packet 0x4B: Receiver Health
-    0x4b:   [Struct('>BBBB')],
+    0x4b:   ('>BBBB',),
     # Report Packet 0x4d: Oscillator offset
-    0x4d:   [Struct('>Bf')],
+    0x4d:   ('>Bf',),
     # Report Packet 0x55: I/O Options
-    0x55:   [Struct('>BBBBB')],
+    0x55:   ('>BBBBB',),
     # Report Packet 0x56: Velocity Fix, East-North-Up (ENU)
-    0x56:   [Struct('>Bfffff')],
+    0x56:   ('>Bfffff',),
     # Report Packet 0x57: Information about Last Computed Fix
-    0x57:   [Struct('>BBBfI')],
+    0x57:   ('>BBBfI',),
     # Report Packet 0x58: GPS System Data from the Receiver
-    0x58:   [Struct0x58()],
+    0x58:   (Struct0x58,),
     # Report Packet 0x59: Status of Satellite Disable or Ignore Health
-    0x59:   [Struct('>BB32B')],
+    0x59:   ('>BB32B',),
     # Report Packet 0x5A: Raw Data Measurement Data
-    0x5a:   [Struct('>BBffffd')],
+    0x5a:   ('>BBffffd',),
     # Report Packet 0x5B: Satellite Ephemeris Status
-    0x5b:   [Struct('>BfBBfBf')],
+    0x5b:   ('>BfBBfBf',),
     # Report Packet 0x5C: Satellite Tracking Status
-    0x5c:   [Struct('>BBBBBffffBBBB')],
+    0x5c:   ('>BBBBBffffBBBB',),
     # Report Packet 0x5F-11: EEPROM Segment Status
-    0x5f:   [StructRaw()],
+    0x5f:   (StructRaw,),
     # Report Packet 0x6D: Satellite Selection List
-    0x6d:   [Struct0x6d()],
+    0x6d:   (Struct0x6d,),
     # Command/Report Packet 0x70: Filter Configuration
-    0x70:   [Struct('>BBBBB')],
+    0x70:   ('>BBBBB',),
     # Report Packet 0x82: SBAS correction status
-    0x82:   [Struct('>BB')],
+    0x82:   ('>BB',),
     # Report Packet 0x83: Double Precision XYZ
-    0x83:   [Struct('>Bddddf')],
+    0x83:   ('>Bddddf',),
     # Report Packet 0x84: Double Precision LLA Position (Fix and Bias Information)
-    0x84:   [Struct('>Bddddf')],
+    0x84:   ('>Bddddf',),
     # Command/Report Packet 0xBB: Set Receiver Configuration
-    0xbb00: [Struct('>BB'), Struct0xbb()],
+    0xbb00: ('>BB', Struct0xbb),
     # Command/Report Packet 0xBC: Set Port Configuration
-    0xbc:   [Struct('>BB'), Struct('>BBBBBBBBBBB')],
+    0xbc:   ('>BB', '>BBBBBBBBBBB'),
     # Command Packet 0x8E-15: Request current Datum values
-    0x8e15: [Struct('>BB')],
+    0x8e15: ('>BB',),
     # Command Packet 0x8E-23 - Request Last Compact Fix Information
-    0x8e23: [Struct('>BBB')],
+    0x8e23: ('>BBB',),
     # Command Packet 0x8E-26: Write Configuration to NVS
-    0x8e26: [Struct('>BB')],
+    0x8e26: ('>BB',),
     # Command Packet 0x8E-41: Request Manufacturing Parameters
-    0x8e41: [Struct('>BB')],
+    0x8e41: ('>BB',),
     # Command Packet 0x8E-42: Stored Production Parameters
-    0x8e42: [Struct('>BB')],
+    0x8e42: ('>BB',),
     # Command Packet 0x8E-45: Revert Configuration Segment to Default Settings and Write to NVS
-    0x8e45: [Struct('>BBB')],
+    0x8e45: ('>BBB',),
     # Command Packet 0x8E-4A: Set PPS Characteristics
-    0x8e4a: [Struct('>BBBBBdf')],
+    0x8e4a: ('>BBBBBdf',),
     # Command Packet 0x8E-4C: Write Configuration Segment to NVS
-    0x8e4c: [Struct('>BBB')],
+    0x8e4c: ('>BBB',),
     # Command Packet 0x8E-4E: Set PPS output option
-    0x8e4e: [Struct('>BBB')],
+    0x8e4e: ('>BBB',),
     # Command Packet 0x8E-A0: Set DAC Value
-    0x8ea0: [Struct0x8ea0()],
+    0x8ea0: (Struct0x8ea0,),
     # Command Packet 0x8E-A2: UTC/GPS Timing
-    0x8ea2: [Struct('>BBB')],
+    0x8ea2: ('>BBB',),
     # Command Packet 0x8E-A3: Issue Oscillator Disciplining Command
-    0x8ea3: [Struct('>BBB')],
+    0x8ea3: ('>BBB',),
     # Command Packet 0x8E-A4: Test Modes
-    0x8ea4: [Struct('>BBB'), Struct('>BBBHI'), Struct('>BBBffhIHHHh')],
+    0x8ea4: ('>BBB', '>BBBHI', '>BBBffhIHHHh'),
     # Command Packet 0x8E-A5: Packet Broadcast Mask
-    0x8ea5: [Struct('>BBHH')],
+    0x8ea5: ('>BBHH',),
     # Command Packet 0x8E-A6: Self-Survey Command
-    0x8ea6: [Struct('>BBB')],
+    0x8ea6: ('>BBB',),
     # Command Packet 0x8E-A8: Set or Request Disciplining Parameters
-    0x8ea8: [Struct0x8ea8()],
+    0x8ea8: (Struct0x8ea8,),
     # Command Packet 0x8E-A9: Self-Survey Parameters
-    0x8ea9: [Struct('>BBBBII'), Struct('>BBB')],
+    0x8ea9: ('>BBBBII', '>BBB'),
     # Command Packet 0x8E-AB: Request Primary Timing Packet
-    0x8eab: [Struct('>BBB')],
+    0x8eab: ('>BBB',),
     # Command Packet 0x8E-AC: Request Supplementary Timing Packet
-    0x8eac: [Struct('>BBB')],
+    0x8eac: ('>BBB',),
     # Report Packet 0x8F-15 Current Datum Values
-    0x8f15: [Struct('>BBhddddd')],
+    0x8f15: ('>BBhddddd',),
     # Report Packet 0x8F-23 - Request Last Compact Fix Information
-    0x8f23: [Struct('>BBIHBBiIihhhh')],
+    0x8f23: ('>BBIHBBiIihhhh',),
     # Report Packet 0x8F-41: Stored Manufacturing Operating Parameters
-    0x8f41: [Struct('>BBHIBBBBfH')],
+    0x8f41: ('>BBHIBBBBfH',),
     # Report Packet 0x8F-42: Stored Production Parameters
-    0x8f42: [Struct('>BBBBHIIHHH')],
+    0x8f42: ('>BBBBHIIHHH',),
     # Report Packet 0x8F-4A: Set PPS Characteristics
-    0x8f4a: [Struct('>BBBBBdf')],
+    0x8f4a: ('>BBBBBdf',),
     # Report Packet 0x8F-4E: PPS Output
-    0x8f4e: [Struct('>BBB')],
+    0x8f4e: ('>BBB',),
     # Report Packet 0x8F-A0: DAC Value
-    0x8fa0: [Struct('>BBIfBBff')],
+    0x8fa0: ('>BBIfBBff',),
     # Report Packet 0x8F-A2: UTC/GPS Timing
-    0x8fa2: [Struct('>BBB')],
+    0x8fa2: ('>BBB',),
     # Report Packet 0x8F-A3: Oscillator Disciplining Command
-    0x8fa3: [Struct('>BBB')],
+    0x8fa3: ('>BBB',),
     # Report Packet 0x8F-A4: Test Modes
-    0x8fa4: [Struct('>BBB'), Struct('>BBBHI'), Struct('>BBBffhIHHHh')],
+    0x8fa4: ('>BBB', '>BBBHI', '>BBBffhIHHHh'),
     # Report Packet 0x8F-A5: Packet Broadcast Mask
-    0x8fa5: [Struct('>BBHH')],
+    0x8fa5: ('>BBHH',),
     # Report Packet 0x8F-A6: Self-Survey Command
-    0x8fa6: [Struct('>BBB')],
+    0x8fa6: ('>BBB',),
     # Report Packet 0x8F-A8: Oscillator Disciplining Parameters
-    0x8fa8: [Struct0x8fa8()],
+    0x8fa8: (Struct0x8fa8,),
     # Report Packet 0x8F-A9: Self-Survey Parameters
-    0x8fa9: [Struct('>BBBBII')],
+    0x8fa9: ('>BBBBII',),
     # Report Packet 0x8F-AB:Primary Timing Packet
-    0x8fab: [Struct('>BBIHhBBBBBBH')],
+    0x8fab: ('>BBIHhBBBBBBH',),
     # Report Packet 0x8F-AC: Supplemental Timing Packet
-    0x8fac: [Struct('>BBBBBIHHBBBBffIffdddfI')]
+    0x8fac: ('>BBBBBIHHBBBBffIffdddfI',)
+})
+
+
+# Report packets sent by the receiver in response to command packets.
+#
+# Keys are the packet codes/subcodes of command packets as in
+# `PACKET_STRUCTURES`. Values are lists of the keys of all report packets
+# the receiver sends in response, in the order they are expected. Commands
+# the receiver does not respond to are not listed.
+#
+COMMAND_REPORTS = {
+    0x1c01: [0x1c81],
+    0x1c03: [0x1c83],
+    # Resets are followed by the power-up reports.
+    0x1e:   [0x45, 0x46, 0x4b],
+    0x1f:   [0x45],
+    0x21:   [0x41],
+    0x24:   [0x6d],
+    0x25:   [0x45, 0x46, 0x4b],
+    0x26:   [0x46, 0x4b],
+    0x27:   [0x47],
+    0x29:   [0x49],
+    0x2d:   [0x4d],
+    0x35:   [0x55],
+    0x37:   [0x57],
+    0x38:   [0x58],
+    0x39:   [0x59],
+    0x3a:   [0x5a],
+    0x3b:   [0x5b],
+    0x3c:   [0x5c],
+    0x3f:   [0x5f],
+    0x70:   [0x70],
+    0xbb00: [0xbb00],
+    0xbc:   [0xbc],
+    0x8e15: [0x8f15],
+    0x8e23: [0x8f23],
+    0x8e41: [0x8f41],
+    0x8e42: [0x8f42],
+    0x8e4a: [0x8f4a],
+    0x8e4e: [0x8f4e],
+    0x8ea0: [0x8fa0],
+    0x8ea2: [0x8fa2],
+    0x8ea3: [0x8fa3],
+    0x8ea4: [0x8fa4],
+    0x8ea5: [0x8fa5],
+    0x8ea6: [0x8fa6],
+    0x8ea8: [0x8fa8],
+    0x8ea9: [0x8fa9],
+    0x8eab: [0x8fab],
+    0x8eac: [0x8fac],
 }
 
 
+# Dispatch indexes built from `PACKET_STRUCTURES`.
+#
+# `UNPACK_INDEX` maps (key, payload length) and `PACK_INDEX` maps
+# (key, number of fields) to the one fixed-size `Struct()` instance that
+# can handle such a packet. Keys are packet codes/subcodes as in
+# `PACKET_STRUCTURES`. Custom structure classes (typically for packets of
+# variable length) cannot be indexed like that and are listed, in their
+# original order, in `VARIABLE_STRUCTURES`.
+#
+# A packet is only indexed once its structures have been created. Code
+# using the indexes directly must call `load_structures()` when a lookup
+# fails.
+#
+UNPACK_INDEX = {}
+PACK_INDEX = {}
+VARIABLE_STRUCTURES = {}
+
+# Dictionaries caching information derived from the dispatch indexes,
+# e.g. `tsip.LazyPacket._layouts`. They are cleared by `register_packet()`.
+#
+INDEX_CACHES = []
+
+
+def index_structures(key, structs_):
+    """
+    Add the structures of a packet to the dispatch indexes.
+
+    :param key: Packet code or code/subcode.
+    :param structs_: Structures of the packet as in `PACKET_STRUCTURES`.
+
+    """
+
+    for struct_ in structs_:
+        if isinstance(struct_, struct.Struct):
+            nfields = len(struct_.unpack(bytes(struct_.size)))
+            UNPACK_INDEX.setdefault((key, struct_.size), struct_)
+            PACK_INDEX.setdefault((key, nfields), struct_)
+        else:
+            VARIABLE_STRUCTURES.setdefault(key, []).append(struct_)
+
+
+def load_structures(key):
+    """
+    Create and index the structures of a packet unless done before.
+
+    :param key: Packet code or code/subcode.
+    :return: ``True`` if the structures were indexed just now, ``False``
+        if they were indexed before or `key` is unknown.
+
+    """
+
+    return PACKET_STRUCTURES.load(key)
+
+
+def get_key_for_rawpacket(rawpacket):
+    """
+
+       :param rawpacket: TSIP packet without framing and byte stuffing.
+       :type rawpacket: Binary string.
+       :return: Packet code or code/subcode as used as keys of
+           `PACKET_STRUCTURES`. ``None`` if `rawpacket` is too short
+           to contain the subcode.
+
+    """
+
+    code = rawpacket[0]
+
+    if not isinstance(code, int):
+        code = ord(code)
+
+    if code in PACKET_STRUCTURES:
+        return code
+
+    try:
+        subcode = rawpacket[1]
+    except IndexError:
+        return None
+
+    if not isinstance(subcode, int):
+        subcode = ord(subcode)
+
+    return code << 8 | subcode
+
+
+def get_key_for_fields(fields):
+    """
+    Return the key of a packet as used in `PACKET_STRUCTURES`.
+
+    :param fields: Fields of a packet, starting with the code (and
+        subcode).
+    :type fields: List.
+
+    """
+
+    if fields[0] in PACKET_STRUCTURES:
+        return fields[0]
+    else:
+        return fields[0] << 8 | fields[1]
+
+
 def get_structs_for_rawpacket(rawpacket):
     """
 
@@ -536,32 +699,90 @@ def get_structs_for_rawpacket(rawpacket):
 
     """
 
-    key = unpack('>B', rawpacket[0])[0]
+    key = get_key_for_rawpacket(rawpacket)
+    load_structures(key)
 
     try:
-        return PACKET_STRUCTURES[key]
+        structs_ = [UNPACK_INDEX[(key, len(rawpacket))]]
     except KeyError:
-        try:
-            key = unpack('>H', rawpacket[0:2])[0]
-            return PACKET_STRUCTURES[key]
-        except (struct.error, KeyError):
-            return []
+        structs_ = []
+
+    return structs_ + VARIABLE_STRUCTURES.get(key, [])
 
 
 def get_structs_for_fields(fields):
+    """
+
+       :param fields: Fields of a packet, starting with the code (and
+           subcode).
+       :type fields: List.
+       :return: Possible structures for packing `fields`. May be an empty list.
+       :rtype: List.
+       :raise: ``IndexError`` if `fields` lacks the subcode, ``TypeError``
+           if the code or subcode are not integers.
+
+    """
 
-    key = fields[0]
+    key = get_key_for_fields(fields)
+    load_structures(key)
 
     try:
-        return PACKET_STRUCTURES[key]
+        structs_ = [PACK_INDEX[(key, len(fields))]]
     except KeyError:
-        try:
-            key = fields[0] * 256 + fields[1]
-            return PACKET_STRUCTURES[key]
-        except (IndexError, KeyError):
-            return []
+        structs_ = []
 
+    return structs_ + VARIABLE_STRUCTURES.get(key, [])
 
 
 def register_packet(code, fmt):
-    raise NotImplementedError()
+    """
+    Register the structure of a packet at runtime.
+
+    Structures registered for the packet before, including the built-in
+    ones, are replaced.
+
+    Examples::
+
+      >>> register_packet(0x8f99, '>BBHf')
+      >>> register_packet(0x8f9a, Schema('>BBB', Repeat('Bf', count=2)))
+      >>> Packet.unpack(b'\x8f\x99\x00\x01?\x80\x00\x00')
+      Packet(143, 153, 1, 1.0)
+
+    :param code: Packet code or code/subcode, e.g. ``0x8f99``.
+    :param fmt: `struct` format string, `Schema` or any other structure as
+        in `PACKET_STRUCTURES`, or a list of these. Format strings
+        without byte order are big-endian. Format strings and schemas
+        without variable parts are registered as `Struct` instances and
+        dispatched by payload length.
+    :raise: ``ValueError`` if `code` clashes with the codes of other
+        packets, e.g. ``0x8e99`` while ``0x8e`` has no subcodes.
+
+    """
+
+    if code > 0xff:
+        if code >> 8 in PACKET_STRUCTURES:
+            raise ValueError('packet 0x%x has no subcodes' % (code >> 8))
+    elif [key for key in PACKET_STRUCTURES if key >> 8 == code]:
+        raise ValueError('packet 0x%x has subcodes' % (code))
+
+    if not isinstance(fmt, list):
+        fmt = [fmt]
+
+    structs_ = []
+    for struct_ in fmt:
+        if isinstance(struct_, (str, bytes)):
+            struct_ = Schema(struct_)
+        if isinstance(struct_, Schema) and struct_.fixed_format is not None:
+            struct_ = Struct(struct_.fixed_format)
+        structs_.append(struct_)
+
+    for index in (UNPACK_INDEX, PACK_INDEX):
+        for entry in [entry for entry in index if entry[0] == code]:
+            del index[entry]
+    VARIABLE_STRUCTURES.pop(code, None)
+
+    for cache in INDEX_CACHES:
+        cache.clear()
+
+    PACKET_STRUCTURES[code] = structs_
+    index_structures(code, structs_)
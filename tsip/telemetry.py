@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""
+Rolling store of timing telemetry.
+
+`TelemetryStore` keeps the most recent packets of a few fixed-size types,
+by default 0x8F-AB (primary timing) and 0x8F-AC (supplemental timing) of
+Thunderbolt receivers, in memory. The payloads are copied into one ring
+buffer per type and never turned into `Packet` instances, so a day of
+one-second packets takes about 7.5 MB. The fields are exposed as NumPy
+arrays (see `tsip.bulk`), so queries over a window of time are
+vectorised. This requires NumPy_ to be installed.
+
+Every packet is stored with the GPS time (in seconds, see
+`tsip.index.gps_seconds()`) of the last packet carrying the time at or
+before it (see `tsip.index.TIME_SOURCES`). Packets received before the
+first of these are not stored.
+
+Example::
+
+  >>> store = TelemetryStore(capacity=3600)
+  >>> while True:
+  ...     store.feed(conn.read(1024))
+  ...     print(store.summary('dac_voltage', 60))
+
+.. _NumPy: https://numpy.org/
+
+"""
+
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from tsip.config import *
+from tsip.structs import *
+from tsip.llapi import *
+from tsip.bulk import dtype_for_format
+from tsip.index import TIME_SOURCES
+from tsip.records import FIELD_NAMES
+
+
+TELEMETRY_KEYS = (0x8fab, 0x8fac)
+"""Packets stored by default."""
+
+TELEMETRY_CAPACITY = 86400
+"""Default number of packets stored per type, one day at one per second."""
+
+
+def _require_numpy():
+    if numpy is None:
+        raise ImportError('tsip.telemetry requires NumPy')
+
+
+class _Ring(object):
+    """
+    Ring buffer of the payloads of one packet type and their GPS times.
+
+    ``records`` is a structured array viewing ``data``.
+
+    """
+
+    def __init__(self, key, capacity):
+        structs = PACKET_STRUCTURES.get(key)
+        if not structs or len(structs) != 1 or key in VARIABLE_STRUCTURES:
+            raise ValueError('0x%x is not a fixed-size packet' % (key))
+
+        fmt = structs[0].format
+        self.key = key
+        self.size = structs[0].size
+        self.capacity = capacity
+        self.data = bytearray(self.size * capacity)
+        self.records = numpy.frombuffer(self.data, dtype_for_format(fmt, FIELD_NAMES.get(key)))
+        self.times = numpy.zeros(capacity, dtype='f8')
+        self.clear()
+
+    def clear(self):
+        self.head = 0       # position of the next packet
+        self.count = 0
+
+    def append(self, payload, time_):
+        head = self.head
+        offset = head * self.size
+        self.data[offset:offset + self.size] = payload
+        self.times[head] = time_
+
+        self.head = head + 1 if head + 1 < self.capacity else 0
+        if self.count < self.capacity:
+            self.count += 1
+
+    def segments(self, start=None):
+        """
+        Return the positions of the packets with a GPS time after `start`
+        as up to two ``(lo, hi)`` tuples, oldest first.
+
+        """
+
+        if self.count < self.capacity:
+            segments = [(0, self.count)]
+        else:
+            segments = [(self.head, self.capacity), (0, self.head)]
+
+        if start is None:
+            return [(lo, hi) for (lo, hi) in segments if lo < hi]
+
+        result = []
+        for (lo, hi) in segments:
+            lo += int(numpy.searchsorted(self.times[lo:hi], start, 'right'))
+            if lo < hi:
+                result.append((lo, hi))
+
+        return result
+
+
+class TelemetryStore(object):
+    """
+    Fixed-capacity store of the most recent packets of some types.
+
+    Adding a packet copies its payload into a preallocated buffer and
+    takes constant time. Once `capacity` packets of a type have been
+    stored, each new packet overwrites the oldest one.
+
+    :param capacity: Number of packets stored per type.
+    :param keys: Packet codes/subcodes to store. All must have a single
+        fixed-size structure in `PACKET_STRUCTURES`.
+
+    Fields are referred to by the names in `tsip.records.FIELD_NAMES`,
+    e.g. ``'dac_voltage'``. Names used by several of the stored packets
+    (like ``'code'``) are not available.
+
+    * ``time`` -- GPS time of the last packet carrying the time, NaN if
+      none was added yet.
+    * ``dropped`` -- number of packets of the stored types which were not
+      stored, because their size was wrong or the time not yet known.
+
+    """
+
+    def __init__(self, capacity=TELEMETRY_CAPACITY, keys=TELEMETRY_KEYS):
+        _require_numpy()
+
+        if capacity < 1:
+            raise ValueError('capacity must be positive')
+
+        self.capacity = capacity
+        self.keys = tuple(keys)
+        self._rings = dict([(key, _Ring(key, capacity)) for key in self.keys])
+
+        self._names = {}
+        ambiguous = set()
+        for ring in self._rings.values():
+            for name in ring.records.dtype.names:
+                if name in self._names:
+                    ambiguous.add(name)
+                self._names[name] = ring
+        for name in ambiguous:
+            del self._names[name]
+
+        self._decoder = FrameDecoder(subscribe=set(self.keys) | set(TIME_SOURCES))
+        self.clear()
+
+    def __len__(self):
+        return sum([ring.count for ring in self._rings.values()])
+
+    def clear(self):
+        """Discard all packets."""
+
+        for ring in self._rings.values():
+            ring.clear()
+        self._decoder.reset()
+        self.time = math.nan
+        self.dropped = 0
+
+    def add(self, payload):
+        """
+        Add a packet.
+
+        :param payload: TSIP packet without framing and byte stuffing.
+        :type payload: Binary string or ``memoryview``.
+        :return: ``True`` if the packet was stored.
+
+        """
+
+        key = get_key_for_rawpacket(payload)
+
+        source = TIME_SOURCES.get(key)
+        if source is not None:
+            time_ = source(payload)
+            if time_ is not None:
+                self.time = time_
+
+        ring = self._rings.get(key)
+        if ring is None:
+            return False
+
+        if len(payload) != ring.size or math.isnan(self.time):
+            self.dropped += 1
+            return False
+
+        ring.append(payload, self.time)
+        return True
+
+    def extend(self, payloads):
+        """
+        Add packets, see `add()`.
+
+        :return: Number of packets stored.
+
+        """
+
+        add = self.add
+        return sum([add(payload) for payload in payloads])
+
+    def feed(self, data):
+        """
+        Add all packets completed by `data`, e.g. as read from a GPS.
+
+        The data is split into packets by a `FrameDecoder` subscribed to
+        the stored packets and those carrying the time.
+
+        :param data: Data received from a GPS.
+        :type data: Binary string.
+        :return: Number of packets stored.
+
+        """
+
+        return self.extend([unframe_unstuff(frame) for frame in self._decoder.feed(data)])
+
+    def count(self, key):
+        """Return the number of packets of type `key` stored."""
+
+        return self._rings[key].count
+
+    def _ring(self, name):
+        try:
+            return self._names[name]
+        except KeyError:
+            raise ValueError('no field %r' % (name))
+
+    def _start(self, seconds):
+        return None if seconds is None else self.time - seconds
+
+    def times(self, key, seconds=None):
+        """
+        Return the GPS times of the packets of type `key`.
+
+        :param key: Packet code/subcode.
+        :param seconds: Only packets of the last `seconds` seconds, i.e.
+            with a time after ``time - seconds``.
+        :return: 1-dimensional array, oldest packet first.
+
+        """
+
+        ring = self._rings[key]
+        return numpy.concatenate([ring.times[lo:hi] for (lo, hi) in ring.segments(self._start(seconds))]
+                                 or [ring.times[:0]])
+
+    def column(self, name, seconds=None):
+        """
+        Return the values of one field.
+
+        :param name: Field name, e.g. ``'temperature'``.
+        :param seconds: See `times()`.
+        :return: 1-dimensional array in native byte order, oldest packet
+            first.
+
+        """
+
+        ring = self._ring(name)
+        values = ring.records[name]
+        values = numpy.concatenate([values[lo:hi] for (lo, hi) in ring.segments(self._start(seconds))]
+                                   or [values[:0]])
+        return values.astype(values.dtype.newbyteorder('='))
+
+    def summary(self, name, seconds=None):
+        """
+        Return the minimum, maximum and mean of one field.
+
+        The values are reduced in place, no copy of the window is made.
+
+        :param name: See `column()`.
+        :param seconds: See `times()`.
+        :return: ``(minimum, maximum, mean)``. All NaN if there are no
+            values.
+
+        """
+
+        ring = self._ring(name)
+        values = ring.records[name]
+        segments = [values[lo:hi] for (lo, hi) in ring.segments(self._start(seconds))]
+
+        if not segments:
+            return (math.nan, math.nan, math.nan)
+
+        count = sum([len(segment) for segment in segments])
+        return (min([segment.min() for segment in segments]).item(),
+                max([segment.max() for segment in segments]).item(),
+                sum([segment.sum(dtype='f8') for segment in segments]).item() / count)